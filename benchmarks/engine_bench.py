@@ -0,0 +1,191 @@
+"""Engine microbenchmarks for every Splendor variant.
+
+For each variant, random games are played from seeded decks and the following is timed:
+
+    * steps_per_s: actions per second of full random games through pyspiel.
+    * legal_actions_us: `_legal_actions` latency, per `TurnType`.
+    * apply_action_us: `_apply_action` latency, per action category.
+    * set_from_us: `BoardObserver.set_from`.
+    * new_initial_state_us, clone_us.
+    * serialize_us, deserialize_us: `state.serialize()` and `game.deserialize_state()`.
+    * pickle_us, unpickle_us.
+
+Latencies are medians in microseconds. Results are written as JSON and compared against a
+stored baseline, so every engine change has numbers attached:
+
+    python -m benchmarks.engine_bench                  # Compare against benchmarks/baseline.json.
+    python -m benchmarks.engine_bench --save-baseline  # Replace the baseline with this run.
+
+Run from the repository root.
+"""
+
+import argparse
+import json
+import pickle
+import platform
+import random
+import statistics
+import time
+
+import pyspiel
+
+import splendor_hard.splendor_game
+import splendor_medium.splendor_game
+import splendor_lite.splendor_game
+import splendor_hard.actions
+import splendor_lite.actions
+
+VARIANTS = ["splendor_lite", "splendor_medium", "splendor_hard"]
+BASELINE_FILENAME = "benchmarks/baseline.json"
+RESULTS_FILENAME = "benchmarks/results.json"
+
+_MODULES = {
+    "splendor_lite": (splendor_lite.splendor_game, splendor_lite.actions),
+    "splendor_medium": (splendor_medium.splendor_game, splendor_hard.actions),
+    "splendor_hard": (splendor_hard.splendor_game, splendor_hard.actions),
+}
+
+
+def _median_us(samples_ns: list[int]) -> float:
+    return statistics.median(samples_ns) / 1000 if samples_ns else 0.0
+
+
+def _time_us(fn, items) -> float:
+    """Median latency of `fn(item)` over `items`, in microseconds."""
+    samples = []
+    for item in items:
+        start = time.perf_counter_ns()
+        fn(item)
+        samples.append(time.perf_counter_ns() - start)
+    return _median_us(samples)
+
+
+def random_games(game, num_games: int, seed: int):
+    """Plays random games through pyspiel. Returns the steps per second and a sample of positions."""
+    positions = []
+    steps = 0
+    seconds = 0.0
+    for i in range(num_games):
+        random.seed(seed + i)
+        rng = random.Random(seed + i)
+        state = game.new_initial_state()
+        start = time.perf_counter()
+        while not state.is_terminal():
+            state.apply_action(rng.choice(state.legal_actions()))
+            steps += 1
+            if steps % 10 == 0:
+                seconds += time.perf_counter() - start
+                positions.append(state.clone())
+                start = time.perf_counter()
+        seconds += time.perf_counter() - start
+    return steps / seconds, positions
+
+
+def engine_latencies(game, module, actions, num_games: int, seed: int) -> dict:
+    """Times `_legal_actions` per turn type and `_apply_action` per action category, in place."""
+    legal_samples: dict[str, list[int]] = {}
+    apply_samples: dict[str, list[int]] = {}
+    for i in range(num_games):
+        random.seed(seed + i)
+        rng = random.Random(seed + i)
+        state = game.new_initial_state()
+        while not state.is_terminal():
+            turn_type = module.TurnType(state._turn_type).name
+            start = time.perf_counter_ns()
+            legal_actions = state._legal_actions(state._cur_player)
+            legal_samples.setdefault(turn_type, []).append(time.perf_counter_ns() - start)
+
+            action = rng.choice(legal_actions)
+            category = actions.SCategory(state._actions.get_category(action)).name
+            start = time.perf_counter_ns()
+            state._apply_action(action)
+            apply_samples.setdefault(category, []).append(time.perf_counter_ns() - start)
+
+    return {
+        "legal_actions_us": {name: _median_us(samples) for name, samples in sorted(legal_samples.items())},
+        "apply_action_us": {name: _median_us(samples) for name, samples in sorted(apply_samples.items())},
+    }
+
+
+def run_variant(variant: str, num_games: int, seed: int) -> dict:
+    module, actions = _MODULES[variant]
+    game = pyspiel.load_game(variant)
+    steps_per_s, positions = random_games(game, num_games, seed)
+    results = {"steps_per_s": steps_per_s}
+    results.update(engine_latencies(game, module, actions, num_games, seed))
+
+    observer = module.BoardObserver(None)
+    serialized = [state.serialize() for state in positions]
+    pickled = [pickle.dumps(state) for state in positions]
+    results["set_from_us"] = _time_us(lambda state: observer.set_from(state, state.current_player()), positions)
+    results["new_initial_state_us"] = _time_us(lambda _: game.new_initial_state(), range(len(positions)))
+    results["clone_us"] = _time_us(lambda state: state.clone(), positions)
+    results["serialize_us"] = _time_us(lambda state: state.serialize(), positions)
+    results["deserialize_us"] = _time_us(game.deserialize_state, serialized)
+    results["pickle_us"] = _time_us(pickle.dumps, positions)
+    results["unpickle_us"] = _time_us(pickle.loads, pickled)
+    return results
+
+
+def _flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}/"))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(baseline: dict, results: dict):
+    """Prints every metric next to its baseline value; speedup > 1 means this run is faster."""
+    for variant, variant_results in results["variants"].items():
+        if variant not in baseline["variants"]:
+            continue
+        print(f"\n{variant}:")
+        old = _flatten(baseline["variants"][variant])
+        for metric, value in _flatten(variant_results).items():
+            if metric not in old or not old[metric] or not value:
+                continue
+            speedup = value / old[metric] if metric.endswith("_per_s") else old[metric] / value
+            print(f"  {metric:>36}: {old[metric]:12.2f} -> {value:12.2f}  ({speedup:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=10, help="Random games per variant.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--variants", nargs="+", default=VARIANTS, choices=VARIANTS)
+    parser.add_argument("--output", default=RESULTS_FILENAME)
+    parser.add_argument("--baseline", default=BASELINE_FILENAME)
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results to the baseline file.")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "games": args.games,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "variants": {variant: run_variant(variant, args.games, args.seed) for variant in args.variants},
+    }
+
+    output = args.baseline if args.save_baseline else args.output
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {output}")
+
+    if not args.save_baseline:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print(f"No baseline at {args.baseline}; create one with --save-baseline.")
+            return
+        compare(baseline, results)
+
+
+if __name__ == "__main__":
+    main()
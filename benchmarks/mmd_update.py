@@ -0,0 +1,120 @@
+"""Benchmarks MMD rollouts and updates (`MMD.learn`) on a batch collected from real games.
+
+A batch of `num_steps` steps of `num_envs` envs is collected with the untrained network,
+timing the actor (`MMD.step_batch`) at every step; then the same batch is learned from
+`--updates` times, restoring the weights in between. Median times are reported, with the
+time of the advantage computation alone. The first steps and update are warm-up (and
+compilation, with `--compile`) and are not timed.
+
+    python -m benchmarks.mmd_update
+    python -m benchmarks.mmd_update --compile
+    python -m benchmarks.mmd_update --shared-trunk
+    python -m benchmarks.mmd_update --card-encoder
+    python -m benchmarks.mmd_update --compact-storage --num-envs 64
+    python -m benchmarks.mmd_update --game splendor_lite --num-envs 16
+
+Run from the repository root.
+"""
+
+import argparse
+import copy
+import functools
+import statistics
+import time
+
+import numpy as np
+import pyspiel
+import torch
+
+import splendor_hard.splendor_game
+import splendor_medium.splendor_game
+import splendor_lite.splendor_game
+from rl.algorithms.mmd.mmd import MMD, MMDAgent
+from rl.vector_env import SharedMemoryVectorEnv
+
+
+_WARMUP_STEPS = 8
+
+
+def collect_batch(agent, game_name: str, num_envs: int, num_steps: int):
+    """Fills the agent's rollout buffers. Returns the observations after the last step and the actor times."""
+    envs = SharedMemoryVectorEnv(game_name, list(range(num_envs)), num_workers=1)
+    actor_seconds = []
+    try:
+        envs.reset()
+        for _ in range(num_steps):
+            start = time.perf_counter()
+            actions = agent.step_batch(*envs.batch())
+            actor_seconds.append(time.perf_counter() - start)
+            envs.step_async(actions.cpu(), reset_if_done=True)
+            rewards, dones = envs.step_wait_arrays()
+            agent.post_step_batch(rewards[:, 0], dones)
+        return np.copy(envs.batch()[0]), actor_seconds[_WARMUP_STEPS:]
+    finally:
+        envs.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--game", default="splendor_hard")
+    parser.add_argument("--num-envs", type=int, default=8)
+    parser.add_argument("--num-steps", type=int, default=128)
+    parser.add_argument("--num-minibatches", type=int, default=4)
+    parser.add_argument("--update-epochs", type=int, default=4)
+    parser.add_argument("--updates", type=int, default=10)
+    parser.add_argument("--compile", action="store_true", help="Compile the action sampling and the loss.")
+    parser.add_argument("--shared-trunk", action="store_true", help="Share one trunk between the actor and the critic.")
+    parser.add_argument("--card-encoder", action="store_true", help="Use the card-set encoder as the shared trunk.")
+    parser.add_argument("--compact-storage", action="store_true", help="Store int8 observations and bit-packed masks.")
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    game = pyspiel.load_game(args.game)
+    agent = MMD(
+        input_shape=game.information_state_tensor_shape(),
+        num_actions=game.num_distinct_actions(),
+        num_players=game.num_players(),
+        num_envs=args.num_envs,
+        steps_per_batch=args.num_steps,
+        num_minibatches=args.num_minibatches,
+        update_epochs=args.update_epochs,
+        agent_fn=functools.partial(MMDAgent, shared_trunk=args.shared_trunk, card_encoder=args.card_encoder),
+        compile=args.compile,
+        compact_storage=args.compact_storage,
+    )
+    next_obs, actor_seconds = collect_batch(agent, args.game, args.num_envs, args.num_steps)
+    weights = copy.deepcopy(agent.state_dict())
+    optimizer = copy.deepcopy(agent.optimizer.state_dict())
+    batch_idx = agent.env_batch_idx.copy()
+
+    advantage_seconds = []
+    update_seconds = []
+    for _ in range(args.updates + 1):
+        agent.load_state_dict(weights)
+        agent.optimizer.load_state_dict(optimizer)
+        agent.env_batch_idx[:] = batch_idx
+        with torch.no_grad():
+            next_value = agent.get_value(torch.from_numpy(next_obs)).reshape(1, -1)
+            start = time.perf_counter()
+            agent.compute_advantages(next_value)
+            advantage_seconds.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        agent.learn(next_obs, 0, 10_000_000)
+        update_seconds.append(time.perf_counter() - start)
+
+    batch_size = args.num_envs * args.num_steps
+    print(f"{args.game}: batch {batch_size} ({args.num_envs} envs x {args.num_steps} steps), "
+          f"{args.update_epochs} epochs x {args.num_minibatches} minibatches"
+          f"{', compiled' if args.compile else ''}{', shared trunk' if args.shared_trunk else ''}"
+          f"{', card encoder' if args.card_encoder else ''}{', compact storage' if args.compact_storage else ''}")
+    print(f"  parameters: {sum(p.numel() for p in agent.network.parameters()):8d}")
+    buffers = [agent.obs, agent.legal_actions_mask, agent.actions, agent.logprobs, agent.rewards, agent.dones,
+               agent.values, agent.current_players]
+    print(f"  buffers:    {sum(b.numel() * b.element_size() for b in buffers) / 2**20:8.2f} MiB")
+    print(f"  rollout:    {statistics.median(actor_seconds) * 1000:8.2f} ms/step")
+    print(f"  update:     {statistics.median(update_seconds[1:]) * 1000:8.2f} ms/batch")
+    print(f"  advantages: {statistics.median(advantage_seconds[1:]) * 1000:8.2f} ms/batch")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Perft: counts the leaf nodes of the full game tree to a fixed depth.
+
+As with chess move generators, the counts from a set of fixed positions validate
+`_legal_actions`/`_apply_action`, and the time it takes to produce them benchmarks them.
+A position is a variant, a seed and a number of moves: the decks are shuffled after
+`random.seed(seed)` and the moves are drawn from `random.Random(seed)`. Terminal nodes
+above the requested depth count as 0 leaves.
+
+    python -m benchmarks.perft                     # Check the reference counts, report nodes/s.
+    python -m benchmarks.perft --engine numba      # The same on the Numba "hard" engine.
+    python -m benchmarks.perft --generate          # Print new reference counts.
+
+Run from the repository root.
+"""
+
+import argparse
+import time
+
+import pyspiel
+
+import splendor_hard.splendor_game
+import splendor_medium.splendor_game
+import splendor_lite.splendor_game
+from benchmarks.search_nps import seeded_position
+
+# (variant, seed, num_moves, depth) -> leaf nodes.
+REFERENCE_COUNTS = {
+    ("splendor_lite", 0, 0, 3): 1000,
+    ("splendor_lite", 1, 4, 3): 1226,
+    ("splendor_lite", 2, 8, 3): 766,
+    ("splendor_medium", 0, 0, 2): 865,
+    ("splendor_medium", 1, 6, 2): 625,
+    ("splendor_medium", 2, 12, 2): 27,
+    ("splendor_hard", 0, 0, 2): 865,
+    ("splendor_hard", 1, 6, 2): 652,
+    ("splendor_hard", 2, 12, 2): 284,
+    ("splendor_hard", 3, 12, 3): 7508,
+}
+
+
+def perft(state, depth: int) -> int:
+    """Leaf nodes `depth` moves below `state`, cloning the state for every child."""
+    if depth == 0:
+        return 1
+    if state.is_terminal():
+        return 0
+    nodes = 0
+    for action in state.legal_actions():
+        child = state.clone()
+        child.apply_action(action)
+        nodes += perft(child, depth - 1)
+    return nodes
+
+
+def perft_undo(state, depth: int) -> int:
+    """Like `perft` for states that support `undo_action`, such as `NumbaSplendorState`."""
+    if depth == 0:
+        return 1
+    if state.is_terminal():
+        return 0
+    nodes = 0
+    for action in state.legal_actions():
+        state.apply_action(action)
+        nodes += perft_undo(state, depth - 1)
+        state.undo_action()
+    return nodes
+
+
+def position(variant: str, seed: int, num_moves: int):
+    return seeded_position(pyspiel.load_game(variant), seed, num_moves)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", choices=["python", "numba"], default="python")
+    parser.add_argument("--generate", action="store_true", help="Print the counts as a new REFERENCE_COUNTS.")
+    args = parser.parse_args()
+
+    search = perft
+    cases = list(REFERENCE_COUNTS)
+    if args.engine == "numba":
+        from splendor_hard.numba_state import NumbaSplendorState
+
+        search = perft_undo
+        cases = [case for case in cases if case[0] == "splendor_hard"]
+        perft_undo(NumbaSplendorState.from_state(position("splendor_hard", 0, 0)), 1)  # Compile.
+
+    failures = 0
+    total_nodes = 0
+    total_seconds = 0.0
+    counts = {}
+    for variant, seed, num_moves, depth in cases:
+        state = position(variant, seed, num_moves)
+        if args.engine == "numba":
+            state = NumbaSplendorState.from_state(state)
+        start = time.perf_counter()
+        nodes = search(state, depth)
+        seconds = time.perf_counter() - start
+        counts[(variant, seed, num_moves, depth)] = nodes
+        total_nodes += nodes
+        total_seconds += seconds
+
+        expected = REFERENCE_COUNTS[(variant, seed, num_moves, depth)]
+        status = "ok" if nodes == expected else f"MISMATCH (expected {expected})"
+        failures += nodes != expected
+        print(f"{variant:>15} seed {seed} moves {num_moves:>2} depth {depth}: "
+              f"{nodes:>7} nodes {nodes / seconds:>12,.0f} nodes/s  {status}")
+
+    print(f"\n{total_nodes} nodes in {total_seconds:.2f}s ({total_nodes / total_seconds:,.0f} nodes/s)")
+    if args.generate:
+        print("\nREFERENCE_COUNTS = {")
+        for case, nodes in counts.items():
+            print(f"    {case}: {nodes},")
+        print("}")
+    elif failures:
+        raise SystemExit(f"{failures} position(s) do not match the reference counts.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Random playouts per second for each Splendor variant.
+
+Compares a playout loop driven through pyspiel (`clone`, `legal_actions`, `apply_action`,
+as `RandomRolloutEvaluator` does) with `SplendorState.random_playout`.
+
+Run from the repository root with `python -m benchmarks.playouts`.
+"""
+
+import argparse
+import random
+import time
+
+import pyspiel
+
+import splendor_hard.splendor_game
+import splendor_medium.splendor_game
+import splendor_lite.splendor_game
+
+VARIANTS = ["splendor_lite", "splendor_medium", "splendor_hard"]
+
+
+def pyspiel_playouts(state, rng: random.Random, n: int):
+    for _ in range(n):
+        working_state = state.clone()
+        while not working_state.is_terminal():
+            working_state.apply_action(rng.choice(working_state.legal_actions()))
+
+
+def engine_playouts(state, rng: random.Random, n: int):
+    state.random_playout(rng, n)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--playouts", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--variants", nargs="+", default=VARIANTS, choices=VARIANTS)
+    args = parser.parse_args()
+
+    for variant in args.variants:
+        state = pyspiel.load_game(variant).new_initial_state()
+        rates = {}
+        for name, playouts in [("pyspiel", pyspiel_playouts), ("random_playout", engine_playouts)]:
+            rng = random.Random(args.seed)
+            start = time.perf_counter()
+            playouts(state, rng, args.playouts)
+            rates[name] = args.playouts / (time.perf_counter() - start)
+        print(
+            f"{variant:>15}: pyspiel {rates['pyspiel']:.1f} playouts/s, "
+            f"random_playout {rates['random_playout']:.1f} playouts/s "
+            f"({rates['random_playout'] / rates['pyspiel']:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""A suite of mid-game and end-game benchmark positions for every Splendor variant.
+
+Positions are sampled from self-play games (a random policy that buys a card whenever it can,
+so that games reach high scores) and tagged by what makes them interesting:
+
+    opening       fewer than 10 moves played.
+    midgame       neither of the below.
+    near_win      a player is at most 3 points from winning.
+    spending      a SPENDING sub-turn, paying for a card with gold.
+    return        a RETURN sub-turn, giving gems back.
+    full_reserve  the player to move has reserved the maximum number of cards.
+
+Up to `--per-tag` positions are kept per tag and variant. They are stored as one int16
+record per position (see `encode`) in a compressed `.npz` file, one array per variant, and
+`load` turns them back into `SplendorState`s.
+
+    python -m benchmarks.positions                # Regenerate benchmarks/positions.npz.
+    python -m benchmarks.positions --summary      # Count the stored positions per tag.
+
+Run from the repository root.
+"""
+
+import argparse
+import random
+
+import numpy as np
+import pyspiel
+
+import splendor_hard.splendor_game
+import splendor_medium.splendor_game
+import splendor_lite.splendor_game
+import splendor_hard.board
+import splendor_hard.card
+from splendor_hard.card import card_key
+import splendor_hard.gems
+import splendor_hard.gem
+import splendor_lite.card
+import splendor_lite.card_importer
+import splendor_lite.gem
+import splendor_lite.gems
+
+VARIANTS = ["splendor_lite", "splendor_medium", "splendor_hard"]
+POSITIONS_FILENAME = "benchmarks/positions.npz"
+TAGS = ["opening", "midgame", "near_win", "spending", "return", "full_reserve"]
+
+_NEAR_WIN_POINTS = 3
+_MAX_RESERVE = 3
+_MAX_POINTS = 5  # Highest point value of a single card.
+_HEADER_SIZE = 4 + 7 + 6
+_PLAYER_SIZE = 6 + 3 + (2 * _MAX_RESERVE) + (5 * (_MAX_POINTS + 1))
+
+_MODULES = {
+    "splendor_lite": (splendor_lite.splendor_game, splendor_lite.card, splendor_lite.gem, splendor_lite.gems),
+    "splendor_medium": (splendor_medium.splendor_game, splendor_hard.card, splendor_hard.gem, splendor_hard.gems),
+    "splendor_hard": (splendor_hard.splendor_game, splendor_hard.card, splendor_hard.gem, splendor_hard.gems),
+}
+
+
+def _card_tables(variant: str) -> list[list]:
+    if variant == "splendor_lite":
+        return splendor_lite.card_importer.csv_import(splendor_lite.splendor_game._CARDS_FILENAME)
+    return splendor_hard.board.card_table(splendor_hard.splendor_game._CARDS_FILENAME)
+
+
+class _Layout:
+    """Record layout of one variant; every field is an int16.
+
+    header:   cur_player, is_terminal, turn_type, spending_card_exists,
+              spending card (points, gem type, 5 costs), board gems (6).
+    per row:  number of face-down cards, face-up card ids (-1 if empty),
+              face-down card ids padded with -1 to the size of the row.
+    player:   gems (6), no_moves, num_returns, number of reserved cards, reserved ids (3),
+              reserved face down (3), purchased cards counted by (gem type, points) (5 x 6).
+
+    Purchased cards are stored by gem type and points only, which is all the engine reads
+    from them; the costs of cards bought with gold are discounted and not worth keeping.
+    """
+
+    def __init__(self, variant: str):
+        module = _MODULES[variant][0]
+        self.cards = _card_tables(variant)
+        self.ids = {}
+        self.by_id = []
+        for row in self.cards:
+            for card in row:
+                self.ids[card_key(card)] = len(self.by_id)
+                self.by_id.append(card)
+
+        state = pyspiel.load_game(variant).new_initial_state()
+        self.visible = len(state._board._slots[0])
+        self.turn_type = module.TurnType
+
+        self.rows = []
+        offset = _HEADER_SIZE
+        for row in self.cards:
+            self.rows.append(offset)
+            offset += 1 + self.visible + len(row)
+        self.players = [offset, offset + _PLAYER_SIZE]
+        self.size = offset + (2 * _PLAYER_SIZE)
+
+
+_LAYOUTS: dict[str, _Layout] = {}
+
+
+def _layout(variant: str) -> _Layout:
+    if variant not in _LAYOUTS:
+        _LAYOUTS[variant] = _Layout(variant)
+    return _LAYOUTS[variant]
+
+
+def encode(state, variant: str) -> np.ndarray:
+    """Returns the int16 record of a `SplendorState` of `variant`."""
+    layout = _layout(variant)
+    record = np.full(layout.size, -1, dtype=np.int16)
+    record[0] = state._cur_player
+    record[1] = state._is_terminal
+    record[2] = int(state._turn_type)
+    record[3] = state._spending_card_exists
+    record[4:11] = 0
+    if state._spending_card_exists:
+        card = state._spending_card
+        record[4:11] = [card.points, int(card.gem_type), *card.gems.get_array()[:5]]
+    record[11:17] = state._board.gems.get_array()
+
+    for row, offset in enumerate(layout.rows):
+        deck = state._board._decks[row]
+        record[offset] = len(deck)
+        for j, card in enumerate(state._board._slots[row]):
+            record[offset + 1 + j] = -1 if card is None else layout.ids[card_key(card)]
+        start = offset + 1 + layout.visible
+        record[start:start + len(deck)] = [layout.ids[card_key(card)] for card in deck]
+
+    for player, offset in zip([state._player_0, state._player_1], layout.players):
+        record[offset:offset + 6] = player.gems.get_array()
+        record[offset + 6] = player.no_moves
+        record[offset + 7] = getattr(player, "num_returns", 0)
+        reserved = getattr(player, "_reserved_cards", [])
+        record[offset + 8] = len(reserved)
+        for j, (card, hidden) in enumerate(zip(reserved, getattr(player, "_reserved_hidden", []))):
+            record[offset + 9 + j] = layout.ids[card_key(card)]
+            record[offset + 12 + j] = hidden
+        purchased = np.zeros((5, _MAX_POINTS + 1), dtype=np.int16)
+        for card in player._purchased_cards:
+            purchased[int(card.gem_type), card.points] += 1
+        record[offset + 15:offset + _PLAYER_SIZE] = purchased.ravel()
+    return record
+
+
+def decode(game, record: np.ndarray, variant: str):
+    """Builds a `SplendorState` of `game` from a record written by `encode`."""
+    layout = _layout(variant)
+    _, card_module, gem_module, gems_module = _MODULES[variant]
+    record = record.astype(int)
+    state = game.new_initial_state()
+    state._cur_player = int(record[0])
+    state._is_terminal = bool(record[1])
+    state._turn_type = layout.turn_type(record[2])
+    state._spending_card_exists = bool(record[3])
+    if state._spending_card_exists:
+        state._spending_card = card_module.Card(int(record[4]), gem_module.Gem(record[5]), tuple(record[6:11]))
+    state._board.gems = gems_module.Gems(record[11:17].copy())
+
+    for row, offset in enumerate(layout.rows):
+        slots = record[offset + 1:offset + 1 + layout.visible]
+        start = offset + 1 + layout.visible
+        state._board._slots[row] = [None if i < 0 else layout.by_id[i] for i in slots]
+        state._board._decks[row] = [layout.by_id[i] for i in record[start:start + record[offset]]]
+
+    for player, offset in zip([state._player_0, state._player_1], layout.players):
+        player.gems = gems_module.Gems(record[offset:offset + 6].copy())
+        player.no_moves = int(record[offset + 6])
+        if hasattr(player, "num_returns"):
+            player.num_returns = int(record[offset + 7])
+        for j in range(record[offset + 8]):
+            player.add_reserved_card(layout.by_id[record[offset + 9 + j]], hidden=bool(record[offset + 12 + j]))
+        purchased = record[offset + 15:offset + _PLAYER_SIZE].reshape(5, _MAX_POINTS + 1)
+        for gem_type, points in zip(*np.nonzero(purchased)):
+            for _ in range(purchased[gem_type, points]):
+                player.add_purchased_card(card_module.Card(int(points), gem_module.Gem(gem_type), (0, 0, 0, 0, 0)))
+    return state
+
+
+def position_tags(state, module, num_moves: int) -> list[str]:
+    player = state._player_0 if state._cur_player == 0 else state._player_1
+    points = max(state._player_0.get_points(), state._player_1.get_points())
+    tags = []
+    if num_moves < 10:
+        tags.append("opening")
+    if points >= module._WIN_POINTS - _NEAR_WIN_POINTS:
+        tags.append("near_win")
+    if state._turn_type.name == "SPENDING":
+        tags.append("spending")
+    if state._turn_type.name == "RETURN":
+        tags.append("return")
+    if len(getattr(player, "_reserved_cards", [])) == _MAX_RESERVE:
+        tags.append("full_reserve")
+    if not tags:
+        tags.append("midgame")
+    return tags
+
+
+def generate(variant: str, num_games: int, per_tag: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    """Samples up to `per_tag` positions per tag from self-play. Returns the records and a tag bitmask per record."""
+    module = _MODULES[variant][0]
+    game = pyspiel.load_game(variant)
+    rng = random.Random(seed)
+    purchase_categories = {"PURCHASE", "PURCHASE_RESERVE"}
+    samples: dict[str, list[tuple[int, np.ndarray]]] = {tag: [] for tag in TAGS}
+    seen = {tag: 0 for tag in TAGS}
+
+    for i in range(num_games):
+        random.seed(seed + i)
+        state = game.new_initial_state()
+        num_moves = 0
+        while not state.is_terminal():
+            tags = position_tags(state, module, num_moves)
+            mask = sum(1 << TAGS.index(tag) for tag in tags)
+            record = None
+            for tag in tags:  # Reservoir sampling per tag.
+                seen[tag] += 1
+                slot = len(samples[tag]) if len(samples[tag]) < per_tag else rng.randrange(seen[tag])
+                if slot < per_tag:
+                    record = encode(state, variant) if record is None else record
+                    entry = (mask, record)
+                    if slot == len(samples[tag]):
+                        samples[tag].append(entry)
+                    else:
+                        samples[tag][slot] = entry
+
+            legal_actions = state.legal_actions()
+            purchases = [a for a in legal_actions if state._actions.get_category(a).name in purchase_categories]
+            state.apply_action(rng.choice(purchases or legal_actions))
+            num_moves += 1
+
+    unique = {}
+    for entries in samples.values():
+        for mask, record in entries:
+            unique[record.tobytes()] = (mask, record)
+    masks = np.array([mask for mask, _ in unique.values()], dtype=np.uint8)
+    records = np.array([record for _, record in unique.values()], dtype=np.int16)
+    return records, masks
+
+
+def save(path: str, suites: dict[str, tuple[np.ndarray, np.ndarray]]):
+    arrays = {}
+    for variant, (records, masks) in suites.items():
+        arrays[variant] = records
+        arrays[f"{variant}_tags"] = masks
+    np.savez_compressed(path, **arrays)
+
+
+def load(variant: str, path: str = POSITIONS_FILENAME, tag: str | None = None) -> list:
+    """Loads the stored positions of `variant` as `SplendorState`s, optionally only those with `tag`."""
+    game = pyspiel.load_game(variant)
+    with np.load(path) as data:
+        records = data[variant]
+        masks = data[f"{variant}_tags"]
+    if tag is not None:
+        records = records[(masks & (1 << TAGS.index(tag))) != 0]
+    return [decode(game, record, variant) for record in records]
+
+
+def summary(path: str = POSITIONS_FILENAME):
+    with np.load(path) as data:
+        for variant in VARIANTS:
+            masks = data[f"{variant}_tags"]
+            counts = ", ".join(f"{tag} {int(np.sum((masks >> i) & 1))}" for i, tag in enumerate(TAGS))
+            print(f"{variant:>15}: {len(masks)} positions ({counts})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=200, help="Self-play games per variant.")
+    parser.add_argument("--per-tag", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=POSITIONS_FILENAME)
+    parser.add_argument("--summary", action="store_true", help="Only summarize the stored positions.")
+    args = parser.parse_args()
+
+    if not args.summary:
+        suites = {variant: generate(variant, args.games, args.per_tag, args.seed) for variant in VARIANTS}
+        save(args.output, suites)
+        print(f"Wrote {args.output}")
+    summary(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Nodes-per-second comparison of the pure-Python and Numba "hard" engines.
+
+Each engine walks the full game tree to `--depth` plies from a few seeded positions:
+
+    * python: `SplendorState.clone()` for every child.
+    * facade: `NumbaSplendorState.apply_action`/`undo_action`.
+    * kernel: the whole search inside `numba_state.perft`.
+
+Run from the repository root with `python -m benchmarks.search_nps`.
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+import pyspiel
+
+import splendor_hard.splendor_game
+from splendor_hard import numba_state
+from splendor_hard.numba_state import NumbaSplendorState
+
+
+def seeded_position(game, seed: int, num_moves: int):
+    """Returns the state reached after `num_moves` random actions from a deck shuffled with `seed`."""
+    random.seed(seed)
+    state = game.new_initial_state()
+    rng = random.Random(seed)
+    for _ in range(num_moves):
+        if state.is_terminal():
+            break
+        state.apply_action(rng.choice(state.legal_actions()))
+    return state
+
+
+def python_search(state, depth: int) -> int:
+    if depth == 0:
+        return 1
+    nodes = 0
+    for action in state.legal_actions():
+        child = state.clone()
+        child.apply_action(action)
+        nodes += python_search(child, depth - 1)
+    return nodes
+
+
+def facade_search(state: NumbaSplendorState, depth: int) -> int:
+    if depth == 0:
+        return 1
+    nodes = 0
+    for action in state.legal_actions():
+        state.apply_action(action)
+        nodes += facade_search(state, depth - 1)
+        state.undo_action()
+    return nodes
+
+
+def kernel_search(state: NumbaSplendorState, depth: int) -> int:
+    history = np.zeros((depth, numba_state.STATE_SIZE), dtype=np.int32)
+    legal = np.zeros((depth, numba_state.NUM_ACTIONS), dtype=np.int32)
+    scratch = np.zeros(numba_state.NUM_ACTIONS, dtype=np.int32)
+    return numba_state.perft(state._state.copy(), depth, history, legal, scratch)
+
+
+def timed(search, state, depth):
+    start = time.perf_counter()
+    nodes = search(state, depth)
+    return nodes, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2])
+    parser.add_argument("--moves", type=int, default=20, help="Random moves played before searching.")
+    parser.add_argument("--skip-python", action="store_true", help="Only time the Numba engines.")
+    args = parser.parse_args()
+
+    game = pyspiel.load_game("splendor_hard")
+
+    # Compile the kernels before timing anything.
+    kernel_search(NumbaSplendorState.from_state(game.new_initial_state()), 1)
+    facade_search(NumbaSplendorState.from_state(game.new_initial_state()), 1)
+
+    totals: dict[str, list[float]] = {}
+    for seed in args.seeds:
+        state = seeded_position(game, seed, args.moves)
+        engines = {
+            "facade": (facade_search, NumbaSplendorState.from_state(state)),
+            "kernel": (kernel_search, NumbaSplendorState.from_state(state)),
+        }
+        if not args.skip_python:
+            engines = {"python": (python_search, state), **engines}
+
+        counts = set()
+        for name, (search, root) in engines.items():
+            nodes, seconds = timed(search, root, args.depth)
+            counts.add(nodes)
+            total = totals.setdefault(name, [0, 0.0])
+            total[0] += nodes
+            total[1] += seconds
+            print(f"seed {seed} {name:>6}: {nodes} nodes in {seconds:.3f}s ({nodes / seconds:,.0f} nodes/s)")
+        if len(counts) != 1:
+            raise RuntimeError(f"Engines disagree on the node count for seed {seed}: {counts}")
+
+    print()
+    for name, (nodes, seconds) in totals.items():
+        print(f"{name:>6}: {nodes / seconds:,.0f} nodes/s")
+
+
+if __name__ == "__main__":
+    main()
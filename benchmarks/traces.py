@@ -0,0 +1,245 @@
+"""Golden traces: record games on the reference engine and replay them on any other engine.
+
+A trace holds, for every game, the seed and for every step (every position, including the
+terminal one) the legal actions, the observation of the player to move, the returns and the
+action taken. Decks are shuffled after `random.seed(seed)` and actions are drawn uniformly
+from `random.Random(seed)`, as in `benchmarks.perft`. Legal actions are stored as bit-packed
+masks and observations, which are small non-negative integers, as uint8, in a compressed
+`.npz` with one set of arrays per variant.
+
+Replaying rebuilds each initial state, hands it to an engine (a callable turning a
+`SplendorState` into a state with `legal_actions`, `apply_action`, `observation_tensor`,
+`returns` and `is_terminal`), drives it through the recorded actions and stops at the first
+step where the engine disagrees with the trace.
+
+    python -m benchmarks.traces --record --games 1000 --output traces_1000.npz  # Record the reference engine.
+    python -m benchmarks.traces --output traces_1000.npz  # Replay them on the reference engine.
+    python -m benchmarks.traces                           # Replay the committed traces.
+    python -m benchmarks.traces --engine numba            # Replay the "hard" traces on the Numba engine.
+    python -m benchmarks.traces --engine mypkg.engine:from_state
+
+`benchmarks/golden_traces.npz` holds a small committed set, which replays read by default;
+`--record` writes only to an explicit `--output`, so that a larger set is not recorded over
+it by accident (pass `--output benchmarks/golden_traces.npz` to regenerate it).
+Run from the repository root.
+"""
+
+import argparse
+import dataclasses
+import importlib
+import random
+import time
+from typing import Callable
+
+import numpy as np
+import pyspiel
+
+import splendor_hard.splendor_game
+import splendor_medium.splendor_game
+import splendor_lite.splendor_game
+
+VARIANTS = ["splendor_lite", "splendor_medium", "splendor_hard"]
+TRACES_FILENAME = "benchmarks/golden_traces.npz"
+
+_FIELDS = ["seeds", "lengths", "actions", "legal", "observations", "returns"]
+
+
+@dataclasses.dataclass
+class Trace:
+    """Recorded games of one variant. Step arrays hold the steps of all games back to back."""
+
+    variant: str
+    seeds: np.ndarray  # int64 [games]
+    lengths: np.ndarray  # int32 [games], steps per game including the terminal one.
+    actions: np.ndarray  # int16 [steps], -1 at terminal steps.
+    legal: np.ndarray  # uint8 [steps, ceil(num_actions / 8)], bit-packed legal-action masks.
+    observations: np.ndarray  # uint8 [steps, observation size]
+    returns: np.ndarray  # float32 [steps, 2]
+
+    @property
+    def num_steps(self) -> int:
+        return len(self.actions)
+
+
+@dataclasses.dataclass
+class Divergence:
+    game: int
+    seed: int
+    step: int
+    field: str
+    expected: object
+    actual: object
+
+    def __str__(self):
+        return (f"game {self.game} (seed {self.seed}) step {self.step}: {self.field} differs\n"
+                f"  expected {self.expected}\n  actual   {self.actual}")
+
+
+def initial_state(game, seed: int):
+    random.seed(seed)
+    return game.new_initial_state()
+
+
+def _observation(state, player: int) -> np.ndarray:
+    observation = np.asarray(state.observation_tensor(player))
+    encoded = observation.astype(np.uint8)
+    if not np.array_equal(encoded, observation):
+        raise ValueError("Observation does not fit in uint8; the trace format needs updating.")
+    return encoded
+
+
+def record(variant: str, num_games: int, seed: int = 0) -> Trace:
+    """Plays `num_games` random games on the reference engine, with seeds `seed, seed + 1, ...`."""
+    game = pyspiel.load_game(variant)
+    num_actions = game.num_distinct_actions()
+    seeds = np.arange(seed, seed + num_games, dtype=np.int64)
+    lengths = []
+    actions, legal, observations, returns = [], [], [], []
+    for game_seed in seeds:
+        rng = random.Random(int(game_seed))
+        state = initial_state(game, int(game_seed))
+        length = 0
+        while True:
+            mask = np.zeros(num_actions, dtype=bool)
+            player = 0 if state.is_terminal() else state.current_player()
+            legal_actions = state.legal_actions()
+            mask[legal_actions] = True
+            legal.append(np.packbits(mask))
+            observations.append(_observation(state, player))
+            returns.append(state.returns())
+            length += 1
+            if state.is_terminal():
+                actions.append(-1)
+                break
+            action = rng.choice(legal_actions)
+            actions.append(action)
+            state.apply_action(action)
+        lengths.append(length)
+
+    return Trace(
+        variant=variant,
+        seeds=seeds,
+        lengths=np.array(lengths, dtype=np.int32),
+        actions=np.array(actions, dtype=np.int16),
+        legal=np.array(legal, dtype=np.uint8),
+        observations=np.array(observations, dtype=np.uint8),
+        returns=np.array(returns, dtype=np.float32),
+    )
+
+
+def save(path: str, traces: list[Trace]):
+    arrays = {}
+    for trace in traces:
+        for field in _FIELDS:
+            arrays[f"{trace.variant}_{field}"] = getattr(trace, field)
+    np.savez_compressed(path, **arrays)
+
+
+def load(variant: str, path: str = TRACES_FILENAME) -> Trace:
+    with np.load(path) as data:
+        return Trace(variant=variant, **{field: data[f"{variant}_{field}"] for field in _FIELDS})
+
+
+def replay(trace: Trace, engine: Callable = lambda state: state) -> tuple[Divergence | None, int, float]:
+    """Replays `trace` on `engine(initial_state)`.
+
+    Returns the first divergence (or None), the number of steps replayed and the seconds spent.
+    """
+    game = pyspiel.load_game(trace.variant)
+    num_actions = game.num_distinct_actions()
+    steps = 0
+    seconds = 0.0
+    start = 0
+    for i, (seed, length) in enumerate(zip(trace.seeds, trace.lengths)):
+        seed = int(seed)
+        legal = np.unpackbits(trace.legal[start:start + length], axis=1, count=num_actions).astype(bool)
+        state = engine(initial_state(game, seed))
+        begin = time.perf_counter()
+        for step in range(length):
+            index = start + step
+            terminal = trace.actions[index] < 0
+            player = 0 if terminal else state.current_player()
+            checks = [
+                ("is_terminal", bool(terminal), lambda: bool(state.is_terminal())),
+                ("legal_actions", np.flatnonzero(legal[step]).tolist(), lambda: list(state.legal_actions())),
+                ("returns", trace.returns[index].tolist(), lambda: np.float32(state.returns()).tolist()),
+            ]
+            for field, expected, actual in checks:
+                actual = actual()
+                if actual != expected:
+                    return Divergence(i, seed, step, field, expected, actual), steps, seconds
+            observation = np.asarray(state.observation_tensor(player))
+            if not np.array_equal(observation, trace.observations[index]):
+                differs = np.flatnonzero(observation != trace.observations[index])
+                return (Divergence(i, seed, step, f"observation at {differs.tolist()}",
+                                   trace.observations[index][differs].tolist(), observation[differs].tolist()),
+                        steps, seconds)
+            if not terminal:
+                state.apply_action(int(trace.actions[index]))
+            steps += 1
+        seconds += time.perf_counter() - begin
+        start += length
+    return None, steps, seconds
+
+
+def _numba_engine(state):
+    from splendor_hard.numba_state import NumbaSplendorState
+
+    return NumbaSplendorState.from_state(state)
+
+
+ENGINES = {
+    "python": lambda state: state,
+    "numba": _numba_engine,
+}
+_ENGINE_VARIANTS = {"numba": ["splendor_hard"]}
+
+
+def resolve_engine(name: str) -> Callable:
+    """Returns a named engine from `ENGINES`, or imports one given as `module:callable`."""
+    if name in ENGINES:
+        return ENGINES[name]
+    module, _, attr = name.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", action="store_true", help="Record new traces on the reference engine.")
+    parser.add_argument("--games", type=int, default=20, help="Games per variant to record.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engine", default="python", help=f"One of {list(ENGINES)} or module:callable.")
+    parser.add_argument("--variants", nargs="+", default=None, choices=VARIANTS)
+    parser.add_argument(
+        "--output", default=None, help=f"Traces file; required with --record, {TRACES_FILENAME} to replay by default."
+    )
+    args = parser.parse_args()
+    if args.record and args.output is None:
+        parser.error("--record needs an explicit --output")
+    path = args.output or TRACES_FILENAME
+
+    variants = args.variants or _ENGINE_VARIANTS.get(args.engine, VARIANTS)
+    if args.record:
+        traces = [record(variant, args.games, args.seed) for variant in variants]
+        save(path, traces)
+        for trace in traces:
+            print(f"{trace.variant:>15}: {len(trace.seeds)} games, {trace.num_steps} steps")
+        print(f"Wrote {path}")
+        return
+
+    engine = resolve_engine(args.engine)
+    failures = 0
+    for variant in variants:
+        divergence, steps, seconds = replay(load(variant, path), engine)
+        rate = steps / seconds if seconds else 0.0
+        status = "ok" if divergence is None else "DIVERGED"
+        print(f"{variant:>15}: {steps:>9} steps {rate:>12,.0f} steps/s  {status}")
+        if divergence is not None:
+            failures += 1
+            print(divergence)
+    if failures:
+        raise SystemExit(f"{failures} variant(s) diverged from the trace.")
+
+
+if __name__ == "__main__":
+    main()
@@ -30,11 +30,17 @@ from torch import optim
 from torch.distributions.categorical import Categorical
 
 from open_spiel.python.rl_agent import StepOutput
+from rl.card_set_encoder import CardSetEncoder
 
 # from utils import log_to_csv
 
 INVALID_ACTION_PENALTY = -1e9
 
+# The buffers a rollout is made of, see `MMD.rollout`.
+_ROLLOUT_BUFFERS = [
+    "obs", "legal_actions_mask", "actions", "logprobs", "rewards", "dones", "values", "current_players"
+]
+
 
 def layer_init(layer, std=np.sqrt(2), bias_const=0.0):
     torch.nn.init.orthogonal_(layer.weight, std)
@@ -54,29 +60,56 @@ class CategoricalMasked(Categorical):
 
 
 class MMDAgent(nn.Module):
-    """A MMD agent module."""
+    """A MMD agent module.
 
-    def __init__(self, num_actions, observation_shape, device):
+    With `shared_trunk`, the actor and the critic are two heads on one 3x512 trunk instead
+    of two separate towers, halving the cost of `get_action_and_value`. `actor` is then
+    `Sequential(trunk, actor head)`, so actor-only checkpoints still hold the whole policy.
+    With `card_encoder`, the shared trunk is a `CardSetEncoder` instead.
+    """
+
+    def __init__(self, num_actions, observation_shape, device, shared_trunk=False, card_encoder=False):
         super().__init__()
-        self.critic = nn.Sequential(
+        self.shared_trunk = shared_trunk or card_encoder
+        if card_encoder:
+            trunk = CardSetEncoder(np.array(observation_shape).prod(), hidden_size=256)
+            self.critic = nn.Sequential(trunk, layer_init(nn.Linear(256, 1), std=1.0))
+            self.actor = nn.Sequential(
+                trunk, layer_init(nn.Linear(256, num_actions), std=0.01)
+            )
+        elif shared_trunk:
+            trunk = nn.Sequential(
+                layer_init(nn.Linear(np.array(observation_shape).prod(), 512)),
+                nn.Tanh(),
+                layer_init(nn.Linear(512, 512)),
+                nn.Tanh(),
+                layer_init(nn.Linear(512, 512)),
+                nn.Tanh(),
+            )
+            self.critic = nn.Sequential(trunk, layer_init(nn.Linear(512, 1), std=1.0))
+            self.actor = nn.Sequential(
+                trunk, layer_init(nn.Linear(512, num_actions), std=0.01)
+            )
+        else:
+            self.critic = nn.Sequential(
             
-            layer_init(nn.Linear(np.array(observation_shape).prod(), 512)),
-            nn.Tanh(),
-            layer_init(nn.Linear(512, 512)),
-            nn.Tanh(),
-            layer_init(nn.Linear(512, 512)),
-            nn.Tanh(),
-            layer_init(nn.Linear(512, 1), std=1.0),
-        )
-        self.actor = nn.Sequential(
-            layer_init(nn.Linear(np.array(observation_shape).prod(), 512)),
-            nn.Tanh(),
-            layer_init(nn.Linear(512, 512)),
-            nn.Tanh(),
-            layer_init(nn.Linear(512, 512)),
-            nn.Tanh(),
-            layer_init(nn.Linear(512, num_actions), std=0.01),
-        )
+                layer_init(nn.Linear(np.array(observation_shape).prod(), 512)),
+                nn.Tanh(),
+                layer_init(nn.Linear(512, 512)),
+                nn.Tanh(),
+                layer_init(nn.Linear(512, 512)),
+                nn.Tanh(),
+                layer_init(nn.Linear(512, 1), std=1.0),
+            )
+            self.actor = nn.Sequential(
+                layer_init(nn.Linear(np.array(observation_shape).prod(), 512)),
+                nn.Tanh(),
+                layer_init(nn.Linear(512, 512)),
+                nn.Tanh(),
+                layer_init(nn.Linear(512, 512)),
+                nn.Tanh(),
+                layer_init(nn.Linear(512, num_actions), std=0.01),
+            )
         self.device = device
         self.num_actions = num_actions
         self.register_buffer("mask_value", torch.tensor(INVALID_ACTION_PENALTY))
@@ -88,7 +121,13 @@ class MMDAgent(nn.Module):
         if legal_actions_mask is None:
             legal_actions_mask = torch.ones((len(x), self.num_actions)).bool()
 
-        logits = self.actor(x)
+        if self.shared_trunk:
+            hidden = self.actor[0](x)
+            logits = self.actor[1](hidden)
+            value = self.critic[1](hidden)
+        else:
+            logits = self.actor(x)
+            value = self.critic(x)
         probs = CategoricalMasked(
             logits=logits, masks=legal_actions_mask, mask_value=self.mask_value
         )
@@ -98,7 +137,7 @@ class MMDAgent(nn.Module):
             action,
             probs.log_prob(action),
             probs.entropy(),
-            self.critic(x),
+            value,
             probs.probs,
         )
 
@@ -171,6 +210,62 @@ def legal_actions_to_mask(legal_actions_list, num_actions):
     return legal_actions_mask
 
 
+def pack_mask(mask):
+    """Packs boolean masks [..., num_actions] into uint8 [..., ceil(num_actions / 8)], bit i of byte j
+    holding action 8 * j + i (`np.packbits` with `bitorder="little"`)."""
+    num_bytes = -(-mask.shape[-1] // 8)
+    padded = torch.nn.functional.pad(mask, (0, (8 * num_bytes) - mask.shape[-1]))
+    bits = padded.view(*mask.shape[:-1], num_bytes, 8).to(torch.uint8)
+    return (bits << torch.arange(8, dtype=torch.uint8, device=mask.device)).sum(dim=-1, dtype=torch.uint8)
+
+
+def unpack_mask(packed, num_actions):
+    """Inverse of `pack_mask`."""
+    bits = (packed.unsqueeze(-1) >> torch.arange(8, dtype=torch.uint8, device=packed.device)) & 1
+    return bits.view(*packed.shape[:-1], -1)[..., :num_actions].bool()
+
+
+def reverse_discounted_sum(x, dones, discount):
+    """Computes y[t] = x[t] + discount[t] * (1 - dones[t]) * y[t + 1], with y[T] = 0.
+
+    `x` and `dones` are [steps, envs] and `discount` is a number or a tensor [steps, envs].
+    The scan runs backwards over the steps, updating every env at once, so its cost and
+    memory are linear in the number of steps.
+    """
+    scale = discount * (1.0 - dones)
+    y = torch.empty_like(x)
+    last = torch.zeros_like(x[0])
+    for t in reversed(range(x.shape[0])):
+        last = y[t] = x[t] + scale[t] * last
+    return y
+
+
+class CompiledWithFallback:
+    """Calls `torch.compile(fn)`, or `fn` itself once compiling it has failed.
+
+    torch.compile needs a working backend (a C++ compiler for CPU kernels) and only fails
+    on the first call, so the failure is caught there and the function runs eagerly from
+    then on.
+    """
+
+    def __init__(self, fn):
+        self.fn = fn
+        try:
+            self.compiled = torch.compile(fn)
+        except Exception as e:  # pylint: disable=broad-except
+            print(f"Cannot compile {fn.__name__}, running it eagerly: {e!r}")
+            self.compiled = None
+
+    def __call__(self, *args, **kwargs):
+        if self.compiled is not None:
+            try:
+                return self.compiled(*args, **kwargs)
+            except Exception as e:  # pylint: disable=broad-except
+                print(f"Compiling {self.fn.__name__} failed, running it eagerly: {e!r}")
+                self.compiled = None
+        return self.fn(*args, **kwargs)
+
+
 class MMD(nn.Module):
     """MMD Agent implementation in PyTorch.
 
@@ -180,6 +275,18 @@ class MMD(nn.Module):
     open_spiel/python/vector_env.py). In practice, this tends to improve PPO's
     performance. The number of parallel environments is controlled by the
     num_envs argument.
+
+    With `compact_storage`, the rollout buffers keep observations as int8 and legal-action
+    masks bit-packed (see `pack_mask`), and `learn` converts them back one minibatch at a
+    time. This cuts the memory of a rollout step about fourfold for the Splendor games, whose
+    observations are small integers; observations that do not fit in an int8 are truncated.
+
+    With `vtrace`, the batch may come from an older policy (see `rollout` and
+    `load_rollout`): `learn` recomputes the values and log-probabilities of the batch with
+    the current networks and takes its advantages and value targets from V-trace
+    (https://arxiv.org/abs/1802.01561) instead of GAE, with importance weights truncated at
+    `vtrace_rho_bar` and `vtrace_c_bar`. The ratio of the loss stays relative to the policy
+    that collected the batch, so its clipping also bounds the update from that policy.
     """
 
     def __init__(
@@ -206,6 +313,11 @@ class MMD(nn.Module):
         device="cpu",
         agent_fn=MMDAtariAgent,
         log_file=None,
+        compile=False,
+        compact_storage=False,
+        vtrace=False,
+        vtrace_rho_bar=1.0,
+        vtrace_c_bar=1.0,
     ):
         super().__init__()
 
@@ -236,19 +348,40 @@ class MMD(nn.Module):
         self.value_coef = value_coef
         self.max_grad_norm = max_grad_norm
         self.target_kl = target_kl
+        self.vtrace = vtrace
+        self.vtrace_rho_bar = vtrace_rho_bar
+        self.vtrace_c_bar = vtrace_c_bar
 
         # Initialize networks
         print("Input shape", self.input_shape)
         self.network = agent_fn(self.num_actions, self.input_shape, device).to(device)
         self.optimizer = optim.Adam(self.parameters(), lr=self.learning_rate, eps=1e-5)
 
+        # Compiled action sampling and loss, see `CompiledWithFallback`.
+        self._compiled_action_and_value = None
+        self._compiled_minibatch_loss = None
+        if compile:
+            self._compiled_action_and_value = CompiledWithFallback(
+                self.network.get_action_and_value
+            )
+            self._compiled_minibatch_loss = CompiledWithFallback(self.minibatch_loss)
+
         # Initialize training buffers
-        self.legal_actions_mask = torch.zeros(
-            (self.steps_per_batch, self.num_envs, self.num_actions), dtype=torch.bool
-        ).to(device)
-        self.obs = torch.zeros(
-            (self.steps_per_batch, self.num_envs, *self.input_shape)
-        ).to(device)
+        self.compact_storage = compact_storage
+        if compact_storage:
+            self.legal_actions_mask = torch.zeros(
+                (self.steps_per_batch, self.num_envs, -(-self.num_actions // 8)), dtype=torch.uint8
+            ).to(device)
+            self.obs = torch.zeros(
+                (self.steps_per_batch, self.num_envs, *self.input_shape), dtype=torch.int8
+            ).to(device)
+        else:
+            self.legal_actions_mask = torch.zeros(
+                (self.steps_per_batch, self.num_envs, self.num_actions), dtype=torch.bool
+            ).to(device)
+            self.obs = torch.zeros(
+                (self.steps_per_batch, self.num_envs, *self.input_shape)
+            ).to(device)
         self.actions = torch.zeros((self.steps_per_batch, self.num_envs)).to(device)
         self.logprobs = torch.zeros((self.steps_per_batch, self.num_envs)).to(device)
         self.rewards = torch.zeros((self.steps_per_batch, self.num_envs)).to(device)
@@ -260,6 +393,9 @@ class MMD(nn.Module):
 
         # Initialize counters
         self.cur_batch_idx = 0
+        # Buffer row of the next step of every env; rows only differ while a rollout
+        # is collected in groups of envs (see `step`).
+        self.env_batch_idx = np.zeros(self.num_envs, dtype=np.int64)
         self.total_steps_done = 0
         self.updates_done = 0
         self.start_time = time.time()
@@ -268,9 +404,17 @@ class MMD(nn.Module):
         return self.network.get_value(x)
 
     def get_action_and_value(self, x, legal_actions_mask=None, action=None):
+        if self._compiled_action_and_value is not None:
+            return self._compiled_action_and_value(x, legal_actions_mask, action)
         return self.network.get_action_and_value(x, legal_actions_mask, action)
 
-    def step(self, time_step, is_evaluation=False):
+    def step(self, time_step, is_evaluation=False, envs=slice(None)):
+        """Acts in every env of `time_step`.
+
+        `envs` is the slice of envs `time_step` belongs to. Groups of envs may be stepped
+        independently (calling `post_step` with the same slice), as long as every group
+        has done the same number of steps when `learn` is called.
+        """
         if is_evaluation:
             with torch.no_grad():
                 legal_actions_mask = legal_actions_to_mask(
@@ -328,12 +472,12 @@ class MMD(nn.Module):
                 )
 
                 # store
-                self.legal_actions_mask[self.cur_batch_idx] = legal_actions_mask
-                self.obs[self.cur_batch_idx] = obs
-                self.actions[self.cur_batch_idx] = action
-                self.logprobs[self.cur_batch_idx] = logprob
-                self.values[self.cur_batch_idx] = value.flatten()
-                self.current_players[self.cur_batch_idx] = current_players
+                row = self.env_batch_idx[envs][0]
+                self.store_observations(row, envs, obs, legal_actions_mask)
+                self.actions[row, envs] = action
+                self.logprobs[row, envs] = logprob
+                self.values[row, envs] = value.flatten()
+                self.current_players[row, envs] = current_players
 
                 agent_output = [
                     StepOutput(action=a.item(), probs=p)
@@ -341,143 +485,268 @@ class MMD(nn.Module):
                 ]
                 return agent_output
 
-    def post_step(self, reward, done):
-        self.rewards[self.cur_batch_idx] = torch.tensor(reward).to(self.device).view(-1)
-        self.dones[self.cur_batch_idx] = torch.tensor(done).to(self.device).view(-1)
+    def post_step(self, reward, done, envs=slice(None)):
+        row = self.env_batch_idx[envs][0]
+        self.rewards[row, envs] = torch.tensor(reward).to(self.device).view(-1)
+        self.dones[row, envs] = torch.tensor(done).to(self.device).view(-1)
+
+        self.total_steps_done += len(reward)
+        self.env_batch_idx[envs] += 1
+        self.cur_batch_idx = int(self.env_batch_idx.min())
+
+    def step_batch(self, obs, legal_actions_mask, current_players, envs=slice(None)):
+        """Acts from preallocated arrays, such as those of `SharedMemoryVectorEnv.batch()`.
+
+        The arrays are read through `torch.from_numpy` views and copied straight into the
+        rollout buffers, without building per-env lists or `StepOutput`s. Returns the
+        actions as a view of `self.actions`, valid until the next `learn`.
+        """
+        with torch.inference_mode():
+            row = self.env_batch_idx[envs][0]
+            if self.compact_storage:
+                obs_buffer = torch.from_numpy(obs).to(self.device)
+                mask_buffer = torch.from_numpy(legal_actions_mask).to(self.device)
+                self.store_observations(row, envs, obs_buffer, mask_buffer)
+            else:
+                obs_buffer = self.obs[row, envs]
+                mask_buffer = self.legal_actions_mask[row, envs]
+                obs_buffer.copy_(torch.from_numpy(obs))
+                mask_buffer.copy_(torch.from_numpy(legal_actions_mask))
+            self.current_players[row, envs].copy_(torch.from_numpy(current_players))
+
+            action, logprob, _, value, _ = self.get_action_and_value(
+                obs_buffer, legal_actions_mask=mask_buffer
+            )
+            self.actions[row, envs].copy_(action)
+            self.logprobs[row, envs].copy_(logprob)
+            self.values[row, envs].copy_(value.view(-1))
+            return self.actions[row, envs]
+
+    def post_step_batch(self, reward, done, envs=slice(None)):
+        """`post_step` for arrays of rewards and done flags, such as those of `step_wait_arrays()`."""
+        with torch.inference_mode():
+            row = self.env_batch_idx[envs][0]
+            self.rewards[row, envs].copy_(torch.from_numpy(reward))
+            self.dones[row, envs].copy_(torch.from_numpy(done))
+
+        self.total_steps_done += len(reward)
+        self.env_batch_idx[envs] += 1
+        self.cur_batch_idx = int(self.env_batch_idx.min())
+
+    def store_observations(self, row, envs, obs, legal_actions_mask):
+        """Writes the observations and legal-action masks of `envs` to buffer row `row`."""
+        if self.compact_storage:
+            legal_actions_mask = pack_mask(legal_actions_mask)
+        self.obs[row, envs].copy_(obs)
+        self.legal_actions_mask[row, envs].copy_(legal_actions_mask)
+
+    def compute_advantages(self, next_value):
+        """Returns the advantages and returns of the collected batch, bootstrapped from `next_value`."""
+        nextnonterminal = 1.0 - self.dones
+        if self.gae:
+            nextvalues = torch.cat([self.values[1:], next_value])
+            deltas = self.rewards + self.gamma * nextvalues * nextnonterminal - self.values
+            advantages = reverse_discounted_sum(deltas, self.dones, self.gamma * self.gae_lambda)
+            returns = advantages + self.values
+        else:
+            rewards = self.rewards.clone()
+            rewards[-1] += self.gamma * nextnonterminal[-1] * next_value.view(-1)
+            returns = reverse_discounted_sum(rewards, self.dones, self.gamma)
+            advantages = returns - self.values
+        return advantages, returns
+
+    def compute_vtrace(self, next_value, values, logratio):
+        """Returns the V-trace advantages and value targets of the collected batch.
+
+        `values` are those of the current networks and `logratio` the log-ratios of the current
+        policy to the one that collected the batch, both [steps, envs].
+        """
+        ratio = logratio.exp()
+        rhos = ratio.clamp(max=self.vtrace_rho_bar)
+        cs = self.gae_lambda * ratio.clamp(max=self.vtrace_c_bar)
+        nextnonterminal = 1.0 - self.dones
+        nextvalues = torch.cat([values[1:], next_value])
+        deltas = rhos * (self.rewards + self.gamma * nextvalues * nextnonterminal - values)
+        vs = values + reverse_discounted_sum(deltas, self.dones, self.gamma * cs)
+        next_vs = torch.cat([vs[1:], next_value])
+        advantages = rhos * (self.rewards + self.gamma * next_vs * nextnonterminal - values)
+        return advantages, vs
+
+    def rollout(self):
+        """Returns a copy of the collected batch, for `load_rollout`, and starts a new one."""
+        batch = {name: getattr(self, name).clone() for name in _ROLLOUT_BUFFERS}
+        self.cur_batch_idx = 0
+        self.env_batch_idx[:] = 0
+        return batch
+
+    def load_rollout(self, batch):
+        """Makes a batch returned by `rollout`, possibly of another agent, the one `learn` learns from."""
+        for name in _ROLLOUT_BUFFERS:
+            getattr(self, name).copy_(batch[name])
+        self.total_steps_done += self.batch_size
+        self.env_batch_idx[:] = self.steps_per_batch
+        self.cur_batch_idx = self.steps_per_batch
+
+    def minibatch_loss(
+        self,
+        obs,
+        legal_actions_mask,
+        actions,
+        logprobs,
+        advantages,
+        returns,
+        values,
+        ent_kl_coef_mult,
+    ):
+        """Runs the networks on a minibatch and returns the MMD loss with its terms.
 
-        self.total_steps_done += self.num_envs
-        self.cur_batch_idx += 1
+        Returns the loss, policy loss, value loss, entropy, old and new approximate KL and
+        clip fraction, all as tensors.
+        """
+        _, newlogprob, entropy, newvalue, _ = self.network.get_action_and_value(
+            obs, legal_actions_mask=legal_actions_mask, action=actions
+        )
+        logratio = newlogprob - logprobs
+        ratio = logratio.exp()
 
-    def learn(self, time_step, steps_so_far, total_steps):
-        next_obs = torch.Tensor(
-            np.array(
-                [
-                    np.reshape(
-                        ts.observations["info_state"][ts.current_player()],
-                        self.input_shape,
-                    )
-                    for ts in time_step
-                ]
+        with torch.no_grad():
+            # calculate approx_kl http://joschu.net/blog/kl-approx.html
+            old_approx_kl = (-logratio).mean()
+            approx_kl = ((ratio - 1) - logratio).mean()  # forward KL
+            clipfrac = ((ratio - 1.0).abs() > self.clip_coef).float().mean()
+
+        mb_advantages = advantages
+        if self.normalize_advantages:
+            mb_advantages = (mb_advantages - mb_advantages.mean()) / (
+                mb_advantages.std() + 1e-8
+            )
+
+        # Policy loss
+        pg_loss1 = -mb_advantages * ratio
+        pg_loss2 = -mb_advantages * torch.clamp(
+            ratio, 1 - self.clip_coef, 1 + self.clip_coef
+        )
+        pg_loss = torch.max(pg_loss1, pg_loss2).mean()
+
+        # Value loss
+        newvalue = newvalue.view(-1)
+        if self.clip_vloss:
+            v_loss_unclipped = (newvalue - returns) ** 2
+            v_clipped = values + torch.clamp(
+                newvalue - values,
+                -self.clip_coef,
+                self.clip_coef,
             )
-        ).to(self.device)
+            v_loss_clipped = (v_clipped - returns) ** 2
+            v_loss_max = torch.max(v_loss_unclipped, v_loss_clipped)
+            v_loss = 0.5 * v_loss_max.mean()
+        else:
+            v_loss = 0.5 * ((newvalue - returns) ** 2).mean()
+
+        # entropy and KL loss
+        entropy_loss = entropy.mean()
+        backward_kl_approx = ratio * logratio - (
+            ratio - 1
+        )  # see http://joschu.net/blog/kl-approx.html
+        backward_kl_loss = backward_kl_approx.mean()
+
+        loss = (
+            pg_loss
+            - self.entropy_coef * ent_kl_coef_mult * entropy_loss
+            + self.value_coef * v_loss
+            + self.kl_coef * ent_kl_coef_mult * backward_kl_loss
+        )
+        return loss, pg_loss, v_loss, entropy_loss, old_approx_kl, approx_kl, clipfrac
+
+    def learn(self, time_step, steps_so_far, total_steps):
+        """Updates the networks on the collected batch.
+
+        `time_step` holds the time steps after the last rollout step, or directly
+        their observations as an array [env, size].
+        """
+        if isinstance(time_step, np.ndarray):
+            next_obs = torch.from_numpy(time_step).to(self.device)
+        else:
+            next_obs = torch.Tensor(
+                np.array(
+                    [
+                        np.reshape(
+                            ts.observations["info_state"][ts.current_player()],
+                            self.input_shape,
+                        )
+                        for ts in time_step
+                    ]
+                )
+            ).to(self.device)
+
+        # flatten the batch
+        b_legal_actions_mask = self.legal_actions_mask.reshape((-1, self.legal_actions_mask.shape[-1]))
+        b_obs = self.obs.reshape((-1,) + self.input_shape)
+        b_logprobs = self.logprobs.reshape(-1)
+        b_actions = self.actions.reshape(-1).long()
 
         # bootstrap value if not done
         with torch.no_grad():
             next_value = self.get_value(next_obs).reshape(1, -1)
-            if self.gae:
-                advantages = torch.zeros_like(self.rewards).to(self.device)
-                lastgaelam = 0
-                for t in reversed(range(self.steps_per_batch)):
-                    nextvalues = (
-                        next_value
-                        if t == self.steps_per_batch - 1
-                        else self.values[t + 1]
-                    )
-                    nextnonterminal = 1.0 - self.dones[t]
-                    delta = (
-                        self.rewards[t]
-                        + self.gamma * nextvalues * nextnonterminal
-                        - self.values[t]
-                    )
-                    advantages[t] = lastgaelam = (
-                        delta
-                        + self.gamma * self.gae_lambda * nextnonterminal * lastgaelam
-                    )
-                returns = advantages + self.values
+            if self.vtrace:
+                obs, legal_actions_mask = b_obs, b_legal_actions_mask
+                if self.compact_storage:
+                    obs = obs.float()
+                    legal_actions_mask = unpack_mask(legal_actions_mask, self.num_actions)
+                _, logprobs, _, values, _ = self.network.get_action_and_value(
+                    obs, legal_actions_mask=legal_actions_mask, action=b_actions
+                )
+                values = values.view(self.values.shape)
+                logratio = logprobs.view(self.logprobs.shape) - self.logprobs
+                advantages, returns = self.compute_vtrace(next_value, values, logratio)
             else:
-                returns = torch.zeros_like(self.rewards).to(self.device)
-                for t in reversed(range(self.steps_per_batch)):
-                    next_return = (
-                        next_value if t == self.steps_per_batch - 1 else returns[t + 1]
-                    )
-                    nextnonterminal = 1.0 - self.dones[t]
-                    returns[t] = (
-                        self.rewards[t] + self.gamma * nextnonterminal * next_return
-                    )
-                advantages = returns - self.values
+                values = self.values
+                advantages, returns = self.compute_advantages(next_value)
 
-        # flatten the batch
-        b_legal_actions_mask = self.legal_actions_mask.reshape((-1, self.num_actions))
-        b_obs = self.obs.reshape((-1,) + self.input_shape)
-        b_logprobs = self.logprobs.reshape(-1)
-        b_actions = self.actions.reshape(-1)
         b_advantages = advantages.reshape(-1)
         b_returns = returns.reshape(-1)
-        b_values = self.values.reshape(-1)
+        b_values = values.reshape(-1)
         b_playersigns = -2.0 * self.current_players.reshape(-1) + 1.0
         b_advantages *= b_playersigns
 
+        # loss entropy and backward KL coefficient multipliers from https://arxiv.org/pdf/2206.05825
+        # add +1000 to avoid huge losses at the beginning
+        # (a tensor, so that a compiled loss is not recompiled for every value).
+        ent_kl_coef_mult = torch.tensor(
+            np.sqrt(total_steps / (steps_so_far + 1000)), device=self.device
+        )
+        minibatch_loss = self._compiled_minibatch_loss or self.minibatch_loss
+
         # Optimizing the policy and value network
-        b_inds = np.arange(self.batch_size)
-        clipfracs = []
         for _ in range(self.update_epochs):
-            np.random.shuffle(b_inds)
+            b_inds = torch.randperm(self.batch_size, device=self.device)
             for start in range(0, self.batch_size, self.minibatch_size):
                 end = start + self.minibatch_size
                 mb_inds = b_inds[start:end]
-
-                _, newlogprob, entropy, newvalue, _ = self.get_action_and_value(
-                    b_obs[mb_inds],
-                    legal_actions_mask=b_legal_actions_mask[mb_inds],
-                    action=b_actions.long()[mb_inds],
-                )
-                logratio = newlogprob - b_logprobs[mb_inds]
-                ratio = logratio.exp()
-
-                with torch.no_grad():
-                    # calculate approx_kl http://joschu.net/blog/kl-approx.html
-                    old_approx_kl = (-logratio).mean()
-                    approx_kl = ((ratio - 1) - logratio).mean()  # forward KL
-                    clipfracs += [
-                        ((ratio - 1.0).abs() > self.clip_coef).float().mean().item()
-                    ]
-
-                mb_advantages = b_advantages[mb_inds]
-                if self.normalize_advantages:
-                    mb_advantages = (mb_advantages - mb_advantages.mean()) / (
-                        mb_advantages.std() + 1e-8
-                    )
-
-                # Policy loss
-                pg_loss1 = -mb_advantages * ratio
-                pg_loss2 = -mb_advantages * torch.clamp(
-                    ratio, 1 - self.clip_coef, 1 + self.clip_coef
+                mb_obs = b_obs[mb_inds]
+                mb_legal_actions_mask = b_legal_actions_mask[mb_inds]
+                if self.compact_storage:
+                    mb_obs = mb_obs.float()
+                    mb_legal_actions_mask = unpack_mask(mb_legal_actions_mask, self.num_actions)
+
+                (
+                    loss,
+                    pg_loss,
+                    v_loss,
+                    entropy_loss,
+                    old_approx_kl,
+                    approx_kl,
+                    clipfrac,
+                ) = minibatch_loss(
+                    mb_obs,
+                    mb_legal_actions_mask,
+                    b_actions[mb_inds],
+                    b_logprobs[mb_inds],
+                    b_advantages[mb_inds],
+                    b_returns[mb_inds],
+                    b_values[mb_inds],
+                    ent_kl_coef_mult,
                 )
-                pg_loss = torch.max(pg_loss1, pg_loss2).mean()
-
-                # Value loss
-                newvalue = newvalue.view(-1)
-                if self.clip_vloss:
-                    v_loss_unclipped = (newvalue - b_returns[mb_inds]) ** 2
-                    v_clipped = b_values[mb_inds] + torch.clamp(
-                        newvalue - b_values[mb_inds],
-                        -self.clip_coef,
-                        self.clip_coef,
-                    )
-                    v_loss_clipped = (v_clipped - b_returns[mb_inds]) ** 2
-                    v_loss_max = torch.max(v_loss_unclipped, v_loss_clipped)
-                    v_loss = 0.5 * v_loss_max.mean()
-                else:
-                    v_loss = 0.5 * ((newvalue - b_returns[mb_inds]) ** 2).mean()
-
-                # entropy and KL loss
-                entropy_loss = entropy.mean()
-                backward_kl_approx = ratio * logratio - (
-                    ratio - 1
-                )  # see http://joschu.net/blog/kl-approx.html
-                backward_kl_loss = backward_kl_approx.mean()
-
-                # loss entropy and backward KL coefficient multipliers from https://arxiv.org/pdf/2206.05825
-                # add +1000 to avoid huge losses at the beginning
-                ent_kl_coef_mult = np.sqrt(total_steps / (steps_so_far + 1000))
-
-                loss = (
-                    pg_loss
-                    - self.entropy_coef * ent_kl_coef_mult * entropy_loss
-                    + self.value_coef * v_loss
-                    + self.kl_coef * ent_kl_coef_mult * backward_kl_loss
-                )
-
                 self.optimizer.zero_grad()
                 loss.backward()
                 nn.utils.clip_grad_norm_(self.parameters(), self.max_grad_norm)
@@ -500,7 +769,7 @@ class MMD(nn.Module):
         #     "losses/entropy": entropy_loss.item(),
         #     "losses/old_approx_kl": old_approx_kl.item(),
         #     "losses/approx_kl": approx_kl.item(),
-        #     "losses/clipfrac": np.mean(clipfracs),
+        #     "losses/clipfrac": clipfrac.item(),
         #     "losses/explained_variance": explained_var,
         #     "charts/SPS": int(
         #         self.total_steps_done / (time.time() - self.start_time)
@@ -511,6 +780,7 @@ class MMD(nn.Module):
         # Update counters
         self.updates_done += 1
         self.cur_batch_idx = 0
+        self.env_batch_idx[:] = 0
 
     def save(self, path):
         """Saves the actor weights to path"""
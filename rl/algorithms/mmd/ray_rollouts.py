@@ -0,0 +1,63 @@
+"""Rollout collection for `RunMMD` on Ray actors.
+
+`RayRollouts` starts `num_workers` `RolloutActor`s on a local Ray cluster. Each actor holds
+a slice of the envs and a CPU copy of the agent (an `MMD`, for its rollout buffers). After
+every update the learner puts its weights in the object store once; every actor loads
+them, collects `num_steps` steps of its envs and returns its rollout (see `MMD.rollout`),
+and the learner concatenates the rollouts along the env dimension into one batch. Rollouts
+are collected with the latest weights, so the batch is on-policy as in the other modes.
+
+The cluster is local (`address="local"`, no dashboard, no usage stats), so training needs
+no network. Actors step their envs in-process, one CPU each, from the working directory of
+the learner (the cards are read from `./data`).
+"""
+
+import os
+
+import numpy as np
+import ray
+import torch
+
+from rl.algorithms.mmd.run_mmd import RolloutActor
+
+_REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+class RayRollouts:
+    """Collects the rollouts of `RunMMD` on `num_workers` Ray actors."""
+
+    def __init__(self, game_name, seeds, num_workers, agent_kwargs, num_steps):
+        num_workers = max(1, min(num_workers, len(seeds)))
+        if not ray.is_initialized():
+            os.environ.setdefault("RAY_USAGE_STATS_ENABLED", "0")
+            ray.init(
+                address="local",
+                num_cpus=num_workers,
+                include_dashboard=False,
+                log_to_driver=False,
+                runtime_env={"env_vars": {"PYTHONPATH": _REPOSITORY_ROOT}},
+            )
+        actor_cls = ray.remote(num_cpus=1)(RolloutActor)
+        self.actors = [
+            actor_cls.remote(game_name, [seeds[i] for i in env_ids], agent_kwargs, num_steps, os.getcwd())
+            for env_ids in np.array_split(np.arange(len(seeds)), num_workers)
+        ]
+
+    def collect(self, network):
+        """Broadcasts the weights of `network` and gathers one rollout of every actor.
+
+        Returns the rollouts concatenated along the env dimension, for `MMD.load_rollout`,
+        the observations after them [env, size] and the seconds the actors spent in inference
+        and stepping their envs, summed over the actors.
+        """
+        weights = ray.put({name: tensor.detach().cpu() for name, tensor in network.state_dict().items()})
+        results = ray.get([actor.collect.remote(weights) for actor in self.actors])
+        batch = {name: torch.cat([rollout[name] for rollout, _, _ in results], dim=1) for name in results[0][0]}
+        next_obs = np.concatenate([next_obs for _, next_obs, _ in results])
+        seconds = {name: sum(actor_seconds[name] for _, _, actor_seconds in results) for name in results[0][2]}
+        return batch, next_obs, seconds
+
+    def close(self):
+        for actor in self.actors:
+            ray.kill(actor)
+        self.actors = []
@@ -22,7 +22,10 @@ https://github.com/ray-project/ray/tree/6812c6e9696532a639e5cfce454f50292a55e4d4
 """
 
 # pylint: disable=g-importing-member
+import functools
+import queue
 import random
+import threading
 import time
 import numpy as np
 import torch
@@ -35,12 +38,15 @@ from rl.algorithms.mmd.mmd import MMDAgent
 from open_spiel.python.rl_environment import ChanceEventSampler
 from open_spiel.python.rl_environment import Environment
 from open_spiel.python.vector_env import SyncVectorEnv
+from rl.shared_weights import SharedWeights
+from rl.vector_env import SharedMemoryVectorEnv
 import open_spiel.python.rl_agent as rl_agent
 
 from open_spiel.python.algorithms import random_agent as ra
 from open_spiel.python import rl_environment
 
 from rl import eval
+from rl.background_eval import BackgroundEvaluator
     
 
 def make_single_env(game_name, seed, config):
@@ -51,6 +57,146 @@ def make_single_env(game_name, seed, config):
     return gen_env
 
 
+class RolloutActor:
+    """Steps a slice of the envs with a CPU copy of the agent, in a Ray actor or a `RolloutProcess`."""
+
+    def __init__(self, game_name, seeds, agent_kwargs, num_steps, working_dir):
+        os.chdir(working_dir)
+        # Registers the Splendor games in the actor's process.
+        import splendor_hard.splendor_game  # pylint: disable=g-import-not-at-top,unused-import
+        import splendor_medium.splendor_game  # pylint: disable=g-import-not-at-top,unused-import
+        import splendor_lite.splendor_game  # pylint: disable=g-import-not-at-top,unused-import
+
+        torch.set_num_threads(1)
+        # Splendor shuffles its decks with `random`; actors would otherwise all deal the same games.
+        random.seed(seeds[0])
+        np.random.seed(seeds[0])
+        torch.manual_seed(seeds[0])
+        self.envs = SyncVectorEnv([make_single_env(game_name, seed, None)() for seed in seeds])
+        self.agent = MMD(**{**agent_kwargs, "num_envs": len(seeds), "device": "cpu", "compile": False})
+        self.num_steps = num_steps
+        self.time_steps = self.envs.reset()
+
+    def collect(self, weights=None):
+        """Loads `weights`, if given, and collects `num_steps` steps. Returns the rollout, the
+        observations after it and the seconds spent in inference and stepping the envs."""
+        if weights is not None:
+            self.agent.network.load_state_dict(weights)
+        seconds = {"inference": 0.0, "env": 0.0}
+        for _ in range(self.num_steps):
+            start = time.perf_counter()
+            agent_outputs = self.agent.step(self.time_steps)
+            seconds["inference"] += time.perf_counter() - start
+            start = time.perf_counter()
+            self.time_steps, rewards, dones, _ = self.envs.step(agent_outputs, reset_if_done=True)
+            seconds["env"] += time.perf_counter() - start
+            self.agent.post_step([reward[0] for reward in rewards], dones)
+        next_obs = np.array([ts.observations["info_state"][ts.current_player()] for ts in self.time_steps],
+                            dtype=np.float32)
+        return self.agent.rollout(), next_obs, seconds
+
+
+def _rollout_process(actor_args, weights, rollouts, stopped):
+    actor = RolloutActor(*actor_args)
+    while not stopped.is_set():
+        version = weights.load(actor.agent.network)
+        batch, next_obs, seconds = actor.collect()
+        seconds["waiting"] = seconds["env"]  # The actor steps its envs itself.
+        while not stopped.is_set():
+            try:
+                rollouts.put((batch, next_obs, version, seconds), timeout=0.1)
+                break
+            except queue.Full:
+                pass
+
+
+def _make_eval_agent(agent_kwargs):
+    return MMD(**{**agent_kwargs, "num_envs": 1, "steps_per_batch": 1, "device": "cpu", "compile": False,
+                  "log_file": None})
+
+
+def _load_eval_snapshot(agent, state_dict):
+    agent.network.load_state_dict(state_dict)
+
+
+class RolloutWorker(threading.Thread):
+    """Collects rollouts with its own agent into a bounded queue, while the learner learns.
+
+    Every rollout is collected with the latest weights the learner has published, so it is
+    at most `queue_size + 1` updates old when the learner gets it; the learner corrects for
+    this with V-trace (see `MMD`). A full queue blocks the worker. The worker times its
+    collection in counters of its own, which travel with each rollout, so the learner never
+    shares `collection_seconds` with this thread.
+    """
+
+    def __init__(self, runner, envs, agent, queue_size):
+        super().__init__(daemon=True)
+        self.runner = runner
+        self.envs = envs
+        self.agent = agent
+        self.rollouts = queue.Queue(maxsize=queue_size)
+        self.stopped = threading.Event()
+        self.weights = SharedWeights(agent.network)
+
+    def publish(self, agent):
+        """Makes the current weights of `agent` those of the next rollouts."""
+        self.weights.publish(agent.network, agent.updates_done)
+
+    def run(self):
+        while not self.stopped.is_set():
+            version = self.weights.load(self.agent.network)
+            seconds = {"inference": 0.0, "env": 0.0, "waiting": 0.0}
+            next_obs = np.copy(self.runner.collect_batched(self.envs, self.agent, seconds))
+            item = (self.agent.rollout(), next_obs, version, seconds)
+            while not self.stopped.is_set():
+                try:
+                    self.rollouts.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class RolloutProcess:
+    """A `RolloutWorker` in its own process, stepping its own envs (see `RolloutActor`).
+
+    The learner's weights reach it through a `SharedWeights`, and the rollouts come back
+    through a `torch.multiprocessing` queue, which moves their tensors through shared memory.
+    """
+
+    def __init__(self, game_name, seeds, agent_kwargs, num_steps, queue_size, network, start_method=None):
+        context = torch.multiprocessing.get_context(start_method)
+        self.rollouts = context.Queue(maxsize=queue_size)
+        self.stopped = context.Event()
+        self.weights = SharedWeights(network)
+        self._process = context.Process(
+            target=_rollout_process,
+            args=((game_name, seeds, agent_kwargs, num_steps, os.getcwd()), self.weights, self.rollouts,
+                  self.stopped),
+            daemon=True,
+        )
+
+    def publish(self, agent):
+        """Makes the current weights of `agent` those of the next rollouts."""
+        self.weights.publish(agent.network, agent.updates_done)
+
+    def start(self):
+        self._process.start()
+
+    def stop(self):
+        self.stopped.set()
+        # The process only exits once the rollouts it has queued are read.
+        while self._process.is_alive():
+            try:
+                self.rollouts.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self._process.join()
+
+
 class RunMMD:
     def __init__(self, config, game, expl_callback):
         self.meta_config = config
@@ -71,17 +217,47 @@ class RunMMD:
             "cuda" if torch.cuda.is_available() and self.config.cuda else "cpu"
         )
 
-        envs = SyncVectorEnv(
-            [
-                make_single_env(
-                    str(self.game), self.meta_config.seed + i, self.meta_config
-                )()
-                for i in range(self.config.num_envs)
+        seeds = [self.meta_config.seed + i for i in range(self.config.num_envs)]
+        double_buffered = self.config.collection == "double_buffered"
+        ray_collection = self.config.collection == "ray"
+        asynchronous = self.config.learner == "async"
+        process_rollouts = asynchronous and self.config.rollout_worker == "process"
+        if asynchronous and self.config.collection != "sequential":
+            raise ValueError("The async learner needs sequential collection")
+        if asynchronous and not process_rollouts and self.config.vector_env != "process":
+            raise ValueError("The async learner with a rollout thread needs vector_env: process")
+        if double_buffered:
+            if self.config.vector_env != "process":
+                raise ValueError("Double-buffered collection needs vector_env: process")
+            half = self.config.num_envs // 2
+            groups = [slice(0, half), slice(half, self.config.num_envs)]
+            envs = [
+                SharedMemoryVectorEnv(
+                    str(self.game), seeds[group], max(1, self.config.num_env_workers // 2)
+                )
+                for group in groups
             ]
+        elif ray_collection or process_rollouts:
+            envs = None  # The envs live in the Ray actors or the rollout process.
+        elif self.config.vector_env == "process":
+            envs = SharedMemoryVectorEnv(
+                str(self.game), seeds, self.config.num_env_workers
+            )
+        else:
+            envs = SyncVectorEnv(
+                [
+                    make_single_env(
+                        str(self.game), self.meta_config.seed + i, self.meta_config
+                    )()
+                    for i in range(self.config.num_envs)
+                ]
+            )
+        self.agent_fn = functools.partial(
+            MMDAgent, shared_trunk=self.config.shared_trunk, card_encoder=self.config.card_encoder
         )
-        self.agent_fn = MMDAgent
 
-        game = envs.envs[0]._game  # pylint: disable=protected-access
+        env = rl_environment.Environment(self.game)
+        game = env.game
         num_players = game.num_players()
         info_state_shape = game.information_state_tensor_shape()
 
@@ -89,13 +265,11 @@ class RunMMD:
             num_players == 2
             and game.get_type().utility == pyspiel.GameType.Utility.ZERO_SUM
         )
-        assert envs.envs[0].is_turn_based
+        assert env.is_turn_based
         assert game.get_type().reward_model == pyspiel.GameType.RewardModel.TERMINAL
 
-        env = rl_environment.Environment(self.game)
-
         num_updates = self.meta_config.max_steps // batch_size + 1
-        self.agent = MMD(
+        agent_kwargs = dict(
             input_shape=info_state_shape,
             num_actions=game.num_distinct_actions(),
             num_players=game.num_players(),
@@ -118,35 +292,110 @@ class RunMMD:
             device=device,
             agent_fn=self.agent_fn,
             log_file=os.path.join(self.meta_config.experiment_dir, 'train_log.csv'),
+            compile=self.config.compile,
+            compact_storage=self.config.compact_storage,
+        )
+        self.agent = MMD(
+            **agent_kwargs,
+            vtrace=asynchronous,
+            vtrace_rho_bar=self.config.vtrace_rho_bar,
+            vtrace_c_bar=self.config.vtrace_c_bar,
         )
+        if ray_collection:
+            from rl.algorithms.mmd.ray_rollouts import RayRollouts  # pylint: disable=g-import-not-at-top
+
+            rollouts = RayRollouts(
+                str(self.game), seeds, self.config.num_ray_workers, agent_kwargs, self.config.num_steps
+            )
 
         random_agent = ra.RandomAgent(player_id=1, num_actions=game.num_distinct_actions())
+        if self.config.background_eval:
+            evaluator = BackgroundEvaluator(
+                str(self.game), functools.partial(_make_eval_agent, agent_kwargs), _load_eval_snapshot, 1000,
+                stats_save_name, mmd=True, num_envs=self.config.eval_envs,
+                num_env_workers=self.config.num_env_workers,
+                seed=self.meta_config.seed + self.config.num_envs,
+                max_half_width=self.config.eval_max_half_width,
+            )
+        elif self.config.eval_envs:
+            eval_envs = SharedMemoryVectorEnv(
+                str(self.game),
+                [self.meta_config.seed + self.config.num_envs + i for i in range(self.config.eval_envs)],
+                self.config.num_env_workers,
+            )
      
   
         
 
-        time_steps = envs.reset()
+        if double_buffered:
+            for group_envs in envs:
+                group_envs.reset()
+        elif envs is not None:
+            time_steps = envs.reset()
+        self.collection_seconds = {"inference": 0.0, "env": 0.0, "waiting": 0.0}
+        self.learner_seconds = {"waiting": 0.0, "staleness": 0.0, "rollouts": 0}
+        if process_rollouts:
+            worker = RolloutProcess(
+                str(self.game), seeds, agent_kwargs, self.config.num_steps, self.config.rollout_queue_size,
+                self.agent.network,
+            )
+        elif asynchronous:
+            worker = RolloutWorker(self, envs, MMD(**agent_kwargs), self.config.rollout_queue_size)
+        if asynchronous:
+            worker.publish(self.agent)
+            worker.start()
         cp_step = 0
         t0 = time.time()
         update = -1
         computed_safety_expl = False
         while self.agent.total_steps_done < self.meta_config.max_steps:
             update += 1
-            for _ in range(self.config.num_steps):
-                # Output of current player in each of the envs
-                agent_outputs = self.agent.step(time_steps)
-
-                # Advance all envs 
-                time_steps, rewards, dones, unreset_time_steps = envs.step(
-                    agent_outputs, reset_if_done=True
-                )
-                self.agent.post_step([reward[0] for reward in rewards], dones)
+            if asynchronous:
+                start = time.perf_counter()
+                batch, last_time_steps, version, seconds = worker.rollouts.get()
+                for name, value in seconds.items():
+                    self.collection_seconds[name] += value
+                self.learner_seconds["waiting"] += time.perf_counter() - start
+                self.learner_seconds["staleness"] += self.agent.updates_done - version
+                self.learner_seconds["rollouts"] += 1
+                self.agent.load_rollout(batch)
+            elif ray_collection:
+                start = time.perf_counter()
+                batch, last_time_steps, seconds = rollouts.collect(self.agent.network)
+                # The actors' own inference and env time; waiting is what the learner spent blocked on them.
+                self.collection_seconds["inference"] += seconds["inference"]
+                self.collection_seconds["env"] += seconds["env"]
+                self.collection_seconds["waiting"] += time.perf_counter() - start
+                self.agent.load_rollout(batch)
+            elif double_buffered:
+                last_time_steps = self.collect_double_buffered(envs, groups)
+            elif self.config.vector_env == "process":
+                last_time_steps = self.collect_batched(envs)
+            else:
+                for _ in range(self.config.num_steps):
+                    # Output of current player in each of the envs
+                    start = time.perf_counter()
+                    agent_outputs = self.agent.step(time_steps)
+                    self.collection_seconds["inference"] += time.perf_counter() - start
+
+                    # Advance all envs
+                    start = time.perf_counter()
+                    time_steps, rewards, dones, unreset_time_steps = envs.step(
+                        agent_outputs, reset_if_done=True
+                    )
+                    env_seconds = time.perf_counter() - start
+                    self.collection_seconds["env"] += env_seconds
+                    self.collection_seconds["waiting"] += env_seconds
+                    self.agent.post_step([reward[0] for reward in rewards], dones)
+                last_time_steps = time_steps
 
             if self.config.anneal_lr:
                 self.agent.anneal_learning_rate(update, num_updates)
             self.agent.learn(
-                time_steps, self.agent.total_steps_done, self.meta_config.max_steps
+                last_time_steps, self.agent.total_steps_done, self.meta_config.max_steps
             )
+            if asynchronous:
+                worker.publish(self.agent)
 
             if self.agent.total_steps_done > cp_step + self.meta_config.compute_exploitability_every:
                 cp_step = cp_step + self.meta_config.compute_exploitability_every
@@ -157,11 +406,24 @@ class RunMMD:
                 self.agent.save(model_save_name)
 
             if update % self.config.eval_every == 0:
-                stats = eval.eval_against_random_bots(env, self.agent, random_agent, 1000, mmd=True)
-                print(stats)
-                with open(stats_save_name, "ab") as bout:
-                    pickle.dump(update, bout)
-                    pickle.dump(stats, bout)
+                if self.config.background_eval:
+                    evaluator.submit(update, {
+                        name: tensor.detach().cpu().clone() for name, tensor in self.agent.network.state_dict().items()
+                    })
+                else:
+                    if self.config.eval_envs:
+                        stats = eval.eval_against_random_bots_batched(
+                            eval_envs, self.agent, 1000, seed=update, max_half_width=self.config.eval_max_half_width
+                        )
+                    else:
+                        stats = eval.eval_against_random_bots(
+                            env, self.agent, random_agent, 1000, mmd=True,
+                            max_half_width=self.config.eval_max_half_width,
+                        )
+                    print(stats)
+                    with open(stats_save_name, "ab") as bout:
+                        pickle.dump(update, bout)
+                        pickle.dump(stats, bout)
 
                 time_elapsed = time.time() - t0
                 time_remaining_est = (
@@ -171,7 +433,11 @@ class RunMMD:
                 )
                 print(
                     f"step {self.agent.total_steps_done}/{self.meta_config.max_steps} ; elapsed: {time_elapsed/60:.1f}min ; remaining: {time_remaining_est/60:.1f}min"
+                    f" ; {self.agent.total_steps_done / time_elapsed:.0f} steps/s"
                 )
+                print(self.collection_summary())
+                if asynchronous:
+                    print(self.learner_summary())
 
         if self.expl_callback is not None:
             self.expl_callback(
@@ -179,9 +445,97 @@ class RunMMD:
             )
 
         self.agent.save(model_save_name)
+        if asynchronous:
+            worker.stop()
+        if ray_collection:
+            rollouts.close()
+        if self.config.background_eval:
+            evaluator.close()
+        elif self.config.eval_envs:
+            eval_envs.close()
+        for group_envs in envs if double_buffered else [envs]:
+            if isinstance(group_envs, SharedMemoryVectorEnv):
+                group_envs.close()
 
         self.network = self.agent.network
 
+    def collect_batched(self, envs, agent=None, seconds=None):
+        """Collects `num_steps` steps of every env of a `SharedMemoryVectorEnv` through its arrays,
+        with `agent` or the learner's agent, timing them in `seconds` or `collection_seconds`.
+
+        Returns the observations after the last step.
+        """
+        agent = agent or self.agent
+        seconds = self.collection_seconds if seconds is None else seconds
+        for _ in range(self.config.num_steps):
+            start = time.perf_counter()
+            actions = agent.step_batch(*envs.batch())
+            seconds["inference"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            envs.step_async(actions.cpu(), reset_if_done=True)
+            rewards, dones = envs.step_wait_arrays()
+            env_seconds = time.perf_counter() - start
+            seconds["env"] += env_seconds
+            seconds["waiting"] += env_seconds
+            agent.post_step_batch(rewards[:, 0], dones)
+        return envs.batch()[0]
+
+    def collect_double_buffered(self, envs, groups):
+        """Collects `num_steps` steps of every env, alternating between two groups of envs.
+
+        While the network acts in one group, the workers of the other group step its envs, so
+        env latency is hidden behind inference. Returns the observations after the last step.
+        """
+        envs_a, envs_b = envs
+        group_a, group_b = groups
+        seconds = self.collection_seconds
+        busy_start = envs_a.busy_seconds + envs_b.busy_seconds
+
+        def act(group_envs, group):
+            start = time.perf_counter()
+            actions = self.agent.step_batch(*group_envs.batch(), envs=group)
+            seconds["inference"] += time.perf_counter() - start
+            return actions.cpu()
+
+        def wait(group_envs, group):
+            start = time.perf_counter()
+            rewards, dones = group_envs.step_wait_arrays()
+            seconds["waiting"] += time.perf_counter() - start
+            self.agent.post_step_batch(rewards[:, 0], dones, envs=group)
+
+        envs_a.step_async(act(envs_a, group_a), reset_if_done=True)
+        for step in range(self.config.num_steps):
+            actions_b = act(envs_b, group_b)  # While group A steps.
+            wait(envs_a, group_a)
+            envs_b.step_async(actions_b, reset_if_done=True)
+            if step + 1 < self.config.num_steps:
+                envs_a.step_async(act(envs_a, group_a), reset_if_done=True)  # While group B steps.
+            wait(envs_b, group_b)
+
+        seconds["env"] += envs_a.busy_seconds + envs_b.busy_seconds - busy_start
+        return np.concatenate([envs_a.batch()[0], envs_b.batch()[0]])
+
+    def collection_summary(self):
+        """Time spent in each rollout phase since the last summary, and the share of env time hidden."""
+        seconds = self.collection_seconds
+        hidden = 1.0 - seconds["waiting"] / seconds["env"] if seconds["env"] else 0.0
+        summary = (
+            f"collection ({self.config.collection}): inference {seconds['inference']:.1f}s ; "
+            f"env {seconds['env']:.1f}s ; waiting on env {seconds['waiting']:.1f}s ; "
+            f"overlap {max(hidden, 0.0):.0%}"
+        )
+        self.collection_seconds = {name: 0.0 for name in seconds}
+        return summary
+
+    def learner_summary(self):
+        """Time the async learner waited for rollouts since the last summary, and their mean age in updates."""
+        seconds = self.learner_seconds
+        staleness = seconds["staleness"] / seconds["rollouts"] if seconds["rollouts"] else 0.0
+        summary = f"learner: waiting on rollouts {seconds['waiting']:.1f}s ; staleness {staleness:.2f} updates"
+        self.learner_seconds = {"waiting": 0.0, "staleness": 0.0, "rollouts": 0}
+        return summary
+
     def current_step(self):
         return self.agent.total_steps_done
 
@@ -196,6 +550,8 @@ class RunMMD:
             num_actions=self.game.num_distinct_actions(),
             observation_shape=self.game.information_state_tensor_shape(),
             device=device,
+            shared_trunk=self.config.shared_trunk,
+            card_encoder=self.config.card_encoder,
         ).to(device)
 
         self.network.actor.load_state_dict(torch.load(cp_path))
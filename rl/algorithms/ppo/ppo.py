@@ -30,6 +30,7 @@ from torch import optim
 from torch.distributions.categorical import Categorical
 
 from open_spiel.python.rl_agent import StepOutput
+from rl.card_set_encoder import CardSetEncoder
 
 from utils import log_to_csv
 
@@ -54,28 +55,55 @@ class CategoricalMasked(Categorical):
 
 
 class PPOAgent(nn.Module):
-    """A PPO agent module."""
+    """A PPO agent module.
 
-    def __init__(self, num_actions, observation_shape, device):
+    With `shared_trunk`, the actor and the critic are two heads on one 3x512 trunk instead
+    of two separate towers, halving the cost of `get_action_and_value`. `actor` is then
+    `Sequential(trunk, actor head)`, so actor-only checkpoints still hold the whole policy.
+    With `card_encoder`, the shared trunk is a `CardSetEncoder` instead.
+    """
+
+    def __init__(self, num_actions, observation_shape, device, shared_trunk=False, card_encoder=False):
         super().__init__()
-        self.critic = nn.Sequential(
-            layer_init(nn.Linear(np.array(observation_shape).prod(), 512)),
-            nn.Tanh(),
-            layer_init(nn.Linear(512, 512)),
-            nn.Tanh(),
-            layer_init(nn.Linear(512, 512)),
-            nn.Tanh(),
-            layer_init(nn.Linear(512, 1), std=1.0),
-        )
-        self.actor = nn.Sequential(
-            layer_init(nn.Linear(np.array(observation_shape).prod(), 512)),
-            nn.Tanh(),
-            layer_init(nn.Linear(512, 512)),
-            nn.Tanh(),
-            layer_init(nn.Linear(512, 512)),
-            nn.Tanh(),
-            layer_init(nn.Linear(512, num_actions), std=0.01),
-        )
+        self.shared_trunk = shared_trunk or card_encoder
+        if card_encoder:
+            trunk = CardSetEncoder(np.array(observation_shape).prod(), hidden_size=256)
+            self.critic = nn.Sequential(trunk, layer_init(nn.Linear(256, 1), std=1.0))
+            self.actor = nn.Sequential(
+                trunk, layer_init(nn.Linear(256, num_actions), std=0.01)
+            )
+        elif shared_trunk:
+            trunk = nn.Sequential(
+                layer_init(nn.Linear(np.array(observation_shape).prod(), 512)),
+                nn.Tanh(),
+                layer_init(nn.Linear(512, 512)),
+                nn.Tanh(),
+                layer_init(nn.Linear(512, 512)),
+                nn.Tanh(),
+            )
+            self.critic = nn.Sequential(trunk, layer_init(nn.Linear(512, 1), std=1.0))
+            self.actor = nn.Sequential(
+                trunk, layer_init(nn.Linear(512, num_actions), std=0.01)
+            )
+        else:
+            self.critic = nn.Sequential(
+                layer_init(nn.Linear(np.array(observation_shape).prod(), 512)),
+                nn.Tanh(),
+                layer_init(nn.Linear(512, 512)),
+                nn.Tanh(),
+                layer_init(nn.Linear(512, 512)),
+                nn.Tanh(),
+                layer_init(nn.Linear(512, 1), std=1.0),
+            )
+            self.actor = nn.Sequential(
+                layer_init(nn.Linear(np.array(observation_shape).prod(), 512)),
+                nn.Tanh(),
+                layer_init(nn.Linear(512, 512)),
+                nn.Tanh(),
+                layer_init(nn.Linear(512, 512)),
+                nn.Tanh(),
+                layer_init(nn.Linear(512, num_actions), std=0.01),
+            )
         self.device = device
         self.num_actions = num_actions
         self.register_buffer("mask_value", torch.tensor(INVALID_ACTION_PENALTY))
@@ -87,7 +115,13 @@ class PPOAgent(nn.Module):
         if legal_actions_mask is None:
             legal_actions_mask = torch.ones((len(x), self.num_actions)).bool()
 
-        logits = self.actor(x)
+        if self.shared_trunk:
+            hidden = self.actor[0](x)
+            logits = self.actor[1](hidden)
+            value = self.critic[1](hidden)
+        else:
+            logits = self.actor(x)
+            value = self.critic(x)
         probs = CategoricalMasked(
             logits=logits, masks=legal_actions_mask, mask_value=self.mask_value
         )
@@ -97,7 +131,7 @@ class PPOAgent(nn.Module):
             action,
             probs.log_prob(action),
             probs.entropy(),
-            self.critic(x),
+            value,
             probs.probs,
         )
 
@@ -20,6 +20,7 @@ https://github.com/vwxyzjn/ppo-implementation-details/blob/main/ppo_atari.py
 """
 
 # pylint: disable=g-importing-member
+import functools
 import random
 import time
 import numpy as np
@@ -67,7 +68,9 @@ class RunPPO:
                 for i in range(self.config.num_envs)
             ]
         )
-        self.agent_fn = PPOAgent
+        self.agent_fn = functools.partial(
+            PPOAgent, shared_trunk=self.config.shared_trunk, card_encoder=self.config.card_encoder
+        )
 
         game = envs.envs[0]._game  # pylint: disable=protected-access
         num_players = game.num_players()
@@ -168,6 +171,8 @@ class RunPPO:
             num_actions=self.game.num_distinct_actions(),
             observation_shape=self.game.information_state_tensor_shape(),
             device=device,
+            shared_trunk=self.config.shared_trunk,
+            card_encoder=self.config.card_encoder,
         ).to(device)
 
         self.network.actor.load_state_dict(torch.load(cp_path))
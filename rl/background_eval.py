@@ -0,0 +1,118 @@
+"""Evaluation against random bots in a background process.
+
+`BackgroundEvaluator` starts one process that evaluates snapshots of an agent while
+training goes on. The trainer `submit`s a snapshot (network weights, or a checkpoint
+directory) tagged with its update number; the process loads it into its own agent, plays
+`num_episodes` games against a random agent with `eval.eval_against_random_bots`, and
+appends the update number and the stats to the stats file, as the inline evaluation did.
+
+The agent of the process is built by `make_agent()` and a snapshot loaded into it by
+`load_snapshot(agent, snapshot)`; both are pickled to the process, so they must be module
+level functions (or `functools.partial`s of them). With `num_envs`, the games are played
+`num_envs` at a time by `eval.eval_against_random_bots_batched`, on a `SharedMemoryVectorEnv`
+of the process with `num_env_workers` workers, seeded from `seed` (each evaluation's random
+moves from its update number, as inline). `max_half_width` stops evaluations early (see
+`eval.eval_against_random_bots`).
+
+An evaluation can take much longer than training takes to produce the next snapshot, so at
+most one snapshot waits while another is evaluated: a newer one replaces it, and the
+replaced snapshot is handed to `discard_snapshot` (to delete a checkpoint, for instance).
+`close` evaluates the waiting snapshot, or discards it with `discard_pending`, as is done at
+exit.
+"""
+
+import atexit
+import functools
+import os
+import pickle
+import queue
+import random
+
+import numpy as np
+import torch
+import torch.multiprocessing
+
+from rl import eval
+
+
+def _evaluate(game_name, make_agent, load_snapshot, num_episodes, stats_save_name, mmd, num_envs, num_env_workers,
+              seed, max_half_width, working_dir, snapshots):
+    os.chdir(working_dir)
+    # Registers the Splendor games in the evaluator's process.
+    import splendor_hard.splendor_game  # pylint: disable=g-import-not-at-top,unused-import
+    import splendor_medium.splendor_game  # pylint: disable=g-import-not-at-top,unused-import
+    import splendor_lite.splendor_game  # pylint: disable=g-import-not-at-top,unused-import
+    from open_spiel.python import rl_environment  # pylint: disable=g-import-not-at-top
+    from open_spiel.python.algorithms import random_agent as ra  # pylint: disable=g-import-not-at-top
+    from rl.vector_env import SharedMemoryVectorEnv  # pylint: disable=g-import-not-at-top
+
+    torch.set_num_threads(1)
+    random.seed(0)
+    np.random.seed(0)
+    env = rl_environment.Environment(game_name)
+    random_agent = ra.RandomAgent(player_id=1, num_actions=env.action_spec()["num_actions"])
+    envs = SharedMemoryVectorEnv(game_name, [seed + i for i in range(num_envs)], num_env_workers) if num_envs else None
+    agent = make_agent()
+    while True:
+        item = snapshots.get()
+        if item is None:
+            if envs is not None:
+                envs.close()
+            return
+        update, snapshot = item
+        load_snapshot(agent, snapshot)
+        if envs is not None:
+            stats = eval.eval_against_random_bots_batched(envs, agent, num_episodes, seed=update,
+                                                          max_half_width=max_half_width)
+        else:
+            stats = eval.eval_against_random_bots(env, agent, random_agent, num_episodes, mmd=mmd,
+                                                  max_half_width=max_half_width)
+        print(f"eval of update {update}: {stats}", flush=True)
+        with open(stats_save_name, "ab") as bout:
+            pickle.dump(update, bout)
+            pickle.dump(stats, bout)
+
+
+class BackgroundEvaluator:
+    """Evaluates the snapshots submitted to it in its own process."""
+
+    def __init__(self, game_name, make_agent, load_snapshot, num_episodes, stats_save_name, mmd=False, num_envs=0,
+                 num_env_workers=1, seed=0, max_half_width=0.0, discard_snapshot=None, start_method="spawn"):
+        context = torch.multiprocessing.get_context(start_method)
+        self.snapshots = context.Queue(maxsize=1)
+        self.discard_snapshot = discard_snapshot
+        self._process = context.Process(
+            target=_evaluate,
+            args=(game_name, make_agent, load_snapshot, num_episodes, stats_save_name, mmd, num_envs, num_env_workers,
+                  seed, max_half_width, os.getcwd(), self.snapshots),
+        )
+        self._process.start()
+        # Not a daemon, so that it may start the workers of its envs: it is closed at exit instead.
+        self._close_at_exit = functools.partial(self.close, discard_pending=True)
+        atexit.register(self._close_at_exit)
+
+    def _discard_waiting(self):
+        """Takes the waiting snapshot out of the queue, if any, and discards it."""
+        try:
+            _, snapshot = self.snapshots.get(timeout=0.1)
+        except queue.Empty:
+            return
+        if self.discard_snapshot is not None:
+            self.discard_snapshot(snapshot)
+
+    def submit(self, update, snapshot):
+        """Queues `snapshot` for evaluation, replacing the one waiting; its stats are logged under `update`."""
+        while True:
+            try:
+                self.snapshots.put_nowait((update, snapshot))
+                return
+            except queue.Full:
+                self._discard_waiting()
+
+    def close(self, discard_pending=False):
+        """Stops the process once it has evaluated the waiting snapshot, or discards it with `discard_pending`."""
+        atexit.unregister(self._close_at_exit)
+        if discard_pending:
+            self._discard_waiting()
+        self.snapshots.put(None)
+        self._process.join()
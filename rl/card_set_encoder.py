@@ -0,0 +1,98 @@
+"""A card-set encoder for the Splendor observation tensors.
+
+The observation (see `BoardObserver`) is a flat vector of
+`[Player0, Player1, Board, Purchase_Card]`, in which every card (reserved cards, visible
+board cards and the card being paid for) takes the same 11 features: points, gem type
+one-hot and costs. An MLP on the flat vector has to learn the same card features once per
+slot. `CardSetEncoder` instead gathers every card slot into a `[batch, slot, 11]` tensor and
+embeds them all with one small shared MLP. The embeddings are then summed per group
+(the board, each player's reserved cards, the card being paid for), which does not
+depend on the order of the cards, and fed with the other features to a small trunk.
+
+Actions address cards by slot (buy the card in row 1, slot 2, ...), so the trunk also gets
+the embedding of every slot in slot order. These come out of the shared card MLP as well,
+so they cost few parameters. Empty slots (all zeros) embed to zero.
+"""
+
+import numpy as np
+import torch
+from torch import nn
+
+import splendor_hard.splendor_game as hard_game
+import splendor_lite.splendor_game as lite_game
+
+_PLAYER_FIELDS = 1 + hard_game._GEM_SHAPE + 5  # Points, gems, resources; the reserved cards follow.
+NUM_GROUPS = 4
+
+
+def layer_init(layer, std=np.sqrt(2), bias_const=0.0):
+    torch.nn.init.orthogonal_(layer.weight, std)
+    torch.nn.init.constant_(layer.bias, bias_const)
+    return layer
+
+
+def card_layout(observation_size: int):
+    """Returns the indices of the card slots [slot, card feature], the indices of the other
+    features and the group of every slot, for the observation of a Splendor variant.
+
+    Groups are 0 for the board, 1 and 2 for the reserved cards of players 0 and 1 and 3 for
+    the card being paid for.
+    """
+    modules = {module._TENSOR_SHAPE: module for module in [hard_game, lite_game]}
+    if observation_size not in modules:
+        raise ValueError(f"No Splendor observation has size {observation_size}.")
+    module = modules[observation_size]
+    card_shape = module._CARD_SHAPE
+    num_reserved = (module._PLAYER_SHAPE - _PLAYER_FIELDS) // card_shape
+    num_board_cards = (module._BOARD_SHAPE - module._GEM_SHAPE) // card_shape
+
+    slots, groups = [], []
+    for player in range(module._NUM_PLAYERS):
+        start = (player * module._PLAYER_SHAPE) + _PLAYER_FIELDS
+        slots += [start + (j * card_shape) for j in range(num_reserved)]
+        groups += [1 + player] * num_reserved
+    board = (module._NUM_PLAYERS * module._PLAYER_SHAPE) + module._GEM_SHAPE
+    slots += [board + (j * card_shape) for j in range(num_board_cards)]
+    groups += [0] * num_board_cards
+    purchase_card = np.arange(observation_size - card_shape, observation_size)
+    if module is not lite_game:  # The lite observation leaves the purchase card slot zero.
+        slots.append(purchase_card[0])
+        groups.append(3)
+
+    card_index = np.array(slots)[:, None] + np.arange(card_shape)
+    other_index = np.setdiff1d(np.arange(observation_size), np.concatenate([card_index.ravel(), purchase_card]))
+    return card_index, other_index, np.array(groups)
+
+
+class CardSetEncoder(nn.Module):
+    """Maps observations [batch, observation size] to features [batch, `hidden_size`]."""
+
+    def __init__(self, observation_size, card_embedding_size=16, hidden_size=256):
+        super().__init__()
+        card_index, other_index, groups = card_layout(observation_size)
+        self.register_buffer("card_index", torch.from_numpy(card_index), persistent=False)
+        self.register_buffer("other_index", torch.from_numpy(other_index), persistent=False)
+        self.register_buffer("groups", nn.functional.one_hot(torch.from_numpy(groups), NUM_GROUPS).float(),
+                             persistent=False)
+        num_slots, card_shape = card_index.shape
+        self.card = nn.Sequential(
+            layer_init(nn.Linear(card_shape, 32)),
+            nn.Tanh(),
+            layer_init(nn.Linear(32, card_embedding_size)),
+            nn.Tanh(),
+        )
+        trunk_input = len(other_index) + ((NUM_GROUPS + num_slots) * card_embedding_size)
+        self.trunk = nn.Sequential(
+            layer_init(nn.Linear(trunk_input, hidden_size)),
+            nn.Tanh(),
+            layer_init(nn.Linear(hidden_size, hidden_size)),
+            nn.Tanh(),
+        )
+
+    def forward(self, x):
+        cards = x[:, self.card_index]  # [batch, slot, card feature]
+        present = (cards != 0).any(dim=-1, keepdim=True)
+        embeddings = self.card(cards) * present
+        pooled = torch.einsum("bse,sg->bge", embeddings, self.groups)
+        return self.trunk(torch.cat([x[:, self.other_index], pooled.flatten(1), embeddings.flatten(1)], dim=1))
+
@@ -17,8 +17,10 @@
 from absl import app
 from absl import flags
 from absl import logging
+import functools
 import os
 import pickle
+import shutil
 import time
 import splendor_hard.splendor_game as splendor_game
 import numpy as np
@@ -29,6 +31,7 @@ from open_spiel.python.algorithms import dqn
 from open_spiel.python.algorithms import random_agent as ra
 
 import splendor_hard.splendor_game as splendor_game
+from rl.background_eval import BackgroundEvaluator
 from rl.eval import eval_against_random_bots
 
 FLAGS = flags.FLAGS
@@ -50,6 +53,12 @@ flags.DEFINE_integer(
     "eval_amount", 1000,
     "Episodes to use during evaluation."
 )
+flags.DEFINE_float(
+    "eval_max_half_width", 0.0,
+    "Stop an evaluation early once the 95% interval of the win rate is this narrow (0 plays every episode).")
+flags.DEFINE_bool(
+    "background_eval", False,
+    "Evaluate checkpoints of the DQN agent in a separate process instead of pausing training.")
 
 # DQN model hyper-parameters.
 flags.DEFINE_list("hidden_layers_sizes", [239, 128],
@@ -63,6 +72,24 @@ flags.DEFINE_float("learning_rate", 0.001,
 flags.DEFINE_integer("epsilon_decay", int(1e6), "Epsilon decay.")
 
 
+def _make_eval_agent(info_state_size, num_actions, hidden_layers_sizes):
+  sess = tf.Session()
+  agent = dqn.DQN(
+    session=sess,
+    player_id=0,
+    state_representation_size=info_state_size,
+    num_actions=num_actions,
+    hidden_layers_sizes=hidden_layers_sizes)
+  sess.run(tf.global_variables_initializer())
+  return agent
+
+
+def _load_eval_snapshot(agent, checkpoint_dir):
+  agent.restore(checkpoint_dir)
+  # Every snapshot has its own checkpoint, read only by the evaluator.
+  shutil.rmtree(checkpoint_dir)
+
+
 def main(_):
   model_save_name = os.getcwd() + "/rl/runs/model_dqn"
   stats_save_name = os.getcwd() + "/rl/runs/stats_dqn.pkl"
@@ -89,6 +116,8 @@ def main(_):
   logging.info(f"Replay buffer capacity: {FLAGS.replay_buffer_capacity}")
   logging.info(f"Batch sizes: {FLAGS.batch_size}")
   logging.info(f"Learning rate: {FLAGS.learning_rate}")
+  logging.info(f"Evaluation interval half-width: {FLAGS.eval_max_half_width}")
+  logging.info(f"Background evaluation: {FLAGS.background_eval}")
 
   with tf.Session() as sess:
     hidden_layers_sizes = [int(l) for l in FLAGS.hidden_layers_sizes]
@@ -109,10 +138,25 @@ def main(_):
     sess.run(tf.global_variables_initializer())
 
     agents = [ dqn_agent, random_agent ]
+    if FLAGS.background_eval:
+      evaluator = BackgroundEvaluator(
+        game,
+        functools.partial(_make_eval_agent, info_state_size, num_actions, hidden_layers_sizes),
+        _load_eval_snapshot,
+        FLAGS.eval_every,
+        stats_save_name,
+        max_half_width=FLAGS.eval_max_half_width,
+        discard_snapshot=functools.partial(shutil.rmtree, ignore_errors=True))
 
     for ep in range(FLAGS.num_train_episodes):
-      if (ep + 1) % FLAGS.eval_every == 0:
-        stats = eval_against_random_bots(env, dqn_agent, random_agent, FLAGS.eval_every, mmd=False)
+      if (ep + 1) % FLAGS.eval_every == 0 and FLAGS.background_eval:
+        checkpoint_dir = f"{model_save_name}_eval_{ep}"
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        dqn_agent.save(checkpoint_dir)
+        evaluator.submit(ep, checkpoint_dir)
+      elif (ep + 1) % FLAGS.eval_every == 0:
+        stats = eval_against_random_bots(env, dqn_agent, random_agent, FLAGS.eval_every, mmd=False,
+                                         max_half_width=FLAGS.eval_max_half_width)
         logging.info(f"Episode: {ep}")
         logging.info(f"Stats: {stats}")
         
@@ -132,6 +176,9 @@ def main(_):
 
       dqn_agent.step(time_step)
 
+    if FLAGS.background_eval:
+      evaluator.close()
+
 
 if __name__ == "__main__":
   app.run(main)
\ No newline at end of file
@@ -1,7 +1,54 @@
+import math
+import time
+
 import numpy as np
+import torch
+
+
+def wilson_interval(wins, games, z=1.96):
+    """Wilson score interval (low, high) of a win rate, 95% by default."""
+    if games == 0:
+        return 0.0, 1.0
+    p = wins / games
+    denominator = 1 + z * z / games
+    center = (p + z * z / (2 * games)) / denominator
+    half_width = z / denominator * math.sqrt(p * (1 - p) / games + z * z / (4 * games * games))
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+
+def _interval_is_tight(wins, games, max_half_width, min_episodes):
+    if not max_half_width or games < min_episodes:
+        return False
+    low, high = wilson_interval(wins, games)
+    return (high - low) / 2 <= max_half_width
+
+
+def _stats(total_episode_rewards, game_lengths, game_wins, game_ties):
+    games = len(game_lengths)
+    stats = {}
+
+    stats["rewards_avg"] = float(sum(total_episode_rewards) / games)
+    stats["rewards_std"] = float(np.std(total_episode_rewards))
+    stats["rewards_max"] = float(np.max(total_episode_rewards))
+    stats["rewards_min"] = float(np.min(total_episode_rewards))
+    stats["game_length_avg"] = float(sum(game_lengths) / games)
+    stats["game_length_std"] = float(np.std(game_lengths))
+    stats["game_wins"] = game_wins
+    stats["game_ties"] = game_ties
+    stats["games"] = games
+    stats["win_rate_low"], stats["win_rate_high"] = wilson_interval(game_wins, games)
+
+    return stats
+
 
-def eval_against_random_bots(env, trained_agent, random_agent, num_episodes, mmd=False) -> None:
-    """Evaluates `trained_agent` against `random_agent` for `num_episodes`."""
+def eval_against_random_bots(env, trained_agent, random_agent, num_episodes, mmd=False, max_half_width=0.0,
+                             min_episodes=100) -> dict:
+    """Evaluates `trained_agent` against `random_agent` for `num_episodes`.
+
+    With `max_half_width`, stops early, after at least `min_episodes`, once the 95% Wilson
+    interval of the win rate is at most `2 * max_half_width` wide. The stats report the
+    number of games played and that interval.
+    """
 
     total_episode_rewards = []
     game_lengths = []
@@ -34,16 +81,76 @@ def eval_against_random_bots(env, trained_agent, random_agent, num_episodes, mmd
         game_ties += 1
       total_episode_rewards.append(episode_rewards)
       game_lengths.append(game_length)
+      if _interval_is_tight(game_wins, len(game_lengths), max_half_width, min_episodes):
+        break
     
-    stats = {}
+    return _stats(total_episode_rewards, game_lengths, game_wins, game_ties)
 
-    stats["rewards_avg"] = sum(total_episode_rewards) / num_episodes
-    stats["rewards_std"] = float(np.std(total_episode_rewards))
-    stats["rewards_max"] = float(np.max(total_episode_rewards))
-    stats["rewards_min"] = float(np.min(total_episode_rewards))
-    stats["game_length_avg"] = sum(game_lengths) / num_episodes
-    stats["game_length_std"] = float(np.std(game_lengths))
-    stats["game_wins"] = game_wins
-    stats["game_ties"] = game_ties
-    
-    return stats
\ No newline at end of file
+
+def eval_against_random_bots_batched(envs, trained_agent, num_episodes, seed=0, max_half_width=0.0,
+                                     min_episodes=100) -> dict:
+    """Evaluates `trained_agent` (player 0) against uniformly random moves for `num_episodes`,
+    playing all the games of `envs` at once.
+
+    `envs` is a `SharedMemoryVectorEnv`; its envs are reset here and reset again as their games
+    end. Every step, the moves of `trained_agent` in all the envs are chosen in one batched
+    `get_action_and_value`, and the random moves sampled from the legal-action masks. Every env
+    plays an equal share of the episodes, so short games are not overrepresented. Returns the
+    stats of `eval_against_random_bots`, plus the games played per second.
+
+    `max_half_width` stops early as in `eval_against_random_bots`. The interval is checked
+    each time every env has finished one more game, over the first games of every env, for the
+    same reason.
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    device = getattr(trained_agent, "device", "cpu")
+    quotas = np.diff(np.linspace(0, num_episodes, len(envs) + 1).astype(np.int64))
+    lengths = np.zeros(len(envs), dtype=np.int64)
+    episode_rewards = np.zeros(len(envs))
+    actions = np.zeros(len(envs), dtype=np.int64)
+    # (episode reward, game length, won, tied) of the games of every env, in order.
+    results = [[] for _ in range(len(envs))]
+    rounds = 0
+
+    envs.reset()
+    while any(len(env_results) < quota for env_results, quota in zip(results, quotas)):
+        obs, legal_actions_mask, current_players = envs.batch()
+        trained = current_players == 0
+        if trained.any():
+            with torch.no_grad():
+                actions[trained] = trained_agent.get_action_and_value(
+                    torch.from_numpy(obs[trained]).to(device),
+                    legal_actions_mask=torch.from_numpy(legal_actions_mask[trained]).to(device),
+                )[0].cpu().numpy()
+        if not trained.all():
+            masks = legal_actions_mask[~trained]
+            actions[~trained] = np.argmax(rng.random(masks.shape) * masks, axis=1)
+        envs.step_async(actions, reset_if_done=True)
+        rewards, dones = envs.step_wait_arrays()
+
+        lengths += 1
+        episode_rewards += rewards[:, 0]
+        for i in np.flatnonzero(dones):
+            if len(results[i]) < quotas[i]:
+                results[i].append((episode_rewards[i], lengths[i], rewards[i, 0] > 0, not rewards[i].any()))
+            lengths[i] = 0
+            episode_rewards[i] = 0.0
+
+        if max_half_width and min(len(env_results) for env_results in results) > rounds:
+            rounds = min(len(env_results) for env_results in results)
+            wins = sum(won for env_results in results for _, _, won, _ in env_results[:rounds])
+            if _interval_is_tight(wins, rounds * len(envs), max_half_width, min_episodes):
+                results = [env_results[:rounds] for env_results in results]
+                break
+
+    games = [result for env_results in results for result in env_results]
+    stats = _stats(
+        [episode_reward for episode_reward, _, _, _ in games],
+        [length for _, length, _, _ in games],
+        int(sum(won for _, _, won, _ in games)),
+        int(sum(tied for _, _, _, tied in games)),
+    )
+    stats["games_per_second"] = len(games) / (time.perf_counter() - start)
+
+    return stats
@@ -0,0 +1,71 @@
+"""Publishing network weights to rollout processes through shared memory.
+
+`SharedWeights` holds one flat float32 tensor in shared memory with a slice for every
+tensor of a network's `state_dict`, and a version number. The learner `publish`es its
+weights into it after every update; rollout workers `load` them into their own copy of the
+network at their next batch boundary. No weights go through a pipe or a pickled queue:
+handing a `SharedWeights` to a process (as a `torch.multiprocessing` argument) only passes
+the handle of the shared memory, and loading is one copy per tensor.
+
+Reads and writes are ordered by a sequence number, as in a seqlock: `publish` makes it odd
+while it writes and even once it is done, and `load` copies again if the number was odd or
+changed during its copy, so a worker never acts with half-published weights.
+"""
+
+import time
+
+import numpy as np
+import torch
+
+
+class SharedWeights:
+    """Shared-memory copy of the `state_dict` of networks shaped like `network`."""
+
+    def __init__(self, network):
+        self._layout = []
+        offset = 0
+        for name, tensor in network.state_dict().items():
+            if tensor.dtype != torch.float32:
+                raise ValueError(f"Only float32 weights can be shared, {name} is {tensor.dtype}")
+            self._layout.append((name, offset, tuple(tensor.shape)))
+            offset += tensor.numel()
+        self._flat = torch.zeros(offset, dtype=torch.float32).share_memory_()
+        # [sequence number, version].
+        self._header = torch.zeros(2, dtype=torch.int64).share_memory_()
+
+    @property
+    def version(self) -> int:
+        """Version of the last published weights, -1 before the first `publish`."""
+        return int(self._header[1]) if int(self._header[0]) > 0 else -1
+
+    def _views(self):
+        for name, offset, shape in self._layout:
+            yield name, self._flat[offset:offset + int(np.prod(shape, dtype=np.int64))].view(shape)
+
+    def publish(self, network, version: int):
+        """Writes the weights of `network` with their version number."""
+        state_dict = network.state_dict()
+        self._header[0] += 1
+        with torch.no_grad():
+            for name, view in self._views():
+                view.copy_(state_dict[name])
+        self._header[1] = version
+        self._header[0] += 1
+
+    def load(self, network) -> int:
+        """Copies the last published weights into `network` and returns their version.
+
+        Waits for a first `publish`, and retries while one is in progress.
+        """
+        state_dict = network.state_dict()
+        while True:
+            sequence = int(self._header[0])
+            if sequence == 0 or sequence % 2:
+                time.sleep(0.0001)
+                continue
+            with torch.no_grad():
+                for name, view in self._views():
+                    state_dict[name].copy_(view)
+            version = int(self._header[1])
+            if int(self._header[0]) == sequence:
+                return version
@@ -0,0 +1,253 @@
+"""A vector environment that steps its games in worker processes.
+
+`SyncVectorEnv` steps every environment one after the other in the learner process.
+`SharedMemoryVectorEnv` shards the environments across worker processes instead. Each worker
+writes the observations, legal-action masks, rewards and done flags of its environments
+straight into shared arrays, and the learner reads them from there, so only a short command
+goes through each worker's pipe per step.
+
+It keeps `SyncVectorEnv`'s interface (`reset`, `step(step_outputs, reset_if_done)`,
+`observation_spec`, `num_players`, `len`), so the training loops can use either. `step` is
+also split into `step_async` and `step_wait`, so the learner can work while the workers step.
+Note that the returned `TimeStep`s are views into the shared arrays: they are only valid until
+the next `step` or `reset`.
+
+Learners that work on whole batches can skip the `TimeStep`s altogether: `batch()` returns the
+observation and legal-action mask of the player to move in every env, and `step_wait_arrays()`
+the rewards and done flags, all as views of preallocated arrays.
+"""
+
+import multiprocessing as mp
+import random
+import time
+
+import numpy as np
+import pyspiel
+from open_spiel.python.rl_environment import ChanceEventSampler
+from open_spiel.python.rl_environment import Environment
+from open_spiel.python.rl_environment import StepType
+from open_spiel.python.rl_environment import TimeStep
+
+_STEP = 0
+_RESET = 1
+_CLOSE = 2
+
+
+class _Buffers:
+    """Shared arrays holding the latest time step of every environment."""
+
+    def __init__(self, num_envs, num_players, info_state_size, num_actions, raw=None):
+        shapes = {
+            "info_state": ((num_envs, num_players, info_state_size), np.float32),
+            "legal_mask": ((num_envs, num_players, num_actions), np.bool_),
+            # Those of the player to move (player 0 in terminal states).
+            "player_info_state": ((num_envs, info_state_size), np.float32),
+            "player_legal_mask": ((num_envs, num_actions), np.bool_),
+            "rewards": ((num_envs, num_players), np.float32),
+            "discounts": ((num_envs, num_players), np.float32),
+            "current_player": ((num_envs,), np.int32),
+            "step_type": ((num_envs,), np.int8),
+        }
+        if raw is None:
+            raw = {
+                name: mp.RawArray("b", int(np.prod(shape)) * np.dtype(dtype).itemsize)
+                for name, (shape, dtype) in shapes.items()
+            }
+        self.raw = raw
+        for name, (shape, dtype) in shapes.items():
+            setattr(self, name, np.frombuffer(raw[name], dtype=dtype).reshape(shape))
+
+    def write(self, i, time_step):
+        for player, (info_state, legal_actions) in enumerate(
+            zip(time_step.observations["info_state"], time_step.observations["legal_actions"])
+        ):
+            self.info_state[i, player] = info_state
+            self.legal_mask[i, player] = False
+            self.legal_mask[i, player, legal_actions] = True
+        self.rewards[i] = 0.0 if time_step.rewards is None else time_step.rewards
+        self.discounts[i] = 1.0 if time_step.discounts is None else time_step.discounts
+        self.current_player[i] = time_step.observations["current_player"]
+        self.step_type[i] = time_step.step_type.value
+        player = max(self.current_player[i], 0)
+        self.player_info_state[i] = self.info_state[i, player]
+        self.player_legal_mask[i] = self.legal_mask[i, player]
+
+    def time_step(self, i):
+        step_type = StepType(int(self.step_type[i]))
+        observations = {
+            "info_state": list(self.info_state[i]),
+            "legal_actions": [np.flatnonzero(mask).tolist() for mask in self.legal_mask[i]],
+            "current_player": int(self.current_player[i]),
+        }
+        first = step_type == StepType.FIRST
+        return TimeStep(
+            observations=observations,
+            rewards=None if first else self.rewards[i].tolist(),
+            discounts=None if first else self.discounts[i].tolist(),
+            step_type=step_type,
+        )
+
+
+def _worker(conn, worker, game_name, seeds, env_ids, sizes, current_raw, unreset_raw, actions_raw, reset_raw,
+            busy_raw):
+    # Registers the Splendor games in processes started with "spawn".
+    import splendor_hard.splendor_game  # pylint: disable=g-import-not-at-top,unused-import
+    import splendor_medium.splendor_game  # pylint: disable=g-import-not-at-top,unused-import
+    import splendor_lite.splendor_game  # pylint: disable=g-import-not-at-top,unused-import
+
+    # Splendor shuffles its decks with `random`; forked workers would otherwise all deal the same games.
+    random.seed(seeds[0])
+    np.random.seed(seeds[0])
+    game = pyspiel.load_game(game_name)
+    envs = [Environment(game, chance_event_sampler=ChanceEventSampler(seed=seed)) for seed in seeds]
+    current = _Buffers(*sizes, raw=current_raw)
+    unreset = _Buffers(*sizes, raw=unreset_raw)
+    actions = np.frombuffer(actions_raw, dtype=np.int64)
+    to_reset = np.frombuffer(reset_raw, dtype=np.bool_)
+    busy = np.frombuffer(busy_raw, dtype=np.float64)
+
+    while True:
+        command, reset_if_done = conn.recv()
+        start = time.perf_counter()
+        if command == _STEP:
+            for env, i in zip(envs, env_ids):
+                time_step = env.step([int(actions[i])])
+                unreset.write(i, time_step)
+                current.write(i, env.reset() if reset_if_done and time_step.last() else time_step)
+        elif command == _RESET:
+            for env, i in zip(envs, env_ids):
+                current.write(i, env.reset() if to_reset[i] else env.get_time_step())
+        else:
+            conn.close()
+            return
+        busy[worker] += time.perf_counter() - start
+        conn.send(None)
+
+
+class SharedMemoryVectorEnv(object):
+    """A vectorized RL Environment stepped by `num_workers` processes through shared memory."""
+
+    def __init__(self, game_name, seeds, num_workers, start_method=None):
+        game = pyspiel.load_game(game_name)
+        self._spec_env = Environment(game)
+        self.num_envs = len(seeds)
+        num_workers = max(1, min(num_workers, self.num_envs))
+        sizes = (
+            self.num_envs,
+            game.num_players(),
+            game.information_state_tensor_size(),
+            game.num_distinct_actions(),
+        )
+        self._current = _Buffers(*sizes)
+        self._unreset = _Buffers(*sizes)
+        actions_raw = mp.RawArray("b", self.num_envs * np.dtype(np.int64).itemsize)
+        reset_raw = mp.RawArray("b", self.num_envs)
+        self._actions = np.frombuffer(actions_raw, dtype=np.int64)
+        self._to_reset = np.frombuffer(reset_raw, dtype=np.bool_)
+        busy_raw = mp.RawArray("d", num_workers)
+        self._busy = np.frombuffer(busy_raw, dtype=np.float64)
+        self._dones = np.zeros(self.num_envs, dtype=np.bool_)
+        self._reset_if_done = False
+
+        context = mp.get_context(start_method)
+        self._conns = []
+        self._processes = []
+        for worker, env_ids in enumerate(np.array_split(np.arange(self.num_envs), num_workers)):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_worker,
+                args=(child_conn, worker, game_name, [seeds[i] for i in env_ids], env_ids.tolist(), sizes,
+                      self._current.raw, self._unreset.raw, actions_raw, reset_raw, busy_raw),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._processes.append(process)
+
+    def __len__(self):
+        return self.num_envs
+
+    def observation_spec(self):
+        return self._spec_env.observation_spec()
+
+    @property
+    def num_players(self):
+        return self._spec_env.num_players
+
+    @property
+    def is_turn_based(self):
+        return self._spec_env.is_turn_based
+
+    @property
+    def busy_seconds(self):
+        """Seconds the slowest worker has spent stepping or resetting its environments."""
+        return float(self._busy.max())
+
+    def _send(self, command, reset_if_done=False):
+        for conn in self._conns:
+            conn.send((command, reset_if_done))
+
+    def _wait(self):
+        for conn in self._conns:
+            conn.recv()
+
+    def step(self, step_outputs, reset_if_done=False):
+        """Apply one step; returns the same tuple as `SyncVectorEnv.step`."""
+        self.step_async(step_outputs, reset_if_done)
+        return self.step_wait()
+
+    def step_async(self, step_outputs, reset_if_done=False):
+        """Starts a step in the workers and returns immediately; `step_wait` returns its result.
+
+        `step_outputs` may also be an array (or CPU tensor) holding the action of every env.
+        """
+        if isinstance(step_outputs, list):
+            self._actions[:] = [step_output.action for step_output in step_outputs]
+        else:
+            np.copyto(self._actions, step_outputs, casting="unsafe")
+        self._reset_if_done = reset_if_done
+        self._send(_STEP, reset_if_done)
+
+    def step_wait(self):
+        self._wait()
+        reset_if_done = self._reset_if_done
+        unreset_time_steps = [self._unreset.time_step(i) for i in range(self.num_envs)]
+        reward = [time_step.rewards for time_step in unreset_time_steps]
+        done = [time_step.last() for time_step in unreset_time_steps]
+        if reset_if_done:
+            time_steps = [self._current.time_step(i) if done[i] else unreset_time_steps[i]
+                          for i in range(self.num_envs)]
+        else:
+            time_steps = unreset_time_steps
+        return time_steps, reward, done, unreset_time_steps
+
+    def step_wait_arrays(self):
+        """Like `step_wait`, but returns the rewards [env, player] and done flags [env] as arrays."""
+        self._wait()
+        np.equal(self._unreset.step_type, StepType.LAST.value, out=self._dones)
+        return self._unreset.rewards, self._dones
+
+    def batch(self):
+        """Returns the info states [env, size], legal-action masks [env, action] and current players [env].
+
+        These describe the player to move in every env after the last reset or step, and are
+        views of the shared arrays, overwritten by the next step.
+        """
+        current = self._current
+        return current.player_info_state, current.player_legal_mask, current.current_player
+
+    def reset(self, envs_to_reset=None):
+        self._to_reset[:] = True if envs_to_reset is None else envs_to_reset
+        self._send(_RESET)
+        self._wait()
+        return [self._current.time_step(i) for i in range(self.num_envs)]
+
+    def close(self):
+        for conn in self._conns:
+            conn.send((_CLOSE, False))
+        for process in self._processes:
+            process.join()
+        self._conns = []
+        self._processes = []
+
@@ -1,4 +1,5 @@
 import enum
+import itertools
 import numpy as np
 from typing import Any
 
@@ -160,3 +161,44 @@ class SActions:
             if dict_action_category == action_category:
                 action_ids.append(action_id)
         return action_ids
+
+
+class TakeLegality:
+    """Precomputed legality of the TAKE3 and TAKE2 actions for every board gem vector.
+
+    Taking gems only depends on the five coloured board gem counts, and only on whether each
+    count reaches 1 (TAKE3) or `max_take2_gems` (TAKE2). The counts are clipped to
+    [0, max_take2_gems] and encoded base `max_take2_gems + 1` into an index of the table.
+    """
+
+    def __init__(self, max_take2_gems: int):
+        self._max_gems = max_take2_gems
+        self._weights = (max_take2_gems + 1) ** np.arange(4, -1, -1)
+        take_ids = [
+            action_id for action_id, (category, _) in SPLENDOR_ACTIONS.items()
+            if category in (SCategory.TAKE3, SCategory.TAKE2)
+        ]
+        self.first_action = take_ids[0]
+
+        self.masks = np.zeros((max_take2_gems + 1) ** 5, dtype=np.int32)
+        self.actions: list[tuple[int, ...]] = []
+        for index, counts in enumerate(itertools.product(range(max_take2_gems + 1), repeat=5)):
+            legal = []
+            for action_id in take_ids:
+                category, gems = SPLENDOR_ACTIONS[action_id]
+                required = np.minimum(gems[:5], 1) * (max_take2_gems if category == SCategory.TAKE2 else 1)
+                if np.all(np.array(counts) >= required):
+                    legal.append(action_id)
+                    self.masks[index] |= 1 << (action_id - self.first_action)
+            self.actions.append(tuple(legal))
+
+    def index(self, board_gems) -> int:
+        return int(np.minimum(board_gems[:5], self._max_gems) @ self._weights)
+
+    def legal_actions(self, board_gems) -> tuple[int, ...]:
+        """Legal take actions in ascending order."""
+        return self.actions[self.index(board_gems)]
+
+    def mask(self, board_gems) -> int:
+        """Legal take actions as a bitmask; bit i is action `first_action + i`."""
+        return int(self.masks[self.index(board_gems)])
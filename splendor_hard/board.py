@@ -9,63 +9,106 @@ BOARD_COLOR_START: int = 4
 BOARD_GOLD_START: int = 5
 MAX_RESERVE: int = 3
 MIN_DECK_CARDS: int = 5
+VISIBLE_CARDS: int = 4
+
+# Cards are shared between boards (flyweights) and never mutated, so the csv is only parsed once.
+_CARD_TABLES: dict[str, list[list[Card]]] = {}
+
+
+def card_table(filepath: str) -> list[list[Card]]:
+    """Returns the shared level 1, level 2, and level 3 cards loaded from `filepath`."""
+    if filepath not in _CARD_TABLES:
+        _CARD_TABLES[filepath] = csv_import(filepath)
+    return _CARD_TABLES[filepath]
 
 
 class Board:
     """A board with three levels of decks and some number of gems in the center.
 
-    The internal representation of the board in `self._decks` is as follows:
+    The internal representation of the board is as follows:
 
-                          |  COLUMN n-3  |  COLUMN n-2  |  COLUMN n-2  |  COLUMN n-1
-    ----------------------|--------------|--------------|--------------|-------------
-    ROW 0 (Level 1 cards) | (Card_n - 4) | (Card_n - 3) | (Card_n - 2) | (Card_n - 1)
-    ROW 1 (Level 2 cards) | (Card_n - 4) | (Card_n - 3) | (Card_n - 2) | (Card_n - 1)
-    ROW 2 (Level 3 cards) | (Card_n - 4) | (Card_n - 3) | (Card_n-  2) | (Card_n - 1)
+                          |  COLUMN 0  |  COLUMNS 1 to 4
+    ----------------------|------------|-------------------------------
+    ROW 0 (Level 1 cards) | _decks[0]  | _slots[0][0] ... _slots[0][3]
+    ROW 1 (Level 2 cards) | _decks[1]  | _slots[1][0] ... _slots[1][3]
+    ROW 2 (Level 3 cards) | _decks[2]  | _slots[2][0] ... _slots[2][3]
 
-    Columns n-5 down to column 0 represent cards that are flipped upside down in the deck.
+    `self._decks[row]` holds the cards that are flipped upside down; the top card (column 0)
+    is the last element. Taking a face-up card refills its slot with the top card of the deck,
+    so the other face-up cards never move.
 
+    `version` is incremented whenever a card leaves the board, so caches over the visible cards
+    (see `Player.purchase_masks`) know when to refresh.
     """
 
     def __init__(self, filepath: str, shuffle_cards: bool = True):
         self.gems = Gems(np.array([BOARD_COLOR_START, BOARD_COLOR_START, BOARD_COLOR_START, BOARD_COLOR_START, BOARD_COLOR_START, BOARD_GOLD_START]))
 
-        self._decks: list[list[Card]] = csv_import(filepath)
-        if shuffle_cards:
-            for deck in self._decks:
+        self._decks: list[list[Card]] = []
+        self._slots: list[list[Card | None]] = []
+        for deck in card_table(filepath):
+            deck = list(deck)
+            if shuffle_cards:
                 shuffle(deck)
+            self._slots.append(deck[-VISIBLE_CARDS:])
+            del deck[-VISIBLE_CARDS:]
+            self._decks.append(deck)
+        self.version = 0
 
 
     def __array__(self):
         return np.concatenate([
             self.gems.get_array(),
-            *self._decks[0][-4:],
-            *self._decks[1][-4:],
-            *self._decks[2][-4:],
+            *(np.zeros(11) if card is None else card for card in self.get_visible_cards()),
         ])
 
 
     def __str__(self) -> str:
         output = ""
-        for i, row in enumerate(self._decks):
+        for i, row in enumerate(self._slots):
             output += f"   Deck {i}: ({i}0) | "
-            for j, card in enumerate(row[-4:]):
+            for j, card in enumerate(row):
                 output += f"({i}{j + 1}) {str(card)} | "
             output += "\n"
         output += f"   Gems: {gem_array_str(self.gems.get_array(), gold=True)}\n"
         return output
 
 
+    def copy(self) -> "Board":
+        """Returns a copy of the board that shares its (immutable) cards with this one."""
+        board = Board.__new__(Board)
+        board.gems = Gems(np.copy(self.gems.get_array()))
+        board._decks = [list(deck) for deck in self._decks]
+        board._slots = [list(slots) for slots in self._slots]
+        board.version = self.version
+        return board
+
+
+    def cards_left(self, row: int) -> int:
+        """Number of face-down and face-up cards left in a row."""
+        return len(self._decks[row]) + sum(card is not None for card in self._slots[row])
+
+
     def enough_cards(self):
-        return (len(self._decks[0]) >= MIN_DECK_CARDS and
-                len(self._decks[1]) >= MIN_DECK_CARDS and
-                len(self._decks[2]) >= MIN_DECK_CARDS)
+        return (self.cards_left(0) >= MIN_DECK_CARDS and
+                self.cards_left(1) >= MIN_DECK_CARDS and
+                self.cards_left(2) >= MIN_DECK_CARDS)
     
 
     def pop_card(self, row: int, col: int) -> Card:
-        """Remove and return the card associated with the specified columns and row."""
-        return self._decks[row].pop(-4 + (col - 1))
+        """Remove and return the card associated with the specified columns and row.
+
+        Column 0 is the top card of the deck; a face-up card is replaced by the top card of the deck.
+        """
+        self.version += 1
+        deck = self._decks[row]
+        if col == 0:
+            return deck.pop()
+        card = self._slots[row][col - 1]
+        self._slots[row][col - 1] = deck.pop() if deck else None
+        return card
 
 
     def get_visible_cards(self):
         """Return the cards that are face up on the board in row-major order."""
-        return self._decks[0][-4:] + self._decks[1][-4:] + self._decks[2][-4:]
\ No newline at end of file
+        return self._slots[0] + self._slots[1] + self._slots[2]
@@ -16,6 +16,10 @@ class Card:
         self.gem_type: Gem = gem_type
         self.gems = Gems([*np.array(costs), 0])
 
+    def discounted(self, gems: NDArray) -> "Card":
+        """Returns a copy of the card with `gems` taken off its costs; the card itself is left unchanged."""
+        return Card(self.points, self.gem_type, tuple(self.gems.get_array()[:5] - gems[:5]))
+
     def __array__(self) -> NDArray:
         return np.array([
             self.points,
@@ -50,4 +54,10 @@ class Card:
             f"{ansi.RESET}"
         )
 
-    
+
+def card_key(card) -> tuple:
+    """Identifies a card by its contents; every card in the csv is unique.
+
+    Also works on the cards of `splendor_lite`, which have the same fields.
+    """
+    return (int(card.points), int(card.gem_type), tuple(int(c) for c in card.gems.get_array()[:5]))
@@ -0,0 +1,65 @@
+"""Determinization of Splendor states for information-set search.
+
+A player cannot see the order of the cards left in each deck, nor the cards the opponent
+reserved face down from the top of a deck (`RESERVE_00/10/20`). `clone()` copies the true
+deck order, so a search running on clones knows the future. `determinize` instead returns a
+state that is consistent with what one player has seen: the visible cards, both players'
+gems and purchases, the player's own reserves and the opponent's face-up reserves are kept,
+while the unseen cards of each deck row are reshuffled and dealt back into the deck and the
+opponent's hidden reserve slots.
+
+Cards are shared flyweights (see `board.card_table`), so a determinization only copies
+lists of references. Used by both `splendor_hard` and `splendor_medium`.
+"""
+
+import random
+
+from splendor_hard.board import card_table
+from splendor_hard.card import card_key
+from splendor_hard.splendor_game import _CARDS_FILENAME
+
+
+# Deck row of every card, to return hidden reserves to the deck they were drawn from.
+_CARD_ROWS = {card_key(card): row for row, deck in enumerate(card_table(_CARDS_FILENAME)) for card in deck}
+
+
+def copy_state(state):
+    """Returns a copy of `state` that shares its cards with it; much cheaper than `clone()`."""
+    copy = type(state)(state.get_game(), False)
+    copy._cur_player = state._cur_player
+    copy._is_terminal = state._is_terminal
+    copy._board = state._board.copy()
+    copy._player_0 = state._player_0.copy()
+    copy._player_1 = state._player_1.copy()
+    copy._turn_type = state._turn_type
+    copy._spending_card_exists = state._spending_card_exists
+    if hasattr(state, "_spending_card"):
+        copy._spending_card = state._spending_card
+    return copy
+
+
+def determinize(state, player: int, rng: random.Random = random):
+    """Returns a copy of `state` with everything `player` cannot see resampled.
+
+    The unseen cards of each deck row (the face-down deck and the opponent's
+    hidden reserves from that row) are shuffled with `rng` and dealt back to the same places.
+    """
+    determinized = copy_state(state)
+    decks = determinized._board._decks
+    opponent = determinized._player_1 if player == 0 else determinized._player_0
+
+    unseen = [list(deck) for deck in decks]
+    hidden_slots = [[] for _ in decks]
+    for slot, (card, hidden) in enumerate(zip(opponent._reserved_cards, opponent._reserved_hidden)):
+        if hidden:
+            row = _CARD_ROWS[card_key(card)]
+            unseen[row].append(card)
+            hidden_slots[row].append(slot)
+
+    for row, cards in enumerate(unseen):
+        rng.shuffle(cards)
+        for slot in hidden_slots[row]:
+            opponent._reserved_cards[slot] = cards.pop()
+            opponent._reserve_version += 1
+        decks[row][:] = cards
+    return determinized
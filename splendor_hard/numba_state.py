@@ -0,0 +1,537 @@
+"""Numba-compiled move generation and apply kernels for the "hard" version of Splendor.
+
+The kernels work on a flat int32 state array and mirror the semantics of
+`splendor_game.SplendorState`, including the SPENDING and RETURN sub-turns. They
+target tree search, where the latency of a single `legal_actions`/`apply_action`/
+`undo` call matters more than batch throughput. `NumbaSplendorState` wraps them
+behind the same interface as `SplendorState`.
+
+State array layout:
+
+    CUR, TERMINAL, TURN                  Current player, terminal flag, `TurnType`.
+    SPEND_EXISTS, SPEND_POINTS,          The card being paid for during a SPENDING
+    SPEND_COLOR, SPEND_COST[5]           turn, with gold already spent subtracted.
+    BOARD_GEMS[6]                        White, Blue, Green, Red, Black, Gold.
+    DECK_LEN[3]                          Face-down cards left per row.
+    SLOTS[3][4]                          Face-up card ids, as `Board._slots`; -1 when empty.
+    DECKS[3][40]                         Face-down card ids per row in `Board._decks` order.
+    PLAYER[2]                            GEMS[6], RESOURCES[5], POINTS, NUM_RESERVED,
+                                         RESERVED[3], NO_MOVES, NUM_RETURNS.
+
+Card ids index `CARD_TABLE`, whose rows are (points, gem type, 5 costs) in the order
+of `data/cards.csv`.
+"""
+
+import numpy as np
+import pyspiel
+from numba import njit
+
+from splendor_hard.board import MIN_DECK_CARDS, VISIBLE_CARDS
+from splendor_hard.card import card_key
+from splendor_hard.card_importer import csv_import
+from splendor_hard.player import MAX_RESERVE
+from splendor_hard.actions import SAction
+from splendor_hard.splendor_game import (
+    TurnType,
+    _CARDS_FILENAME,
+    _WIN_POINTS,
+    _MAX_TAKE2_GEMS,
+    _MAX_PLAYER_GEMS,
+    _CARD_SHAPE,
+    _PLAYER_SHAPE,
+    _TENSOR_SHAPE,
+)
+
+# Card table columns.
+_C_POINTS = 0
+_C_COLOR = 1
+_C_COST = 2
+
+# State array offsets.
+_CUR = 0
+_TERMINAL = 1
+_TURN = 2
+_SPEND_EXISTS = 3
+_SPEND_POINTS = 4
+_SPEND_COLOR = 5
+_SPEND_COST = 6
+_BOARD_GEMS = 11
+_DECK_LEN = 17
+_SLOTS = 20
+_DECKS = _SLOTS + (3 * VISIBLE_CARDS)
+_DECK_CAP = 40
+_PLAYERS = _DECKS + (3 * _DECK_CAP)
+
+# Player offsets, relative to the start of a player.
+_P_GEMS = 0
+_P_RES = 6
+_P_POINTS = 11
+_P_NUM_RESERVED = 12
+_P_RESERVED = 13
+_P_NO_MOVES = 16
+_P_NUM_RETURNS = 17
+_PLAYER_SIZE = 18
+
+STATE_SIZE = _PLAYERS + (2 * _PLAYER_SIZE)
+NUM_ACTIONS = len(SAction)
+
+_NORMAL = int(TurnType.NORMAL)
+_SPENDING = int(TurnType.SPENDING)
+_RETURN = int(TurnType.RETURN)
+
+_PURCHASE_01 = int(SAction.PURCHASE_01)
+_PURCHASE_RESERVE_0 = int(SAction.PURCHASE_RESERVE_0)
+_TAKE3_11100 = int(SAction.TAKE3_11100)
+_TAKE2_0 = int(SAction.TAKE2_0)
+_RETURN_0 = int(SAction.RETURN_0)
+_CONSUME_GOLD_WHITE = int(SAction.CONSUME_GOLD_WHITE)
+_END_SPENDING_TURN = int(SAction.END_SPENDING_TURN)
+
+# Colours taken by TAKE3_11100 through TAKE3_00111, in action id order.
+_TAKE3_COLORS = np.array([
+    [0, 1, 2], [0, 1, 3], [0, 1, 4], [0, 2, 3], [0, 2, 4],
+    [0, 3, 4], [1, 2, 3], [1, 2, 4], [1, 3, 4], [2, 3, 4],
+], dtype=np.int32)
+
+
+def _build_card_table(filepath: str):
+    rows = []
+    for deck in csv_import(filepath):
+        for card in deck:
+            rows.append([card.points, int(card.gem_type), *card.gems.get_array()[:5]])
+    return np.array(rows, dtype=np.int32)
+
+
+CARD_TABLE = _build_card_table(_CARDS_FILENAME)
+_CARD_IDS = {
+    (int(row[_C_POINTS]), int(row[_C_COLOR]), tuple(int(c) for c in row[_C_COST:])): card_id
+    for card_id, row in enumerate(CARD_TABLE)
+}
+
+
+@njit(cache=True)
+def _player_base(player):
+    return _PLAYERS + (player * _PLAYER_SIZE)
+
+
+@njit(cache=True)
+def _card_shortfall(state, base, card):
+    """Gems the player is missing for a card after gems and resources, ignoring gold."""
+    shortfall = 0
+    for c in range(5):
+        missing = CARD_TABLE[card, _C_COST + c] - state[base + _P_GEMS + c] - state[base + _P_RES + c]
+        if missing > 0:
+            shortfall += missing
+    return shortfall
+
+
+@njit(cache=True)
+def _spending_shortfall(state, base, spent_color):
+    """Like `_card_shortfall` for the spending card, after one more gold is spent on `spent_color`."""
+    shortfall = 0
+    for c in range(5):
+        cost = state[_SPEND_COST + c] - (1 if c == spent_color else 0)
+        missing = cost - state[base + _P_GEMS + c] - state[base + _P_RES + c]
+        if missing > 0:
+            shortfall += missing
+    return shortfall
+
+
+@njit(cache=True)
+def legal_actions(state, out):
+    """Writes the legal actions of the current player to `out` in ascending order and returns how many there are."""
+    base = _player_base(state[_CUR])
+    gold = state[base + _P_GEMS + 5]
+    n = 0
+
+    if state[_TURN] == _SPENDING:
+        for c in range(5):
+            if gold > 0 and state[_SPEND_COST + c] >= 1 and _spending_shortfall(state, base, c) - (gold - 1) <= 0:
+                out[n] = _CONSUME_GOLD_WHITE + c
+                n += 1
+        if state[_SPEND_EXISTS] == 1 and _spending_shortfall(state, base, -1) <= 0:
+            out[n] = _END_SPENDING_TURN
+            n += 1
+        return n
+
+    if state[_TURN] == _RETURN:
+        for c in range(6):
+            if state[base + _P_GEMS + c] >= 1:
+                out[n] = _RETURN_0 + c
+                n += 1
+        return n
+
+    if state[base + _P_NUM_RESERVED] < MAX_RESERVE:
+        for action in range(_PURCHASE_01):
+            out[n] = action
+            n += 1
+
+    for slot in range(3 * VISIBLE_CARDS):
+        card = state[_SLOTS + slot]
+        if card >= 0 and _card_shortfall(state, base, card) - gold <= 0:
+            out[n] = _PURCHASE_01 + slot
+            n += 1
+
+    for j in range(state[base + _P_NUM_RESERVED]):
+        if _card_shortfall(state, base, state[base + _P_RESERVED + j]) - gold <= 0:
+            out[n] = _PURCHASE_RESERVE_0 + j
+            n += 1
+
+    for k in range(_TAKE3_COLORS.shape[0]):
+        if (state[_BOARD_GEMS + _TAKE3_COLORS[k, 0]] >= 1
+                and state[_BOARD_GEMS + _TAKE3_COLORS[k, 1]] >= 1
+                and state[_BOARD_GEMS + _TAKE3_COLORS[k, 2]] >= 1):
+            out[n] = _TAKE3_11100 + k
+            n += 1
+
+    for c in range(5):
+        if state[_BOARD_GEMS + c] >= _MAX_TAKE2_GEMS:
+            out[n] = _TAKE2_0 + c
+            n += 1
+
+    return n
+
+
+@njit(cache=True)
+def _swap_player(state):
+    state[_CUR] = 1 - state[_CUR]
+
+
+@njit(cache=True)
+def _gem_sum(state, base):
+    total = 0
+    for c in range(6):
+        total += state[base + _P_GEMS + c]
+    return total
+
+
+@njit(cache=True)
+def _draw(state, row):
+    """Removes and returns the top face-down card of a row, or -1 if the deck is empty."""
+    length = state[_DECK_LEN + row]
+    if length == 0:
+        return -1
+    top = _DECKS + (row * _DECK_CAP) + length - 1
+    card = state[top]
+    state[top] = -1
+    state[_DECK_LEN + row] = length - 1
+    return card
+
+
+@njit(cache=True)
+def _pop_card(state, row, col):
+    """Like `Board.pop_card`: column 0 is the top of the deck, a taken face-up card is replaced from it."""
+    if col == 0:
+        return _draw(state, row)
+    slot = _SLOTS + (row * VISIBLE_CARDS) + col - 1
+    card = state[slot]
+    state[slot] = _draw(state, row)
+    return card
+
+
+@njit(cache=True)
+def _cards_left(state, row):
+    n = state[_DECK_LEN + row]
+    for j in range(VISIBLE_CARDS):
+        if state[_SLOTS + (row * VISIBLE_CARDS) + j] >= 0:
+            n += 1
+    return n
+
+
+@njit(cache=True)
+def _pop_reserved(state, base, j):
+    card = state[base + _P_RESERVED + j]
+    num_reserved = state[base + _P_NUM_RESERVED]
+    for i in range(j, num_reserved - 1):
+        state[base + _P_RESERVED + i] = state[base + _P_RESERVED + i + 1]
+    state[base + _P_RESERVED + num_reserved - 1] = -1
+    state[base + _P_NUM_RESERVED] = num_reserved - 1
+    return card
+
+
+@njit(cache=True)
+def _start_spending(state, base, card):
+    state[_SPEND_EXISTS] = 1
+    state[_SPEND_POINTS] = CARD_TABLE[card, _C_POINTS]
+    state[_SPEND_COLOR] = CARD_TABLE[card, _C_COLOR]
+    for c in range(5):
+        state[_SPEND_COST + c] = CARD_TABLE[card, _C_COST + c]
+    if state[base + _P_GEMS + 5] > 0:
+        state[_TURN] = _SPENDING
+    else:
+        _end_spending(state, base)
+
+
+@njit(cache=True)
+def _end_spending(state, base):
+    """Pays for the spending card with gems and hands it to the player."""
+    _swap_player(state)
+    state[_SPEND_EXISTS] = 0
+    for c in range(5):
+        paid = state[_SPEND_COST + c] - state[base + _P_RES + c]
+        if paid > 0:
+            state[base + _P_GEMS + c] -= paid
+            state[_BOARD_GEMS + c] += paid
+    state[base + _P_RES + state[_SPEND_COLOR]] += 1
+    state[base + _P_POINTS] += state[_SPEND_POINTS]
+
+
+@njit(cache=True)
+def apply_action(state, action, scratch):
+    """Applies `action` for the current player. `scratch` holds at least `NUM_ACTIONS` ints."""
+    base = _player_base(state[_CUR])
+
+    if state[_TURN] == _SPENDING:
+        if action == _END_SPENDING_TURN:
+            state[_TURN] = _NORMAL
+            _end_spending(state, base)
+        else:  # Player spent gold.
+            state[base + _P_GEMS + 5] -= 1
+            state[_BOARD_GEMS + 5] += 1
+            state[_SPEND_COST + action - _CONSUME_GOLD_WHITE] -= 1
+
+    elif state[_TURN] == _RETURN:
+        state[base + _P_NUM_RETURNS] += 1
+        state[base + _P_GEMS + action - _RETURN_0] -= 1
+        state[_BOARD_GEMS + action - _RETURN_0] += 1
+        if _gem_sum(state, base) <= _MAX_PLAYER_GEMS:
+            state[_TURN] = _NORMAL
+            _swap_player(state)
+
+    elif action < _PURCHASE_01:  # Reserve.
+        row = action // 5
+        col = action % 5
+        if state[_BOARD_GEMS + 5] > 0:
+            state[_BOARD_GEMS + 5] -= 1
+            state[base + _P_GEMS + 5] += 1
+        card = _pop_card(state, row, col)
+        state[base + _P_RESERVED + state[base + _P_NUM_RESERVED]] = card
+        state[base + _P_NUM_RESERVED] += 1
+        _swap_player(state)
+
+    elif action < _PURCHASE_RESERVE_0:
+        row = (action - _PURCHASE_01) // VISIBLE_CARDS
+        col = ((action - _PURCHASE_01) % VISIBLE_CARDS) + 1
+        card = _pop_card(state, row, col)
+        _start_spending(state, base, card)
+
+    elif action < _TAKE3_11100:
+        card = _pop_reserved(state, base, action - _PURCHASE_RESERVE_0)
+        _start_spending(state, base, card)
+
+    else:  # Take 2 or take 3.
+        if action < _TAKE2_0:
+            for i in range(3):
+                c = _TAKE3_COLORS[action - _TAKE3_11100, i]
+                state[base + _P_GEMS + c] += 1
+                state[_BOARD_GEMS + c] -= 1
+        else:
+            c = action - _TAKE2_0
+            state[base + _P_GEMS + c] += 2
+            state[_BOARD_GEMS + c] -= 2
+        if _gem_sum(state, base) > _MAX_PLAYER_GEMS:
+            state[_TURN] = _RETURN
+        else:
+            _swap_player(state)
+
+    if state[base + _P_POINTS] >= _WIN_POINTS:
+        state[_TERMINAL] = 1
+
+    for row in range(3):
+        if _cards_left(state, row) < MIN_DECK_CARDS:
+            state[_TERMINAL] = 1
+
+    if legal_actions(state, scratch) == 0:  # Next player has no action.
+        state[_player_base(state[_CUR]) + _P_NO_MOVES] += 1
+        _swap_player(state)
+        if legal_actions(state, scratch) == 0:  # Both players have no action.
+            state[_TERMINAL] = 1
+
+
+@njit(cache=True)
+def apply_action_with_undo(state, action, history, depth, scratch):
+    """Saves `state` to `history[depth]` and applies `action`."""
+    history[depth, :] = state
+    apply_action(state, action, scratch)
+
+
+@njit(cache=True)
+def undo(state, history, depth):
+    """Restores the state saved before the move at `depth - 1`."""
+    state[:] = history[depth - 1]
+
+
+@njit(cache=True)
+def is_terminal(state):
+    return state[_TERMINAL] == 1
+
+
+@njit(cache=True)
+def write_returns(state, out):
+    if state[_player_base(0) + _P_POINTS] >= _WIN_POINTS:
+        out[0], out[1] = 1.0, -1.0
+    elif state[_player_base(1) + _P_POINTS] >= _WIN_POINTS:
+        out[0], out[1] = -1.0, 1.0
+    else:
+        out[0], out[1] = 0.0, 0.0
+
+
+@njit(cache=True)
+def perft(state, depth, history, legal, scratch):
+    """Counts the leaf nodes `depth` moves below `state`. `history` and `legal` need `depth` rows."""
+    if depth == 0:
+        return 1
+    if state[_TERMINAL] == 1:
+        return 0
+    n = legal_actions(state, legal[depth - 1])
+    nodes = 0
+    for i in range(n):
+        apply_action_with_undo(state, legal[depth - 1, i], history, depth - 1, scratch)
+        nodes += perft(state, depth - 1, history, legal, scratch)
+        undo(state, history, depth)
+    return nodes
+
+
+@njit(cache=True)
+def _write_card(out, offset, points, color, state_or_table, cost_offset):
+    out[offset] = points
+    out[offset + 1 + color] = 1
+    for c in range(5):
+        out[offset + 6 + c] = state_or_table[cost_offset + c]
+
+
+@njit(cache=True)
+def write_observation(state, out):
+    """Writes the `BoardObserver` tensor of `state` to `out`."""
+    out[:] = 0
+    offset = 0
+    for player in range(2):
+        base = _player_base(player)
+        out[offset] = state[base + _P_POINTS]
+        for c in range(6):
+            out[offset + 1 + c] = state[base + _P_GEMS + c]
+        for c in range(5):
+            out[offset + 7 + c] = state[base + _P_RES + c]
+        # Mirrors `Player.__array__`, which repeats the first reserved card in every filled slot.
+        for j in range(state[base + _P_NUM_RESERVED]):
+            card = state[base + _P_RESERVED]
+            _write_card(out, offset + 12 + (j * _CARD_SHAPE), CARD_TABLE[card, _C_POINTS],
+                        CARD_TABLE[card, _C_COLOR], CARD_TABLE[card], _C_COST)
+        offset += _PLAYER_SHAPE
+
+    for c in range(6):
+        out[offset + c] = state[_BOARD_GEMS + c]
+    offset += 6
+    for slot in range(3 * VISIBLE_CARDS):
+        card = state[_SLOTS + slot]
+        if card >= 0:
+            _write_card(out, offset, CARD_TABLE[card, _C_POINTS], CARD_TABLE[card, _C_COLOR],
+                        CARD_TABLE[card], _C_COST)
+        offset += _CARD_SHAPE
+
+    if state[_SPEND_EXISTS] == 1:
+        _write_card(out, offset, state[_SPEND_POINTS], state[_SPEND_COLOR], state, _SPEND_COST)
+
+
+def encode_state(state) -> np.ndarray:
+    """Returns the flat state array of a `splendor_game.SplendorState`."""
+    arr = np.zeros(STATE_SIZE, dtype=np.int32)
+    arr[_CUR] = state._cur_player
+    arr[_TERMINAL] = state._is_terminal
+    arr[_TURN] = int(state._turn_type)
+
+    if state._spending_card_exists:
+        card = state._spending_card
+        arr[_SPEND_EXISTS] = 1
+        arr[_SPEND_POINTS] = card.points
+        arr[_SPEND_COLOR] = int(card.gem_type)
+        arr[_SPEND_COST:_SPEND_COST + 5] = card.gems.get_array()[:5]
+
+    arr[_BOARD_GEMS:_BOARD_GEMS + 6] = state._board.gems.get_array()
+    arr[_SLOTS:_PLAYERS] = -1
+    for slot, card in enumerate(state._board.get_visible_cards()):
+        if card is not None:
+            arr[_SLOTS + slot] = _CARD_IDS[card_key(card)]
+    for row, deck in enumerate(state._board._decks):
+        arr[_DECK_LEN + row] = len(deck)
+        start = _DECKS + (row * _DECK_CAP)
+        arr[start:start + len(deck)] = [_CARD_IDS[card_key(card)] for card in deck]
+
+    for player_id, player in enumerate([state._player_0, state._player_1]):
+        base = _PLAYERS + (player_id * _PLAYER_SIZE)
+        arr[base + _P_GEMS:base + _P_GEMS + 6] = player.gems.get_array()
+        arr[base + _P_RES:base + _P_RES + 5] = player.get_resources_array()[:5]
+        arr[base + _P_POINTS] = player.get_points()
+        arr[base + _P_NUM_RESERVED] = len(player._reserved_cards)
+        arr[base + _P_RESERVED:base + _P_RESERVED + MAX_RESERVE] = -1
+        for j, card in enumerate(player._reserved_cards):
+            arr[base + _P_RESERVED + j] = _CARD_IDS[card_key(card)]
+        arr[base + _P_NO_MOVES] = player.no_moves
+        arr[base + _P_NUM_RETURNS] = player.num_returns
+    return arr
+
+
+class NumbaSplendorState:
+    """A `SplendorState`-compatible facade over the Numba kernels.
+
+    Every applied action is recorded so that `undo_action` can restore the previous
+    state without cloning.
+    """
+
+    def __init__(self, state_array: np.ndarray):
+        self._state = state_array
+        self._history = np.zeros((64, STATE_SIZE), dtype=np.int32)
+        self._actions: list[int] = []
+        self._scratch = np.zeros(NUM_ACTIONS, dtype=np.int32)
+        self._returns = np.zeros(2)
+
+    @classmethod
+    def from_state(cls, state):
+        """Builds a facade holding the same position as a `splendor_game.SplendorState`."""
+        return cls(encode_state(state))
+
+    def current_player(self):
+        return pyspiel.PlayerId.TERMINAL if is_terminal(self._state) else int(self._state[_CUR])
+
+    def is_terminal(self):
+        return bool(is_terminal(self._state))
+
+    def legal_actions(self, player=None):
+        if self.is_terminal():
+            return []
+        if player is not None and player != self._state[_CUR]:
+            return []
+        n = legal_actions(self._state, self._scratch)
+        return self._scratch[:n].tolist()
+
+    def apply_action(self, action):
+        depth = len(self._actions)
+        if depth == len(self._history):
+            self._history = np.concatenate([self._history, np.zeros_like(self._history)])
+        apply_action_with_undo(self._state, action, self._history, depth, self._scratch)
+        self._actions.append(action)
+
+    def undo_action(self, player=None, action=None):
+        """Undoes the last applied action; the arguments are accepted for pyspiel compatibility."""
+        del player, action
+        undo(self._state, self._history, len(self._actions))
+        self._actions.pop()
+
+    def history(self):
+        return list(self._actions)
+
+    def returns(self):
+        write_returns(self._state, self._returns)
+        return self._returns.tolist()
+
+    def observation_tensor(self, player=0):
+        del player
+        tensor = np.zeros(_TENSOR_SHAPE)
+        write_observation(self._state, tensor)
+        return tensor
+
+    def clone(self):
+        cloned = NumbaSplendorState(self._state.copy())
+        cloned._history = self._history.copy()
+        cloned._actions = list(self._actions)
+        return cloned
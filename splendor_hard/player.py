@@ -1,6 +1,7 @@
 import numpy as np
 from numpy.typing import NDArray
 
+from splendor_hard.board import Board
 from splendor_hard.card import Card
 from splendor_hard.gems import Gems, gem_array_str
 
@@ -22,6 +23,9 @@ class Player:
         self.no_moves = 0
         self._purchased_cards: list[Card] = []
         self._reserved_cards: list[Card] = []
+        self._reserved_hidden: list[bool] = []  # Reserved face down from the top of a deck.
+        self._reserve_version = 0
+        self._clear_purchase_index()
 
     def __str__(self):
         reserved_str = "Reserved cards: "
@@ -43,12 +47,30 @@ class Player:
         self._purchased_cards.append(card)
         return None
 
-    def add_reserved_card(self, card: Card) -> None:
+    def add_reserved_card(self, card: Card, hidden: bool = False) -> None:
         self._reserved_cards.append(card)
+        self._reserved_hidden.append(hidden)
+        self._reserve_version += 1
 
     def pop_reserved_card(self, pos: int) -> Card:
+        self._reserved_hidden.pop(pos)
+        self._reserve_version += 1
         return self._reserved_cards.pop(pos)
 
+    def copy(self) -> "Player":
+        """Returns a copy of the player that shares its (immutable) cards with this one."""
+        player = Player.__new__(Player)
+        player.gems = Gems(np.copy(self.gems.get_array()))
+        player.since_used_gem = np.copy(self.since_used_gem)
+        player.num_returns = self.num_returns
+        player.no_moves = self.no_moves
+        player._purchased_cards = list(self._purchased_cards)
+        player._reserved_cards = list(self._reserved_cards)
+        player._reserved_hidden = list(self._reserved_hidden)
+        player._reserve_version = self._reserve_version
+        player._clear_purchase_index()
+        return player
+
     def reserve_limit(self) -> bool:
         return not len(self._reserved_cards) < MAX_RESERVE
 
@@ -65,6 +87,50 @@ class Player:
         
         return np.sum(purchase_gems) <= 0
 
+    def _clear_purchase_index(self) -> None:
+        """Resets the affordability index over the visible and reserved cards, see `purchase_masks`."""
+        self._costs_key = None
+        self._costs = np.zeros((0, 5), dtype=int)
+        self._num_visible = 0
+        self._deficits_key = None
+        self.deficits = np.zeros((0, 5), dtype=int)  # Per-colour gems missing for each card.
+        self.gold_needed = np.zeros(0, dtype=int)
+        self._purchase_masks = (0, 0)
+
+    def purchase_masks(self, board: Board) -> tuple[int, int]:
+        """Returns bitmasks of the visible board cards (bit i is the i-th card in row-major order)
+        and of the reserved cards (bit j is reserve slot j) the player can afford, using gold.
+
+        The cost of every visible and reserved card is cached until a card leaves the board or the
+        reserve, and each card's per-colour deficit and gold needed until the player's gems or
+        resources change, so repeated legal-action queries on the same position are lookups.
+        """
+        costs_key = (id(board), board.version, self._reserve_version)
+        if costs_key != self._costs_key:
+            self._costs_key = costs_key
+            self._deficits_key = None
+            cards = board.get_visible_cards() + self._reserved_cards
+            self._num_visible = len(cards) - len(self._reserved_cards)
+            self._costs = np.array([card.gems.get_array()[:5] for card in cards])
+
+        gems = self.gems.get_array()
+        deficits_key = (gems.tobytes(), len(self._purchased_cards))
+        if deficits_key != self._deficits_key:
+            self._deficits_key = deficits_key
+            self.deficits = np.clip(self._costs - gems[:5] - self.get_resources_array()[:5], a_min=0, a_max=None)
+            self.gold_needed = np.sum(self.deficits, axis=1)
+            affordable = np.flatnonzero(self.gold_needed <= gems[5])
+            board_mask = 0
+            reserved_mask = 0
+            for i in affordable.tolist():
+                if i < self._num_visible:
+                    board_mask |= 1 << i
+                else:
+                    reserved_mask |= 1 << (i - self._num_visible)
+            self._purchase_masks = (board_mask, reserved_mask)
+
+        return self._purchase_masks
+
     def get_resources_array(self) -> NDArray:
         """Returns counts of all permanent gems from resource cards."""
         resources = np.zeros(6).astype(int)
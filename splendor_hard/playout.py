@@ -0,0 +1,51 @@
+"""Random playouts run inside the engine, shared by every Splendor variant.
+
+`SplendorState.random_playout` of `splendor_hard`, `splendor_medium` and `splendor_lite`
+calls `random_playout` with its state and its private `__apply_action`, which returns the
+legal actions after the move, so the games skip the pyspiel trampoline and the next move is
+picked from the legal actions the no-move check already computed.
+"""
+
+import numpy as np
+
+
+def random_playout(state, apply_action, rng, n: int) -> dict:
+    """Plays `n` uniformly random games to completion from `state` and returns outcome statistics.
+
+    `apply_action(state, action)` applies a move and returns the legal actions of the player
+    to move next. `rng` is a `random.Random` or `np.random.Generator`. `state` is left unchanged.
+    """
+    num_players = state.get_game().num_players()
+    returns_sum = np.zeros(num_players)
+    wins = [0] * num_players
+    ties = 0
+    game_lengths = []
+
+    for _ in range(n):
+        playout = state.clone()
+        legal_actions = playout._legal_actions(playout._cur_player)
+        game_length = 0
+        while not playout._is_terminal:
+            action = legal_actions[int(rng.random() * len(legal_actions))]
+            legal_actions = apply_action(playout, action)
+            game_length += 1
+
+        returns = playout.returns()
+        returns_sum += returns
+        if returns[0] > 0:
+            wins[0] += 1
+        elif returns[1] > 0:
+            wins[1] += 1
+        else:
+            ties += 1
+        game_lengths.append(game_length)
+
+    stats = {}
+    stats["num_playouts"] = n
+    stats["returns_avg"] = (returns_sum / max(n, 1)).tolist()
+    stats["player0_wins"] = wins[0]
+    stats["player1_wins"] = wins[1]
+    stats["ties"] = ties
+    stats["game_length_avg"] = float(np.mean(game_lengths)) if game_lengths else 0.0
+    stats["game_length_std"] = float(np.std(game_lengths)) if game_lengths else 0.0
+    return stats
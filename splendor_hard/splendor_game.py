@@ -22,8 +22,9 @@ from splendor_hard.board import Board
 from splendor_hard.player import Player
 from splendor_hard.card import Card
 from splendor_hard.gems import Gems
-from splendor_hard.actions import SActions, SAction, SCategory
+from splendor_hard.actions import SActions, SAction, SCategory, TakeLegality
 import splendor_hard.ansi_escape_codes as ansi
+from splendor_hard.playout import random_playout
 
 _NUM_PLAYERS = 2
 _CARDS_FILENAME = "./data/cards.csv"
@@ -37,6 +38,8 @@ _BOARD_SHAPE = ( _CARD_SHAPE * 12 ) + _GEM_SHAPE
 _PLAYER_SHAPE = _GEM_SHAPE + ( 3 * _CARD_SHAPE ) + 1 + 5 
 _TENSOR_SHAPE = ( _NUM_PLAYERS * _PLAYER_SHAPE ) + _BOARD_SHAPE + _CARD_SHAPE
 
+_TAKE_LEGALITY = TakeLegality(_MAX_TAKE2_GEMS)
+
 _GAME_TYPE = pyspiel.GameType(
     short_name="splendor_hard",
     long_name="Splendor Hard",
@@ -142,36 +145,31 @@ class SplendorState(pyspiel.State):
             reserve_ids = self._actions.get_action_ids(SCategory.RESERVE)
             legal_actions.extend(reserve_ids)
 
+        board_mask, reserved_mask = player.purchase_masks(self._board)
+
         # "Purchasing" action.
         purchase_ids = self._actions.get_action_ids(SCategory.PURCHASE)
-        for card, action in zip(self._board.get_visible_cards(), purchase_ids):
-            if player.can_purchase(card):
+        for i, action in enumerate(purchase_ids):
+            if board_mask >> i & 1:
                 legal_actions.append(action)
 
         # "Purchase reversed" actions.
         purchase_reserve_ids = self._actions.get_action_ids(SCategory.PURCHASE_RESERVE)
-        for card, action in zip(player._reserved_cards, purchase_reserve_ids):
-            if player.can_purchase(card):
+        for i, action in enumerate(purchase_reserve_ids):
+            if reserved_mask >> i & 1:
                 legal_actions.append(action)
 
-        # "Take 2" actions.
-        take2_ids = self._actions.get_action_ids(SCategory.TAKE2)
-        for action_id in take2_ids:
-            gems_required = np.copy(self._actions.get_action_object(action_id))
-            gems_required[gems_required != 0] = _MAX_TAKE2_GEMS
-            if self._board.gems.has_at_least(gems_required):
-                legal_actions.append(action_id)
+        # "Take 3" and "Take 2" actions; categories are appended in id order, so no sort is needed.
+        legal_actions.extend(_TAKE_LEGALITY.legal_actions(self._board.gems.get_array()))
 
-        # "Take 3" actions.
-        take3_ids = self._actions.get_action_ids(SCategory.TAKE3)
-        for action_id in take3_ids:
-            if self._board.gems.has_at_least(self._actions.get_action_object(action_id)):
-                legal_actions.append(action_id)
-
-        return sorted(legal_actions)
+        return legal_actions
 
     def _apply_action(self, action):
         """Applies the specified action to the state."""
+        self.__apply_action(action)
+
+    def __apply_action(self, action) -> list[int]:
+        """Applies the specified action and returns the legal actions of the player to move next."""
 
         player = self._player_0 if self._cur_player == 0 else self._player_1
         action_category = self._actions.get_category(action)
@@ -230,12 +228,15 @@ class SplendorState(pyspiel.State):
         if not self._board.enough_cards():
             self._is_terminal = True
         
-        if len(self._legal_actions(self._cur_player)) == 0: # Next player has no action.
+        legal_actions = self._legal_actions(self._cur_player)
+        if len(legal_actions) == 0: # Next player has no action.
             player = self._player_0 if self._cur_player == 0 else self._player_1
             player.no_moves += 1
             self.__swap_player()
-            if len(self._legal_actions(self._cur_player)) == 0: # Both players have no action.
+            legal_actions = self._legal_actions(self._cur_player)
+            if len(legal_actions) == 0: # Both players have no action.
                 self._is_terminal = True
+        return legal_actions
     
     def _action_to_string(self, player, action):  # TODO.
         """Action -> string."""
@@ -254,6 +255,13 @@ class SplendorState(pyspiel.State):
         else:
             return [0, 0]
 
+    def random_playout(self, rng, n: int) -> dict:
+        """Plays `n` uniformly random games to completion from this state and returns outcome statistics.
+
+        See `splendor_hard.playout.random_playout`. This state is left unchanged.
+        """
+        return random_playout(self, SplendorState.__apply_action, rng, n)
+
     def __str__(self):
         """String for debug purposes. No particular semantics are required."""
         output = ""
@@ -295,11 +303,7 @@ class SplendorState(pyspiel.State):
             return False
 
         player.gems.update(np.array([0, 0, 0, 0, 0, -1]))
-        can_afford = False
-
-        self._spending_card.gems.update(-gems_array)
-        can_afford = player.can_purchase(self._spending_card)
-        self._spending_card.gems.update(gems_array)
+        can_afford = player.can_purchase(self._spending_card.discounted(gems_array))
         player.gems.update(np.array([0, 0, 0, 0, 0, 1]))
         return can_afford
 
@@ -314,7 +318,7 @@ class SplendorState(pyspiel.State):
             self._board.gems.update(np.array([0, 0, 0, 0, 0, -1]))
             player.gems.update(np.array([0, 0, 0, 0, 0, 1]))
         card = self._board.pop_card(row, col)
-        player.add_reserved_card(card)
+        player.add_reserved_card(card, hidden=(col == 0))
         self.__swap_player()
 
     def __apply_end_spending_turn(self, player: Player):
@@ -330,7 +334,7 @@ class SplendorState(pyspiel.State):
         """Moves a player's gold back to the board and reduces the gem of the card it was used for."""
         player.gems.update(np.array([0, 0, 0, 0, 0, -1]))
         self._board.gems.update(np.array([0, 0, 0, 0, 0, 1]))
-        self._spending_card.gems.update(-gems)
+        self._spending_card = self._spending_card.discounted(gems)
 
       
 
@@ -375,7 +379,8 @@ class BoardObserver:
 
         del player
 
-        self.tensor = np.concatenate([
+        # Written in place: `dict["observation"]` is the buffer pyspiel reads.
+        self.tensor[:] = np.concatenate([
             state._player_0,
             state._player_1,
             state._board,
@@ -1,4 +1,5 @@
 import enum
+import itertools
 import numpy as np
 from typing import Any
 
@@ -68,3 +69,37 @@ class SActions:
             if dict_action_category == action_category:
                 action_ids.append(action_id)
         return action_ids
+
+
+class TakeLegality:
+    """Precomputed legality of the TAKE3 actions for every board gem vector.
+
+    Taking gems only depends on whether each of the five coloured board gem counts is at
+    least 1, so the counts are clipped to [0, 1] and encoded base 2 into an index of the table.
+    """
+
+    def __init__(self):
+        self._weights = 2 ** np.arange(4, -1, -1)
+        take_ids = SActions().get_action_ids(SCategory.TAKE3)
+        self.first_action = take_ids[0]
+
+        self.masks = np.zeros(2 ** 5, dtype=np.int32)
+        self.actions: list[tuple[int, ...]] = []
+        for index, counts in enumerate(itertools.product(range(2), repeat=5)):
+            legal = []
+            for action_id in take_ids:
+                if np.all(np.array(counts) >= SPLENDOR_ACTIONS[action_id][1][:5]):
+                    legal.append(action_id)
+                    self.masks[index] |= 1 << (action_id - self.first_action)
+            self.actions.append(tuple(legal))
+
+    def index(self, board_gems) -> int:
+        return int(np.minimum(board_gems[:5], 1) @ self._weights)
+
+    def legal_actions(self, board_gems) -> tuple[int, ...]:
+        """Legal take actions in ascending order."""
+        return self.actions[self.index(board_gems)]
+
+    def mask(self, board_gems) -> int:
+        """Legal take actions as a bitmask; bit i is action `first_action + i`."""
+        return int(self.masks[self.index(board_gems)])
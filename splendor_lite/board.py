@@ -8,63 +8,75 @@ from splendor_lite.gems import Gems, gem_array_str
 BOARD_COLOR_START: int = 8
 BOARD_GOLD_START: int = 5
 MIN_DECK_CARDS: int = 2
+VISIBLE_CARDS: int = 2
 
 
 class Board:
     """A board with three levels of decks and some number of gems in the center.
 
-    The internal representation of the board in `self._decks` is as follows:
+    The internal representation of the board is as follows:
 
-                          |  COLUMN n-3  |  COLUMN n-2  |  COLUMN n-2  |  COLUMN n-1
-    ----------------------|--------------|--------------|--------------|-------------
-    ROW 0 (Level 1 cards) | (Card_n - 4) | (Card_n - 3) | (Card_n - 2) | (Card_n - 1)
-    ROW 1 (Level 2 cards) | (Card_n - 4) | (Card_n - 3) | (Card_n - 2) | (Card_n - 1)
-    ROW 2 (Level 3 cards) | (Card_n - 4) | (Card_n - 3) | (Card_n-  2) | (Card_n - 1)
-
-    Columns n-5 down to column 0 represent cards that are flipped upside down in the deck.
+                          |  COLUMN 0  |  COLUMNS 1 and 2
+    ----------------------|------------|----------------------------
+    ROW 0 (Level 1 cards) | _decks[0]  | _slots[0][0], _slots[0][1]
+    ROW 1 (Level 2 cards) | _decks[1]  | _slots[1][0], _slots[1][1]
+    ROW 2 (Level 3 cards) | _decks[2]  | _slots[2][0], _slots[2][1]
 
+    `self._decks[row]` holds the cards that are flipped upside down; the top card is the last
+    element. Taking a face-up card refills its slot with the top card of the deck, so the other
+    face-up card never moves. A slot stays empty (None) once its deck has run out.
     """
 
     def __init__(self, filepath: str, shuffle_cards: bool = True):
         self.gems = Gems(np.array([BOARD_COLOR_START, BOARD_COLOR_START, BOARD_COLOR_START, BOARD_COLOR_START, BOARD_COLOR_START, BOARD_GOLD_START]))
 
-        self._decks: list[list[Card]] = csv_import(filepath)
-        if shuffle_cards:
-            for deck in self._decks:
+        self._decks: list[list[Card]] = []
+        self._slots: list[list[Card | None]] = []
+        for deck in csv_import(filepath):
+            if shuffle_cards:
                 shuffle(deck)
+            self._slots.append(deck[-VISIBLE_CARDS:])
+            del deck[-VISIBLE_CARDS:]
+            self._decks.append(deck)
 
 
     def __array__(self):
         return np.concatenate([
             self.gems.get_array(),
-            *self._decks[0][-2:],
-            *self._decks[1][-2:],
-            *self._decks[2][-2:],
+            *(np.zeros(11) if card is None else card for card in self.get_visible_cards()),
         ])
 
 
     def __str__(self) -> str:
         output = ""
-        for i, row in enumerate(self._decks):
+        for i, row in enumerate(self._slots):
             output += f"   Deck {i}: ({i}0) | "
-            for j, card in enumerate(row[-2:]):
+            for j, card in enumerate(row):
                 output += f"({i}{j + 1}) {str(card)} | "
             output += "\n"
         output += f"   Gems: {gem_array_str(self.gems.get_array())}\n"
         return output
 
 
+    def cards_left(self, row: int) -> int:
+        """Number of face-down and face-up cards left in a row."""
+        return len(self._decks[row]) + sum(card is not None for card in self._slots[row])
+
+
     def enough_cards(self):
-        return (len(self._decks[0]) >= MIN_DECK_CARDS and
-                len(self._decks[1]) >= MIN_DECK_CARDS and
-                len(self._decks[2]) >= MIN_DECK_CARDS)
+        return (self.cards_left(0) >= MIN_DECK_CARDS and
+                self.cards_left(1) >= MIN_DECK_CARDS and
+                self.cards_left(2) >= MIN_DECK_CARDS)
     
 
     def pop_card(self, row: int, col: int) -> Card:
-        """Remove and return the card associated with the specified columns and row."""
-        return self._decks[row].pop(-2 + (col - 1))
+        """Remove and return the card associated with the specified columns and row; its slot is refilled from the deck."""
+        deck = self._decks[row]
+        card = self._slots[row][col - 1]
+        self._slots[row][col - 1] = deck.pop() if deck else None
+        return card
 
 
     def get_visible_cards(self):
-        """Return the cards that are face up on the board in row-major order."""
-        return self._decks[0][-2:] + self._decks[1][-2:] + self._decks[2][-2:]
\ No newline at end of file
+        """Return the cards that are face up on the board in row-major order; empty slots are None."""
+        return self._slots[0] + self._slots[1] + self._slots[2]
@@ -22,8 +22,9 @@ from splendor_lite.board import Board
 from splendor_lite.player import Player
 from splendor_lite.card import Card
 from splendor_lite.gems import Gems
-from splendor_lite.actions import SActions, SAction, SCategory
+from splendor_lite.actions import SActions, SAction, SCategory, TakeLegality
 import splendor_lite.ansi_escape_codes as ansi
+from splendor_hard.playout import random_playout
 
 _NUM_PLAYERS = 2
 _CARDS_FILENAME = "./data/cards.csv"
@@ -38,6 +39,8 @@ _PLAYER_SHAPE = _GEM_SHAPE + 1 + 5
 _TENSOR_SHAPE = ( _NUM_PLAYERS * _PLAYER_SHAPE ) + _BOARD_SHAPE + _CARD_SHAPE
 _DECK_CARDS = 5
 
+_TAKE_LEGALITY = TakeLegality()
+
 _GAME_TYPE = pyspiel.GameType(
     short_name="splendor_lite",
     long_name="Splendor Lite",
@@ -113,19 +116,20 @@ class SplendorState(pyspiel.State):
         # "Purchasing" action.
         purchase_ids = self._actions.get_action_ids(SCategory.PURCHASE)
         for card, action in zip(self._board.get_visible_cards(), purchase_ids):
-            if player.can_purchase(card):
+            if card is not None and player.can_purchase(card):
                 legal_actions.append(action)
 
-        # "Take 3" actions.
-        take3_ids = self._actions.get_action_ids(SCategory.TAKE3)
-        for action_id in take3_ids:
-            if self._board.gems.has_at_least(self._actions.get_action_object(action_id)):
-                legal_actions.append(action_id)
+        # "Take 3" actions; categories are appended in id order, so no sort is needed.
+        legal_actions.extend(_TAKE_LEGALITY.legal_actions(self._board.gems.get_array()))
 
-        return sorted(legal_actions)
+        return legal_actions
 
     def _apply_action(self, action):
         """Applies the specified action to the state."""
+        self.__apply_action(action)
+
+    def __apply_action(self, action) -> list[int]:
+        """Applies the specified action and returns the legal actions of the player to move next."""
 
         player = self._player_0 if self._cur_player == 0 else self._player_1
         action_category = self._actions.get_category(action)
@@ -148,13 +152,16 @@ class SplendorState(pyspiel.State):
             self._is_terminal = True
             # print("TIE: NOT ENOUGH CARDS")
         
-        if len(self._legal_actions(self._cur_player)) == 0: # Next player has no action.
+        legal_actions = self._legal_actions(self._cur_player)
+        if len(legal_actions) == 0: # Next player has no action.
             player = self._player_0 if self._cur_player == 0 else self._player_1
             player.no_moves += 1
             self.__swap_player()
-            if len(self._legal_actions(self._cur_player)) == 0: # Both players have no action.
+            legal_actions = self._legal_actions(self._cur_player)
+            if len(legal_actions) == 0: # Both players have no action.
                 # print("TIE: NO ACTIONS")
                 self._is_terminal = True
+        return legal_actions
     
     def _action_to_string(self, player, action):  # TODO.
         """Action -> string."""
@@ -173,6 +180,13 @@ class SplendorState(pyspiel.State):
         else:
             return [0, 0]
 
+    def random_playout(self, rng, n: int) -> dict:
+        """Plays `n` uniformly random games to completion from this state and returns outcome statistics.
+
+        See `splendor_hard.playout.random_playout`. This state is left unchanged.
+        """
+        return random_playout(self, SplendorState.__apply_action, rng, n)
+
     def __str__(self):
         """String for debug purposes. No particular semantics are required."""
         output = ""
@@ -256,11 +270,15 @@ class BoardObserver:
 
         del player
 
-        self.tensor = np.concatenate([
+        # Written in place: `dict["observation"]` is the buffer pyspiel reads. The trailing
+        # card slot of the tensor is unused in this variant and stays zero.
+        observation = np.concatenate([
             state._player_0,
             state._player_1,
             state._board,
         ])
+        self.tensor[:len(observation)] = observation
+        self.tensor[len(observation):] = 0
 
     def string_from(self, state, player):
         del player
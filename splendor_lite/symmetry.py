@@ -0,0 +1,124 @@
+"""Colour-permutation canonicalization of Splendor states.
+
+The five gem colours are interchangeable as long as every card is recoloured together
+with them: relabelling the colours of a whole position (gems, resources, card colours
+and card costs) gives an equivalent position. `canonicalize` maps a state to the
+lexicographically smallest relabelling of its `state_vector`, so symmetric positions
+share one key in transposition tables, evaluation caches and tabular learners. `canonical_action` and `original_action` translate actions between the
+real and the canonical colour ordering.
+
+The state vector is the observation tensor after the player to move and the turn type,
+which the observation leaves out. The hidden deck order is not part of the key.
+"""
+
+import itertools
+
+import numpy as np
+
+from splendor_lite.actions import SAction, SPLENDOR_ACTIONS, SCategory
+from splendor_lite.splendor_game import (
+    BoardObserver,
+    _BOARD_SHAPE,
+    _CARD_SHAPE,
+    _GEM_SHAPE,
+    _NUM_PLAYERS,
+    _PLAYER_SHAPE,
+)
+
+NUM_COLORS = 5
+
+# COLOR_PERMUTATIONS[p][c] is the colour that colour c becomes under permutation p.
+COLOR_PERMUTATIONS = np.array(list(itertools.permutations(range(NUM_COLORS))))
+
+# The state vector starts with the player to move and the turn type, which keep their place.
+_STATE_PREFIX = 2
+
+# Players and board; the lite observation has no purchase card.
+_OBSERVATION_SHAPE = (_NUM_PLAYERS * _PLAYER_SHAPE) + _BOARD_SHAPE
+
+
+def _observation_index(perm) -> np.ndarray:
+    """Gather index that recolours an observation tensor: `permuted = observation[index]`."""
+    index = np.arange(_OBSERVATION_SHAPE)
+
+    def recolor(offset):
+        for c in range(NUM_COLORS):
+            index[offset + perm[c]] = offset + c
+
+    offset = 0
+    for _ in range(_NUM_PLAYERS):
+        recolor(offset + 1)  # Gems; gold stays in place.
+        recolor(offset + 1 + _GEM_SHAPE)  # Resources.
+        offset += _PLAYER_SHAPE
+
+    recolor(offset)  # Board gems.
+    for j in range((_BOARD_SHAPE - _GEM_SHAPE) // _CARD_SHAPE):
+        recolor(offset + _GEM_SHAPE + (j * _CARD_SHAPE) + 1)  # Gem type.
+        recolor(offset + _GEM_SHAPE + (j * _CARD_SHAPE) + 1 + NUM_COLORS)  # Costs.
+    return index
+
+
+def _action_permutation(perm) -> np.ndarray:
+    """Maps every action id to the action id that does the same thing after recolouring."""
+    by_object = {
+        tuple(action_object): action_id
+        for action_id, (category, action_object) in SPLENDOR_ACTIONS.items()
+        if category == SCategory.TAKE3
+    }
+    mapping = np.arange(len(SAction))
+    for action_id, (category, action_object) in SPLENDOR_ACTIONS.items():
+        if category == SCategory.TAKE3:
+            recolored = np.copy(action_object)
+            recolored[perm] = action_object[:NUM_COLORS]
+            mapping[action_id] = by_object[tuple(recolored)]
+    return mapping
+
+
+OBSERVATION_PERMUTATIONS = np.array([_observation_index(perm) for perm in COLOR_PERMUTATIONS])
+ACTION_PERMUTATIONS = np.array([_action_permutation(perm) for perm in COLOR_PERMUTATIONS])
+INVERSE_ACTION_PERMUTATIONS = np.argsort(ACTION_PERMUTATIONS, axis=1)
+STATE_PERMUTATIONS = np.concatenate([
+    np.broadcast_to(np.arange(_STATE_PREFIX), (len(COLOR_PERMUTATIONS), _STATE_PREFIX)),
+    _STATE_PREFIX + OBSERVATION_PERMUTATIONS,
+], axis=1)
+
+_OBSERVER = BoardObserver(None)
+
+
+def _canonicalize(vector: np.ndarray, permutations: np.ndarray) -> tuple[np.ndarray, int]:
+    candidates = vector[permutations]
+    perm_index = int(np.lexsort(candidates.T[::-1])[0])
+    return candidates[perm_index], perm_index
+
+
+def canonicalize_observation(observation: np.ndarray) -> tuple[np.ndarray, int]:
+    """Returns the canonical recolouring of an observation tensor and the index of the permutation used."""
+    return _canonicalize(observation, OBSERVATION_PERMUTATIONS)
+
+
+def state_vector(state) -> np.ndarray:
+    """The player to move, the turn type and the observation tensor of `state`."""
+    _OBSERVER.set_from(state, state.current_player())
+    observation = np.asarray(_OBSERVER.tensor)[:_OBSERVATION_SHAPE]
+    return np.concatenate([[state._cur_player, int(state._turn_type)], observation])
+
+
+def canonicalize(state) -> tuple[np.ndarray, int]:
+    """Returns the canonical state vector of `state` and the index of the permutation used."""
+    return _canonicalize(state_vector(state), STATE_PERMUTATIONS)
+
+
+def canonical_key(state) -> bytes:
+    """A hashable key shared by all colour permutations of `state`."""
+    canonical, _ = canonicalize(state)
+    return canonical.astype(np.int16).tobytes()
+
+
+def canonical_action(action: int, perm_index: int) -> int:
+    """Maps an action of the real state to the canonical state."""
+    return int(ACTION_PERMUTATIONS[perm_index, action])
+
+
+def original_action(action: int, perm_index: int) -> int:
+    """Maps an action of the canonical state back to the real state."""
+    return int(INVERSE_ACTION_PERMUTATIONS[perm_index, action])
@@ -78,6 +78,17 @@ class TestArrayMethods(unittest.TestCase):
         #self.assertEqual(obs.tensor[1], 2) # type: ignore
         self.assertEqual(np.sum(obs.tensor),np.sum(init_obs.tensor)) # type: ignore
 
+    def test_observation_tensor_matches_observer(self):
+        for game_name in ["splendor_hard", "splendor_lite"]:
+            with self.subTest(game_name):
+                game = pyspiel.load_game(game_name, {"shuffle_cards": False})
+                state = game.new_initial_state()
+                state.apply_action(state.legal_actions()[-1])
+                obs = make_observation(game)
+                obs.set_from(state, 0) # type: ignore
+                self.assertGreater(np.sum(obs.tensor), 0) # type: ignore
+                np.testing.assert_array_equal(state.observation_tensor(0), obs.tensor) # type: ignore
+
 
         
 if __name__ == "__main__":
@@ -0,0 +1,71 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+from open_spiel.python.algorithms import random_agent as ra
+
+from rl.background_eval import BackgroundEvaluator
+
+
+def _make_random_agent():
+    return ra.RandomAgent(player_id=0, num_actions=16)
+
+
+def _load_snapshot(agent, snapshot):
+    agent.snapshot = snapshot
+
+
+def _read_stats(stats_save_name):
+    logged = []
+    if not os.path.exists(stats_save_name):
+        return logged
+    with open(stats_save_name, "rb") as bin:
+        while True:
+            try:
+                logged.append((pickle.load(bin), pickle.load(bin)))
+            except EOFError:
+                return logged
+
+
+class TestBackgroundEvaluator(unittest.TestCase):
+    def test_keeps_newest_snapshot(self):
+        """Tests that newer snapshots replace the waiting one, and that `close` evaluates the last one."""
+        with tempfile.TemporaryDirectory() as directory:
+            stats_save_name = os.path.join(directory, "stats.pkl")
+            discarded = []
+            evaluator = BackgroundEvaluator("splendor_lite", _make_random_agent, _load_snapshot, 5, stats_save_name,
+                                            discard_snapshot=discarded.append)
+            updates = list(range(0, 60, 10))
+            for update in updates:
+                evaluator.submit(update, update)
+            evaluator.close()
+
+            logged = [update for update, _ in _read_stats(stats_save_name)]
+            self.assertEqual(logged, sorted(logged))
+            self.assertEqual(logged[-1], updates[-1])
+            self.assertEqual(sorted(logged + discarded), updates)
+            self.assertLess(len(logged), len(updates))
+            for _, stats in _read_stats(stats_save_name):
+                self.assertLessEqual(stats["game_wins"] + stats["game_ties"], 5)
+
+    def test_close_discards_pending(self):
+        """Tests that `close(discard_pending=True)` discards the snapshot still waiting instead of evaluating it."""
+        with tempfile.TemporaryDirectory() as directory:
+            stats_save_name = os.path.join(directory, "stats.pkl")
+            discarded = []
+            evaluator = BackgroundEvaluator("splendor_lite", _make_random_agent, _load_snapshot, 5, stats_save_name,
+                                            discard_snapshot=discarded.append)
+            updates = list(range(0, 60, 10))
+            for update in updates:
+                evaluator.submit(update, update)
+            evaluator.close(discard_pending=True)
+
+            logged = [update for update, _ in _read_stats(stats_save_name)]
+            self.assertEqual(sorted(logged + discarded), updates)
+            # Unless the process took it before `close`, the last snapshot is the one discarded.
+            self.assertTrue(updates[-1] in discarded or logged[-1:] == updates[-1:])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -47,9 +47,23 @@ class TestBoard(unittest.TestCase):
             self.board._gems = np.array(_RANDOM_BOARD)
             self.assertFalse(self.board.gems.has_at_least(test_query))
 
+    def test_pop_card(self):
+        with self.subTest("Taken face-up card is replaced in its own slot from the top of the deck."):
+            visible = self.board.get_visible_cards()
+            top = self.board._decks[1][-1]
+            card = self.board.pop_card(1, 2)
+            self.assertIs(card, visible[5])
+            self.assertEqual(self.board.get_visible_cards(), visible[:5] + [top] + visible[6:])
+
+        with self.subTest("Column 0 takes the top of the deck and leaves the face-up cards alone."):
+            visible = self.board.get_visible_cards()
+            top = self.board._decks[2][-1]
+            num_cards = self.board.cards_left(2)
+            self.assertIs(self.board.pop_card(2, 0), top)
+            self.assertEqual(self.board.get_visible_cards(), visible)
+            self.assertEqual(self.board.cards_left(2), num_cards - 1)
 
 
-            
 
 
 
@@ -0,0 +1,52 @@
+import random
+import unittest
+
+import numpy as np
+import pyspiel
+import torch
+
+import splendor_hard.splendor_game
+import splendor_lite.splendor_game
+from rl.card_set_encoder import CardSetEncoder, card_layout
+
+
+class TestCardSetEncoder(unittest.TestCase):
+    def test_layout_matches_observation(self):
+        """Tests that the card slots hold the board cards and reserved cards of real observations."""
+        for variant in ["splendor_lite", "splendor_hard"]:
+            with self.subTest(variant):
+                random.seed(0)
+                game = pyspiel.load_game(variant)
+                state = game.new_initial_state()
+                rng = random.Random(0)
+                for _ in range(12):
+                    state.apply_action(rng.choice(state.legal_actions()))
+                observation = np.array(state.observation_tensor(0))
+                card_index, other_index, groups = card_layout(len(observation))
+
+                indices = np.concatenate([card_index.ravel(), other_index])
+                self.assertEqual(len(np.unique(indices)), len(indices))
+                self.assertTrue(np.all(observation[np.setdiff1d(np.arange(len(observation)), indices)] == 0))
+
+                board_cards = [np.zeros(11) if card is None else np.array(card)
+                               for card in state._board.get_visible_cards()]
+                np.testing.assert_array_equal(observation[card_index[groups == 0]], board_cards)
+                reserved = getattr(state._player_0, "_reserved_cards", [])
+                if reserved:
+                    np.testing.assert_array_equal(observation[card_index[groups == 1][0]], np.array(reserved[0]))
+
+    def test_forward(self):
+        """Tests batch shapes and that the output does not depend on the order of the batch."""
+        for size in [107, 239]:
+            encoder = CardSetEncoder(size, hidden_size=64)
+            x = torch.randint(0, 4, (6, size)).float()
+            features = encoder(x)
+            self.assertEqual(features.shape, (6, 64))
+            torch.testing.assert_close(encoder(x.flip(0)), features.flip(0))
+
+        with self.assertRaises(ValueError):
+            card_layout(100)
+
+
+if __name__ == "__main__":
+    unittest.main()
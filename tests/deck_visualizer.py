@@ -4,10 +4,10 @@ import splendor_hard.board as sds
 
 def deck_display():
     board = sds.Board("data/cards.csv", False)
-    decks = board._decks
+    decks = [deck + slots for deck, slots in zip(board._decks, board._slots)]
     for deck in decks:
         deck.reverse()
-    deckSizes = (len(board._decks[0]), len(board._decks[1]), len(board._decks[2]))
+    deckSizes = (len(decks[0]), len(decks[1]), len(decks[2]))
 
     print(f"{ansi.B_YELLOW} DECK 0:       DECK 1:       DECK 2:{ansi.RESET}")
     for i in range(max(deckSizes)):
@@ -0,0 +1,90 @@
+import random
+import unittest
+
+import pyspiel
+
+from splendor_hard.actions import SAction
+from splendor_hard.card import card_key
+from splendor_hard.determinization import _CARD_ROWS, determinize
+import splendor_hard.splendor_game
+
+
+def state_with_hidden_reserves(seed):
+    """Plays random moves, in which player 1 reserves two cards from the top of the level 1 deck, up to a turn of player 0."""
+    random.seed(seed)  # The decks are shuffled with `random`.
+    state = pyspiel.load_game("splendor_hard").new_initial_state()
+    rng = random.Random(seed)
+    hidden_reserves = 0
+    num_moves = 0
+    while num_moves < 30 or state.current_player() != 0:
+        num_moves += 1
+        legal_actions = state.legal_actions()
+        if state.current_player() == 1 and hidden_reserves < 2 and SAction.RESERVE_00 in legal_actions:
+            action = SAction.RESERVE_00
+            hidden_reserves += 1
+        else:
+            action = rng.choice(legal_actions)
+        state.apply_action(action)
+    return state
+
+
+def card_ids(cards):
+    return sorted(id(card) for card in cards)
+
+
+class TestDeterminization(unittest.TestCase):
+    def test_keeps_information_set(self):
+        """Tests that everything player 0 can see is unchanged and the unseen cards are only reordered."""
+        state = state_with_hidden_reserves(seed=0)
+        opponent = state._player_1
+        self.assertIn(True, opponent._reserved_hidden)
+        rng = random.Random(0)
+
+        for _ in range(20):
+            determinized = determinize(state, 0, rng)
+            self.assertEqual(determinized.legal_actions(), state.legal_actions())
+            self.assertEqual(card_ids(determinized._board.get_visible_cards()), card_ids(state._board.get_visible_cards()))
+            self.assertEqual(determinized._player_0._reserved_cards, state._player_0._reserved_cards)
+
+            unseen = {}
+            determinized_unseen = {}
+            for row in range(3):
+                unseen[row] = list(state._board._decks[row])
+                determinized_unseen[row] = list(determinized._board._decks[row])
+            for card, hidden, determinized_card in zip(
+                opponent._reserved_cards, opponent._reserved_hidden, determinized._player_1._reserved_cards
+            ):
+                if hidden:
+                    unseen[_CARD_ROWS[card_key(card)]].append(card)
+                    determinized_unseen[_CARD_ROWS[card_key(card)]].append(determinized_card)
+                else:
+                    self.assertIs(determinized_card, card)
+            for row in range(3):
+                self.assertEqual(card_ids(determinized_unseen[row]), card_ids(unseen[row]))
+
+    def test_resamples_hidden_cards(self):
+        """Tests that the deck order and the opponent's hidden reserves are actually resampled."""
+        state = state_with_hidden_reserves(seed=1)
+        rng = random.Random(0)
+        decks = set()
+        reserves = set()
+        for _ in range(20):
+            determinized = determinize(state, 0, rng)
+            decks.add(tuple(id(card) for card in determinized._board._decks[0]))
+            reserves.add(tuple(id(card) for card in determinized._player_1._reserved_cards))
+        self.assertGreater(len(decks), 1)
+        self.assertGreater(len(reserves), 1)
+
+    def test_determinized_state_is_independent(self):
+        """Tests that playing out a determinization leaves the original state untouched."""
+        state = state_with_hidden_reserves(seed=2)
+        before = str(state)
+        determinized = determinize(state, state.current_player(), random.Random(0))
+        rng = random.Random(0)
+        while not determinized.is_terminal():
+            determinized.apply_action(rng.choice(determinized.legal_actions()))
+        self.assertEqual(str(state), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
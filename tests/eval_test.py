@@ -0,0 +1,66 @@
+import unittest
+
+import pyspiel
+import torch
+from open_spiel.python import rl_environment
+from open_spiel.python.algorithms import random_agent as ra
+
+import splendor_lite.splendor_game
+from rl import eval
+from rl.algorithms.mmd.mmd import MMD, MMDAgent
+from rl.vector_env import SharedMemoryVectorEnv
+
+
+class TestEval(unittest.TestCase):
+    def test_batched_matches_serial_stats(self):
+        """Tests that the batched evaluation plays `num_episodes` games and returns the serial stats."""
+        game = pyspiel.load_game("splendor_lite")
+        torch.manual_seed(0)
+        agent = MMD(game.information_state_tensor_shape(), game.num_distinct_actions(), 2,
+                    num_envs=1, steps_per_batch=1, agent_fn=MMDAgent)
+        serial_stats = eval.eval_against_random_bots(
+            rl_environment.Environment(game), agent, ra.RandomAgent(1, game.num_distinct_actions()), 3, mmd=True
+        )
+        envs = SharedMemoryVectorEnv("splendor_lite", list(range(4)), num_workers=1)
+        try:
+            stats = eval.eval_against_random_bots_batched(envs, agent, 10)
+        finally:
+            envs.close()
+        self.assertEqual(set(stats), set(serial_stats) | {"games_per_second"})
+        self.assertLessEqual(stats["game_wins"] + stats["game_ties"], 10)
+        self.assertGreater(stats["game_length_avg"], 0)
+        self.assertLessEqual(stats["rewards_min"], stats["rewards_avg"])
+        self.assertLessEqual(stats["rewards_avg"], stats["rewards_max"])
+
+    def test_wilson_interval(self):
+        """Tests the Wilson interval against known values."""
+        low, high = eval.wilson_interval(50, 100)
+        self.assertAlmostEqual(low, 0.4038, places=4)
+        self.assertAlmostEqual(high, 0.5962, places=4)
+        low, high = eval.wilson_interval(100, 100)
+        self.assertAlmostEqual(low, 0.9630, places=4)
+        self.assertAlmostEqual(high, 1.0)
+
+    def test_early_stop(self):
+        """Tests that a loose enough interval stops the evaluations after `min_episodes`, in whole rounds of envs."""
+        game = pyspiel.load_game("splendor_lite")
+        agent = MMD(game.information_state_tensor_shape(), game.num_distinct_actions(), 2,
+                    num_envs=1, steps_per_batch=1, agent_fn=MMDAgent)
+        stats = eval.eval_against_random_bots(
+            rl_environment.Environment(game), agent, ra.RandomAgent(1, game.num_distinct_actions()), 1000, mmd=True,
+            max_half_width=0.5, min_episodes=5,
+        )
+        self.assertEqual(stats["games"], 5)
+        self.assertLessEqual(stats["win_rate_low"], stats["game_wins"] / 5)
+        self.assertLessEqual(stats["game_wins"] / 5, stats["win_rate_high"])
+
+        envs = SharedMemoryVectorEnv("splendor_lite", list(range(4)), num_workers=1)
+        try:
+            stats = eval.eval_against_random_bots_batched(envs, agent, 1000, max_half_width=0.5, min_episodes=6)
+        finally:
+            envs.close()
+        self.assertEqual(stats["games"], 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
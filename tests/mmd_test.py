@@ -0,0 +1,121 @@
+import copy
+import unittest
+
+import pyspiel
+import torch
+
+import splendor_hard.splendor_game
+from rl.algorithms.mmd.mmd import MMD, MMDAgent, reverse_discounted_sum, unpack_mask
+from rl.vector_env import SharedMemoryVectorEnv
+
+
+class TestMMD(unittest.TestCase):
+    def test_step_batch_matches_step(self):
+        """Tests that acting from the env arrays fills the rollout buffers like acting from time steps."""
+        game = pyspiel.load_game("splendor_hard")
+        envs = SharedMemoryVectorEnv("splendor_hard", list(range(4)), num_workers=1)
+        try:
+            time_steps = envs.reset()
+            agent = MMD(game.information_state_tensor_shape(), game.num_distinct_actions(), 2,
+                        num_envs=4, steps_per_batch=2, agent_fn=MMDAgent)
+            batch_agent = copy.deepcopy(agent)
+
+            torch.manual_seed(0)
+            agent.step(time_steps)
+            torch.manual_seed(0)
+            actions = batch_agent.step_batch(*envs.batch())
+            for name in ["obs", "legal_actions_mask", "actions", "logprobs", "values", "current_players"]:
+                self.assertTrue(torch.equal(getattr(agent, name), getattr(batch_agent, name)), name)
+
+            envs.step_async(actions.cpu(), reset_if_done=True)
+            rewards, dones = envs.step_wait_arrays()
+            agent.post_step(rewards[:, 0].tolist(), dones.tolist())
+            batch_agent.post_step_batch(rewards[:, 0], dones)
+            self.assertTrue(torch.equal(agent.rewards, batch_agent.rewards))
+            self.assertTrue(torch.equal(agent.dones, batch_agent.dones))
+            self.assertEqual(batch_agent.cur_batch_idx, 1)
+        finally:
+            envs.close()
+
+    def test_reverse_discounted_sum(self):
+        """Tests the unrolled scan against the step-by-step recursion, episodes ending anywhere."""
+        generator = torch.Generator().manual_seed(0)
+        x = torch.randn((50, 6), generator=generator)
+        dones = (torch.rand((50, 6), generator=generator) < 0.1).float()
+        expected = torch.zeros_like(x)
+        last = torch.zeros(6)
+        for t in reversed(range(50)):
+            expected[t] = last = x[t] + 0.95 * (1.0 - dones[t]) * last
+        torch.testing.assert_close(reverse_discounted_sum(x, dones, 0.95), expected)
+
+        discounts = 0.5 + 0.5 * torch.rand((50, 6), generator=generator)
+        last = torch.zeros(6)
+        for t in reversed(range(50)):
+            expected[t] = last = x[t] + discounts[t] * (1.0 - dones[t]) * last
+        torch.testing.assert_close(reverse_discounted_sum(x, dones, discounts), expected)
+
+    def test_vtrace_on_policy(self):
+        """Tests that on-policy V-trace value targets are the GAE returns."""
+        agent = MMD([239], 57, 2, num_envs=3, steps_per_batch=20, agent_fn=MMDAgent, vtrace=True)
+        generator = torch.Generator().manual_seed(0)
+        agent.rewards.copy_(torch.randn((20, 3), generator=generator))
+        agent.dones.copy_((torch.rand((20, 3), generator=generator) < 0.2).float())
+        agent.values.copy_(torch.randn((20, 3), generator=generator))
+        next_value = torch.randn((1, 3), generator=generator)
+        _, returns = agent.compute_advantages(next_value)
+        _, vtrace_returns = agent.compute_vtrace(next_value, agent.values, torch.zeros((20, 3)))
+        torch.testing.assert_close(vtrace_returns, returns)
+
+    def test_compact_storage(self):
+        """Tests that int8 observations and packed masks give the same rollout and update as full ones."""
+        game = pyspiel.load_game("splendor_hard")
+        envs = SharedMemoryVectorEnv("splendor_hard", list(range(4)), num_workers=1)
+        try:
+            envs.reset()
+            torch.manual_seed(0)
+            agent = MMD(game.information_state_tensor_shape(), game.num_distinct_actions(), 2,
+                        num_envs=4, steps_per_batch=4, num_minibatches=2, agent_fn=MMDAgent)
+            compact_agent = MMD(game.information_state_tensor_shape(), game.num_distinct_actions(), 2,
+                                num_envs=4, steps_per_batch=4, num_minibatches=2, agent_fn=MMDAgent,
+                                compact_storage=True)
+            compact_agent.load_state_dict(agent.state_dict())
+            for _ in range(4):
+                torch.manual_seed(0)
+                actions = agent.step_batch(*envs.batch())
+                torch.manual_seed(0)
+                self.assertTrue(torch.equal(compact_agent.step_batch(*envs.batch()), actions))
+                envs.step_async(actions.cpu(), reset_if_done=True)
+                rewards, dones = envs.step_wait_arrays()
+                agent.post_step_batch(rewards[:, 0], dones)
+                compact_agent.post_step_batch(rewards[:, 0], dones)
+            self.assertTrue(torch.equal(compact_agent.obs.float(), agent.obs))
+            self.assertTrue(torch.equal(unpack_mask(compact_agent.legal_actions_mask, game.num_distinct_actions()),
+                                        agent.legal_actions_mask))
+
+            next_obs = envs.batch()[0].copy()
+            torch.manual_seed(0)
+            agent.learn(next_obs, 0, 1000)
+            torch.manual_seed(0)
+            compact_agent.learn(next_obs, 0, 1000)
+            for name, weights in agent.state_dict().items():
+                torch.testing.assert_close(compact_agent.state_dict()[name], weights, msg=name)
+        finally:
+            envs.close()
+
+    def test_shared_trunk(self):
+        """Tests that the shared-trunk heads match the full networks and that actor checkpoints keep the trunk."""
+        torch.manual_seed(0)
+        agent = MMDAgent(57, [239], torch.device("cpu"), shared_trunk=True)
+        x = torch.rand((5, 239))
+        mask = torch.ones((5, 57), dtype=torch.bool)
+        _, _, _, value, probs = agent.get_action_and_value(x, mask)
+        torch.testing.assert_close(value, agent.critic(x))
+        torch.testing.assert_close(probs, torch.softmax(agent.actor(x), dim=-1))
+
+        restored = MMDAgent(57, [239], torch.device("cpu"), shared_trunk=True)
+        restored.actor.load_state_dict(agent.actor.state_dict())
+        torch.testing.assert_close(restored.actor(x), agent.actor(x))
+
+
+if __name__ == "__main__":
+    unittest.main()
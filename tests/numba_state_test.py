@@ -0,0 +1,58 @@
+import random
+import unittest
+
+import numpy as np
+import pyspiel
+
+import splendor_hard.splendor_game as splendor_game
+from splendor_hard.numba_state import NumbaSplendorState
+
+from open_spiel.python.observation import make_observation
+
+_NUM_GAMES = 30
+
+
+class TestNumbaState(unittest.TestCase):
+    def setUp(self):
+        self.game = pyspiel.load_game("splendor_hard")
+        self.obs = make_observation(self.game)
+
+    def test_random_games_match_engine(self):
+        """Plays random games on both engines and compares them after every action."""
+        turn_types = set()
+        for seed in range(_NUM_GAMES):
+            random.seed(seed)
+            state = self.game.new_initial_state()
+            fast_state = NumbaSplendorState.from_state(state)
+            rng = random.Random(seed)
+            while not state.is_terminal():
+                turn_types.add(state._turn_type)
+                self.assertEqual(state.legal_actions(), fast_state.legal_actions())
+                self.obs.set_from(state, 0)
+                np.testing.assert_array_equal(self.obs.tensor, fast_state.observation_tensor())
+
+                action = rng.choice(state.legal_actions())
+                state.apply_action(action)
+                fast_state.apply_action(action)
+                self.assertEqual(state.current_player(), fast_state.current_player())
+
+            self.assertTrue(fast_state.is_terminal())
+            self.assertEqual(state.returns(), fast_state.returns())
+        self.assertEqual(turn_types, set(splendor_game.TurnType))
+
+    def test_undo(self):
+        """Tests that undoing every action restores the initial state."""
+        state = self.game.new_initial_state()
+        fast_state = NumbaSplendorState.from_state(state)
+        initial = fast_state.clone()
+        rng = random.Random(0)
+        while not fast_state.is_terminal():
+            fast_state.apply_action(rng.choice(fast_state.legal_actions()))
+        while fast_state.history():
+            fast_state.undo_action()
+        np.testing.assert_array_equal(initial._state, fast_state._state)
+        self.assertEqual(initial.legal_actions(), fast_state.legal_actions())
+
+
+if __name__ == "__main__":
+    unittest.main()
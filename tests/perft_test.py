@@ -0,0 +1,26 @@
+import unittest
+
+from benchmarks.perft import REFERENCE_COUNTS, perft, perft_undo, position
+from splendor_hard.numba_state import NumbaSplendorState
+
+
+class TestPerft(unittest.TestCase):
+    def test_python_reference_counts(self):
+        """Checks the cheapest reference positions of each variant on the Python engines."""
+        for case in [("splendor_lite", 2, 8, 3), ("splendor_medium", 2, 12, 2), ("splendor_hard", 2, 12, 2)]:
+            with self.subTest(case):
+                variant, seed, num_moves, depth = case
+                self.assertEqual(perft(position(variant, seed, num_moves), depth), REFERENCE_COUNTS[case])
+
+    def test_numba_reference_counts(self):
+        """Checks every "hard" reference position on the Numba engine."""
+        for case, expected in REFERENCE_COUNTS.items():
+            variant, seed, num_moves, depth = case
+            if variant == "splendor_hard":
+                with self.subTest(case):
+                    state = NumbaSplendorState.from_state(position(variant, seed, num_moves))
+                    self.assertEqual(perft_undo(state, depth), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
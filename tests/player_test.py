@@ -2,6 +2,7 @@ import unittest
 import numpy as np
 from numpy.typing import NDArray
 
+from splendor_hard.board import Board
 from splendor_hard.player import Player
 from splendor_hard.card import Card 
 from splendor_hard.gem import Gem
@@ -60,6 +61,36 @@ class TestPlayer(unittest.TestCase):
             self.player.gems = Gems(np.array([0, 0, 0, 0, 0, 25]))
             self.assertTrue(self.player.can_purchase(_TEST_CARD, using_gold=True))
 
+    def test_purchase_masks(self):
+        """Tests that the affordability index agrees with `can_purchase` and refreshes when its inputs change."""
+        board = Board("data/cards.csv", shuffle_cards=False)
+
+        def expected_masks():
+            board_mask = sum(1 << i for i, card in enumerate(board.get_visible_cards()) if self.player.can_purchase(card))
+            reserved_mask = sum(1 << j for j, card in enumerate(self.player._reserved_cards) if self.player.can_purchase(card))
+            return board_mask, reserved_mask
+
+        with self.subTest("Nothing is affordable without gems."):
+            self.assertEqual(self.player.purchase_masks(board), (0, 0))
+
+        with self.subTest("Gems changed."):
+            self.player.gems = Gems(np.array([3, 3, 3, 3, 3, 0]))
+            self.assertEqual(self.player.purchase_masks(board), expected_masks())
+            self.assertNotEqual(self.player.purchase_masks(board), (0, 0))
+
+        with self.subTest("Gems changed in place."):
+            self.player.gems.get_array()[5] = 5
+            self.assertEqual(self.player.purchase_masks(board), expected_masks())
+
+        with self.subTest("Resources and reserves changed."):
+            set_resource_array(self.player, np.array([1, 0, 2, 0, 1]))
+            self.player.add_reserved_card(_TEST_CARD)
+            self.assertEqual(self.player.purchase_masks(board), expected_masks())
+
+        with self.subTest("Board card taken."):
+            board.pop_card(2, 3)
+            self.assertEqual(self.player.purchase_masks(board), expected_masks())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,50 @@
+import random
+import unittest
+
+import numpy as np
+import pyspiel
+
+from benchmarks import positions
+
+from open_spiel.python.observation import make_observation
+
+
+class TestPositions(unittest.TestCase):
+    def test_decoded_state_plays_like_the_original(self):
+        """Encodes positions of random games, decodes them and plays both states on with the same actions."""
+        for variant in positions.VARIANTS:
+            with self.subTest(variant):
+                game = pyspiel.load_game(variant)
+                obs = make_observation(game)
+                rng = random.Random(0)
+                state = game.new_initial_state()
+                for _ in range(15):
+                    state.apply_action(rng.choice(state.legal_actions()))
+                decoded = positions.decode(game, positions.encode(state, variant), variant)
+
+                while not state.is_terminal():
+                    self.assertEqual(decoded.legal_actions(), state.legal_actions())
+                    obs.set_from(state, 0)
+                    expected = np.copy(obs.tensor)
+                    obs.set_from(decoded, 0)
+                    np.testing.assert_array_equal(obs.tensor, expected)
+                    action = rng.choice(state.legal_actions())
+                    state.apply_action(action)
+                    decoded.apply_action(action)
+                self.assertTrue(decoded.is_terminal())
+                self.assertEqual(decoded.returns(), state.returns())
+
+    def test_stored_positions_round_trip(self):
+        """Tests that the stored suite loads and encodes back to the same records."""
+        for variant in positions.VARIANTS:
+            with self.subTest(variant):
+                with np.load(positions.POSITIONS_FILENAME) as data:
+                    records = data[variant]
+                states = positions.load(variant)
+                self.assertEqual(len(states), len(records))
+                for state, record in zip(states, records):
+                    np.testing.assert_array_equal(positions.encode(state, variant), record)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import importlib.util
+import unittest
+
+import pyspiel
+
+import splendor_lite.splendor_game
+from rl.algorithms.mmd.mmd import MMD, MMDAgent
+
+
+@unittest.skipIf(importlib.util.find_spec("ray") is None, "ray is not installed")
+class TestRayRollouts(unittest.TestCase):
+    def test_collect(self):
+        """Tests that the rollouts of every actor are gathered into one batch of all the envs."""
+        import ray
+        from rl.algorithms.mmd.ray_rollouts import RayRollouts
+
+        game = pyspiel.load_game("splendor_lite")
+        agent_kwargs = dict(input_shape=game.information_state_tensor_shape(), num_actions=game.num_distinct_actions(),
+                            num_players=2, num_envs=5, steps_per_batch=8, agent_fn=MMDAgent)
+        agent = MMD(**agent_kwargs)
+        rollouts = RayRollouts("splendor_lite", list(range(5)), 2, agent_kwargs, 8)
+        try:
+            batch, next_obs, seconds = rollouts.collect(agent.network)
+            self.assertEqual(batch["obs"].shape, agent.obs.shape)
+            self.assertEqual(next_obs.shape, (5, game.information_state_tensor_size()))
+            self.assertEqual(set(seconds), {"inference", "env"})
+            agent.load_rollout(batch)
+            self.assertEqual(agent.total_steps_done, 40)
+            agent.learn(next_obs, 40, 1000)
+        finally:
+            rollouts.close()
+            ray.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+import torch
+import torch.multiprocessing
+
+from rl.algorithms.mmd.mmd import MMDAgent
+from rl.shared_weights import SharedWeights
+
+
+def _load_in_child(weights, results):
+    network = MMDAgent(16, [107], torch.device("cpu"), shared_trunk=True)
+    version = weights.load(network)
+    results.put((version, [tensor.sum().item() for tensor in network.state_dict().values()]))
+
+
+class TestSharedWeights(unittest.TestCase):
+    def test_publish_and_load(self):
+        """Tests that published weights and their version reach a network in another process."""
+        torch.manual_seed(0)
+        learner = MMDAgent(16, [107], torch.device("cpu"), shared_trunk=True)
+        weights = SharedWeights(learner)
+        self.assertEqual(weights.version, -1)
+        weights.publish(learner, 3)
+        self.assertEqual(weights.version, 3)
+
+        context = torch.multiprocessing.get_context("spawn")
+        results = context.Queue()
+        process = context.Process(target=_load_in_child, args=(weights, results))
+        process.start()
+        version, sums = results.get(timeout=60)
+        process.join()
+        self.assertEqual(version, 3)
+        torch.testing.assert_close(sums, [tensor.sum().item() for tensor in learner.state_dict().values()])
+
+        worker = MMDAgent(16, [107], torch.device("cpu"), shared_trunk=True)
+        with torch.no_grad():
+            learner.actor[1].weight.add_(1.0)
+        weights.publish(learner, 4)
+        self.assertEqual(weights.load(worker), 4)
+        torch.testing.assert_close(worker.actor[1].weight, learner.actor[1].weight)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,5 @@
+import itertools
+import random
 import unittest
 import pyspiel
 import numpy as np
@@ -154,7 +156,35 @@ class TestSplendorGame(unittest.TestCase):
     def test_reward_initial(self):
         """Tests that both players have zero reward when the game is created."""
         self.assertTrue(np.array_equal(self.state.returns(), [0, 0]))
-        
+
+    def test_random_playout(self):
+        """Tests that random playouts finish every game and leave the state untouched."""
+        self.state.apply_action(SAction.TAKE3_11100)
+        legal_actions = self.state.legal_actions()
+        stats = self.state.random_playout(random.Random(0), 5)
+        self.assertEqual(stats["num_playouts"], 5)
+        self.assertEqual(stats["player0_wins"] + stats["player1_wins"] + stats["ties"], 5)
+        self.assertGreater(stats["game_length_avg"], 0)
+        self.assertEqual(self.state.legal_actions(), legal_actions)
+        self.assertTrue(np.array_equal(self.state._player_0.gems.get_array(), [1, 1, 1, 0, 0, 0]))
+
+    def test_take_legality_table(self):
+        """Tests the take-legality table against `has_at_least` for every board gem vector up to 7 of a colour."""
+        table = splendor_game._TAKE_LEGALITY
+        take_ids = self.actions.get_action_ids(SCategory.TAKE3) + self.actions.get_action_ids(SCategory.TAKE2)
+        for counts in itertools.product(range(8), repeat=5):
+            board_gems = Gems(np.array([*counts, 5]))
+            expected = []
+            for action_id in take_ids:
+                gems_required = np.copy(self.actions.get_action_object(action_id))
+                if self.actions.get_category(action_id) == SCategory.TAKE2:
+                    gems_required[gems_required != 0] = splendor_game._MAX_TAKE2_GEMS
+                if board_gems.has_at_least(gems_required):
+                    expected.append(action_id)
+            self.assertEqual(list(table.legal_actions(board_gems.get_array())), expected)
+            mask = table.mask(board_gems.get_array())
+            self.assertEqual([a for a in take_ids if mask & (1 << (a - table.first_action))], expected)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,80 @@
+import random
+import unittest
+
+import numpy as np
+import pyspiel
+
+import splendor_hard.symmetry as symmetry
+import splendor_lite.symmetry as lite_symmetry
+from splendor_hard.actions import SAction
+from splendor_hard.splendor_game import BoardObserver
+
+
+def random_state(game_name, seed, num_moves):
+    state = pyspiel.load_game(game_name).new_initial_state()
+    rng = random.Random(seed)
+    for _ in range(num_moves):
+        state.apply_action(rng.choice(state.legal_actions()))
+    return state
+
+
+class TestSymmetry(unittest.TestCase):
+    def test_permuted_observations_share_canonical_form(self):
+        """Tests that every recolouring of an observation canonicalizes to the same tensor."""
+        state = random_state("splendor_hard", seed=0, num_moves=20)
+        observer = BoardObserver(None)
+        observer.set_from(state, 0)
+        canonical, _ = symmetry.canonicalize_observation(observer.tensor)
+        for permutation in symmetry.OBSERVATION_PERMUTATIONS:
+            permuted_canonical, _ = symmetry.canonicalize_observation(observer.tensor[permutation])
+            np.testing.assert_array_equal(canonical, permuted_canonical)
+
+    def test_canonical_form_is_a_recolouring(self):
+        """Tests that the canonical vector is the state vector recoloured by the returned permutation."""
+        state = random_state("splendor_hard", seed=1, num_moves=10)
+        vector = symmetry.state_vector(state)
+        canonical, perm_index = symmetry.canonicalize(state)
+        np.testing.assert_array_equal(canonical, vector[symmetry.STATE_PERMUTATIONS[perm_index]])
+        np.testing.assert_array_equal(canonical[:2], vector[:2])
+        self.assertEqual(np.sum(canonical), np.sum(vector))
+
+    def test_action_mapping(self):
+        """Tests the action mapping round trip and the recolouring of colour-specific actions."""
+        for perm_index in range(len(symmetry.COLOR_PERMUTATIONS)):
+            for action in SAction:
+                mapped = symmetry.canonical_action(action, perm_index)
+                self.assertEqual(symmetry.original_action(mapped, perm_index), action)
+
+        swap_white_blue = [tuple(p) for p in symmetry.COLOR_PERMUTATIONS].index((1, 0, 2, 3, 4))
+        self.assertEqual(symmetry.canonical_action(SAction.TAKE2_0, swap_white_blue), SAction.TAKE2_1)
+        self.assertEqual(symmetry.canonical_action(SAction.TAKE3_10110, swap_white_blue), SAction.TAKE3_01110)
+        self.assertEqual(symmetry.canonical_action(SAction.RETURN_GOLD, swap_white_blue), SAction.RETURN_GOLD)
+        self.assertEqual(symmetry.canonical_action(SAction.PURCHASE_12, swap_white_blue), SAction.PURCHASE_12)
+
+    def test_lite_canonical_key(self):
+        """Tests that lite keys are stable and the lite action mapping round trips."""
+        state = random_state("splendor_lite", seed=2, num_moves=6)
+        self.assertEqual(lite_symmetry.canonical_key(state), lite_symmetry.canonical_key(state.clone()))
+        for perm_index in range(len(lite_symmetry.COLOR_PERMUTATIONS)):
+            for action in range(pyspiel.load_game("splendor_lite").num_distinct_actions()):
+                mapped = lite_symmetry.canonical_action(action, perm_index)
+                self.assertEqual(lite_symmetry.original_action(mapped, perm_index), action)
+
+    def test_equal_keys_have_equal_canonical_legal_actions(self):
+        """Tests that states sharing a key have the same legal actions in the canonical colour ordering."""
+        for game_name, module, num_games in [("splendor_hard", symmetry, 30), ("splendor_lite", lite_symmetry, 30)]:
+            game = pyspiel.load_game(game_name)
+            rng = random.Random(0)
+            legal_by_key = {}
+            for _ in range(num_games):
+                state = game.new_initial_state()
+                while not state.is_terminal():
+                    _, perm_index = module.canonicalize(state)
+                    legal = sorted(module.canonical_action(a, perm_index) for a in state.legal_actions())
+                    key = module.canonical_key(state)
+                    self.assertEqual(legal_by_key.setdefault(key, legal), legal, game_name)
+                    state.apply_action(rng.choice(state.legal_actions()))
+
+
+if __name__ == "__main__":
+    unittest.main()
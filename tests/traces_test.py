@@ -0,0 +1,32 @@
+import unittest
+
+from benchmarks import traces
+
+
+class TestTraces(unittest.TestCase):
+    def test_golden_traces_replay(self):
+        """Tests that the reference engine still plays the committed golden traces."""
+        for variant in traces.VARIANTS:
+            with self.subTest(variant):
+                trace = traces.load(variant)
+                divergence, steps, _ = traces.replay(trace)
+                self.assertIsNone(divergence, str(divergence))
+                self.assertEqual(steps, trace.num_steps)
+
+    def test_numba_engine_replays_hard_traces(self):
+        divergence, _, _ = traces.replay(traces.load("splendor_hard"), traces.ENGINES["numba"])
+        self.assertIsNone(divergence, str(divergence))
+
+    def test_reports_first_divergence(self):
+        """Tests that a corrupted observation is reported at the step it was corrupted."""
+        trace = traces.record("splendor_lite", 2, seed=5)
+        index = trace.lengths[0] + 3
+        trace.observations[index, 0] += 1
+        divergence, steps, _ = traces.replay(trace)
+        self.assertEqual((divergence.game, divergence.step, divergence.seed), (1, 3, 6))
+        self.assertTrue(divergence.field.startswith("observation"))
+        self.assertEqual(steps, index)
+
+
+if __name__ == "__main__":
+    unittest.main()
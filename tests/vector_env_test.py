@@ -0,0 +1,68 @@
+import random
+import unittest
+
+import numpy as np
+import pyspiel
+
+import splendor_lite.splendor_game
+from open_spiel.python.rl_agent import StepOutput
+from open_spiel.python.rl_environment import ChanceEventSampler
+from open_spiel.python.rl_environment import Environment
+
+from rl.vector_env import SharedMemoryVectorEnv
+
+
+class TestSharedMemoryVectorEnv(unittest.TestCase):
+    def test_matches_local_environments(self):
+        """Steps one environment per worker and compares every time step with local environments."""
+        seeds = [3, 4]
+        envs = SharedMemoryVectorEnv("splendor_lite", seeds, num_workers=len(seeds))
+        game = pyspiel.load_game("splendor_lite")
+        local_envs = []
+        random_states = []
+        for seed in seeds:
+            random.seed(seed)
+            local_envs.append(Environment(game, chance_event_sampler=ChanceEventSampler(seed=seed)))
+            random_states.append(random.getstate())
+
+        def local_call(i, fn):
+            # Each worker has its own `random`, which shuffles the decks.
+            random.setstate(random_states[i])
+            result = fn(local_envs[i])
+            random_states[i] = random.getstate()
+            return result
+
+        def assert_equal(time_steps, expected):
+            for time_step, other in zip(time_steps, expected):
+                self.assertEqual(time_step.step_type, other.step_type)
+                self.assertEqual(time_step.rewards, other.rewards)
+                self.assertEqual(time_step.current_player(), other.current_player())
+                self.assertEqual(time_step.observations["legal_actions"], other.observations["legal_actions"])
+                np.testing.assert_array_equal(
+                    time_step.observations["info_state"], np.array(other.observations["info_state"], dtype=np.float32)
+                )
+
+        try:
+            time_steps = envs.reset()
+            assert_equal(time_steps, [local_call(i, lambda env: env.reset()) for i in range(len(seeds))])
+            rng = random.Random(0)
+            num_done = 0
+            for _ in range(300):
+                actions = [rng.choice(ts.observations["legal_actions"][ts.current_player()]) for ts in time_steps]
+                time_steps, rewards, dones, unreset = envs.step(
+                    [StepOutput(action=a, probs=None) for a in actions], reset_if_done=True
+                )
+                expected = [local_call(i, lambda env: env.step([actions[i]])) for i in range(len(seeds))]
+                assert_equal(unreset, expected)
+                self.assertEqual(dones, [ts.last() for ts in expected])
+                self.assertEqual(rewards, [ts.rewards for ts in expected])
+                expected = [local_call(i, lambda env: env.reset()) if dones[i] else expected[i] for i in range(len(seeds))]
+                assert_equal(time_steps, expected)
+                num_done += sum(dones)
+            self.assertGreater(num_done, 0)
+        finally:
+            envs.close()
+
+
+if __name__ == "__main__":
+    unittest.main()